@@ -1,5 +1,20 @@
-from . import feeds as feeds
-from . import stores as stores
-from . import brokers as brokers
+import importlib
 
 __version__ = '0.16.0'
+
+# feeds, stores and brokers pull in backtrader and the futu SDK, so they are
+# only imported on first access
+_SUBMODULES = ("feeds", "stores", "brokers")
+
+
+def __getattr__(name):
+    if name in _SUBMODULES:
+        module = importlib.import_module(f".{name}", __name__)
+        globals()[name] = module
+        return module
+    else:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+
+def __dir__():
+    return sorted(list(globals()) + list(_SUBMODULES))
@@ -0,0 +1,129 @@
+"""
+Bar close events at bar boundaries, independent of tick arrival.
+"""
+
+import logging
+import time
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Callable, Dict, Optional, Tuple
+
+from .session_calendar import SessionCalendar
+from .timer_wheel import Timer, TimerWheel
+
+
+@dataclass
+class BarGroup:
+    """
+    Subscribers of one bar length and calendar, sharing a single timer.
+    """
+
+    seconds: int
+    calendar: Optional[SessionCalendar]
+    callbacks: Dict[Callable[[float], None], None] = field(default_factory=dict)
+    boundary: float = 0
+    timer: Optional[Timer] = None
+
+
+class BarCloseScheduler:
+    """
+    Calls subscribers with the epoch time of every bar boundary they subscribed to.
+
+    All subscribers of the same bar length and calendar form one group with
+    one wheel timer, so thousands of symbols closing their bars at the same
+    minute cost a single timer. With a calendar, boundaries follow the
+    sessions: bars close at session breaks and nothing fires outside sessions.
+    """
+
+    def __init__(
+        self,
+        wheel: TimerWheel = None,
+        grace: float = 0.2,
+        wall_clock: Callable[[], float] = time.time,
+        output: Callable = None,
+    ) -> None:
+        """
+        :param wheel: started by the caller, a new wheel is created and started when not given
+        :param grace: seconds after the boundary before firing, lets ticks stamped just before it arrive
+        """
+        if wheel is None:
+            wheel = TimerWheel(output=output)
+            wheel.start()
+
+        self.wheel: TimerWheel = wheel
+        self.grace: float = grace
+        self.wall_clock: Callable[[], float] = wall_clock
+        self.output: Callable = output or print
+
+        self.groups: Dict[Tuple[int, int], BarGroup] = {}
+        self.lock: Lock = Lock()
+
+    def subscribe(self, callback: Callable[[float], None], seconds: int, calendar: SessionCalendar = None) -> None:
+        """"""
+        key: Tuple[int, int] = (seconds, id(calendar))
+
+        with self.lock:
+            group: Optional[BarGroup] = self.groups.get(key, None)
+            if group is None:
+                group = BarGroup(seconds, calendar)
+                self.groups[key] = group
+                self._schedule(group, self.wall_clock())
+
+            group.callbacks[callback] = None
+
+    def unsubscribe(self, callback: Callable[[float], None], seconds: int, calendar: SessionCalendar = None) -> None:
+        """"""
+        key: Tuple[int, int] = (seconds, id(calendar))
+
+        with self.lock:
+            group: Optional[BarGroup] = self.groups.get(key, None)
+            if group is None:
+                return
+
+            group.callbacks.pop(callback, None)
+            if not group.callbacks:
+                group.timer.cancel()
+                self.groups.pop(key)
+
+    def get_next_boundary(self, group: BarGroup, ts: float) -> Optional[float]:
+        """
+        First bar close after ts.
+        """
+        if group.calendar is None:
+            return (ts // group.seconds + 1) * group.seconds
+
+        calendar: SessionCalendar = group.calendar
+        if calendar.is_in_session(ts):
+            return calendar.get_next_boundary(ts, group.seconds)
+
+        next_open: Optional[float] = calendar.get_next_open(ts)
+        if next_open is None:
+            return None
+        return calendar.get_next_boundary(next_open, group.seconds)
+
+    def _schedule(self, group: BarGroup, ts: float) -> None:
+        """"""
+        boundary: Optional[float] = self.get_next_boundary(group, ts)
+        if boundary is None:
+            self.output(f"no session after {ts} for {group.seconds}s bars", logging.WARNING)
+            return
+
+        group.boundary = boundary
+        delay: float = boundary + self.grace - self.wall_clock()
+        group.timer = self.wheel.schedule(max(delay, 0), self._fire, group)
+
+    def _fire(self, group: BarGroup) -> None:
+        """"""
+        boundary: float = group.boundary
+
+        with self.lock:
+            callbacks: list = list(group.callbacks)
+            if callbacks:
+                # skip boundaries already passed if the wheel fell behind
+                self._schedule(group, max(boundary, self.wall_clock() - self.grace))
+
+        for callback in callbacks:
+            try:
+                callback(boundary)
+            except Exception as e:
+                self.output(f"bar close callback {callback} failed: {e}", logging.WARNING)
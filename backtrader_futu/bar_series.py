@@ -0,0 +1,417 @@
+"""
+Shared tick intake building bars of several timeframes for one symbol.
+
+Every tick is applied once, to the running bar of the base timeframe. The
+finished base bars form the time index shared by all timeframes, and each
+larger timeframe is aggregated from finished base bars instead of from
+ticks. Per tick work is therefore independent of the number of timeframes,
+and each timeframe only stores its own bars as compact numpy columns.
+
+Ticks, bar closes and backfilled bars arrive on different threads, so an
+intake and its frames share one lock, which readers of the finished bars
+take through FrameAggregator.get_bar.
+
+With a calendar, bars never span a session break, so intraday frames close a
+bar at every session close, auctions included. A frame of DAY_SECONDS holds
+one bar per trading day instead, longer frames are not supported.
+"""
+
+from threading import RLock
+from typing import Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .object import BarData, TickData
+from .session_calendar import SessionCalendar
+
+
+BAR_FIELDS: Tuple[str, ...] = ("open", "high", "low", "close", "volume", "turnover")
+
+DAY_SECONDS: int = 86400
+
+
+class BarSeries:
+    """
+    Growable columns of finished bars: start and end time in epoch seconds and OHLCV.
+
+    The end is the start plus seconds unless a session close clipped the bar.
+    """
+
+    def __init__(self, seconds: int, capacity: int = 1024) -> None:
+        """"""
+        self.seconds: int = seconds
+        self.size: int = 0
+
+        self.times: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.ends: np.ndarray = np.zeros(capacity, dtype=np.int64)
+        self.columns: Dict[str, np.ndarray] = {name: np.zeros(capacity) for name in BAR_FIELDS}
+
+    def __len__(self) -> int:
+        """"""
+        return self.size
+
+    def append(self, start: int, end: int, values: List[float]) -> int:
+        """
+        Append a bar and return its row.
+        """
+        if self.size == len(self.times):
+            capacity: int = len(self.times) * 2
+            self.times = np.resize(self.times, capacity)
+            self.ends = np.resize(self.ends, capacity)
+            self.columns = {name: np.resize(column, capacity) for name, column in self.columns.items()}
+
+        row: int = self.size
+        self.times[row] = start
+        self.ends[row] = end
+        for name, value in zip(BAR_FIELDS, values):
+            self.columns[name][row] = value
+
+        self.size += 1
+        return row
+
+    def get_bar(self, row: int) -> Tuple[int, int, List[float]]:
+        """
+        Start, end and OHLCV values of a bar.
+        """
+        return int(self.times[row]), int(self.ends[row]), [float(self.columns[name][row]) for name in BAR_FIELDS]
+
+    def get_state(self) -> dict:
+        """"""
+        return {
+            "times": self.times[:self.size].copy(),
+            "ends": self.ends[:self.size].copy(),
+            "columns": {name: column[:self.size].copy() for name, column in self.columns.items()},
+        }
+
+    def set_state(self, state: dict) -> None:
+        """"""
+        self.size = len(state["times"])
+        capacity: int = max(len(self.times), self.size)
+        times: np.ndarray = np.asarray(state["times"], dtype=np.int64)
+        ends: np.ndarray = np.asarray(state["ends"], dtype=np.int64) if "ends" in state else times + self.seconds
+        self.times = np.resize(times, capacity)
+        self.ends = np.resize(ends, capacity)
+        self.columns = {
+            name: np.resize(np.asarray(state["columns"][name], dtype=np.float64), capacity) for name in BAR_FIELDS
+        }
+
+    def get_column(self, name: str) -> np.ndarray:
+        """
+        View of the filled part of a column, times for "time" and "end".
+        """
+        if name == "time":
+            return self.times[:self.size]
+        if name == "end":
+            return self.ends[:self.size]
+        return self.columns[name][:self.size]
+
+
+class FrameAggregator:
+    """
+    Builds bars of one timeframe from finished base bars.
+    """
+
+    def __init__(self, seconds: int, calendar: SessionCalendar = None, lock: RLock = None) -> None:
+        """
+        :param lock: lock shared with the intake feeding this frame
+        """
+        self.seconds: int = seconds
+        self.calendar: Optional[SessionCalendar] = calendar
+        self.lock: RLock = lock or RLock()
+        self.series: BarSeries = BarSeries(seconds)
+        self.listeners: List[Callable[[int], None]] = []
+
+        self.start: Optional[int] = None
+        self.end: int = 0
+        self.values: Optional[List[float]] = None
+
+    def on_base_bar(self, start: int, end: int, values: List[float]) -> None:
+        """
+        Add a finished base bar [start, end), closing the running bar when its bucket is complete.
+        """
+        bucket_start, bucket_end = get_bucket(start, self.seconds, self.calendar)
+
+        with self.lock:
+            if self.values is not None and bucket_start != self.start:
+                self.flush()
+
+            if self.values is None:
+                self.start, self.end = bucket_start, bucket_end
+                self.values = list(values)
+            else:
+                merge_values(self.values, values)
+
+            if end >= self.end:
+                self.flush()
+
+    def close(self, boundary: float) -> None:
+        """
+        Finish the running bar if it ends by boundary.
+        """
+        with self.lock:
+            if self.values is not None and boundary >= self.end:
+                self.flush()
+
+    def get_bar(self, row: int) -> Optional[Tuple[int, int, List[float]]]:
+        """
+        Start, end and values of a finished bar, None if it is not finished yet.
+        """
+        with self.lock:
+            if row >= len(self.series):
+                return None
+            return self.series.get_bar(row)
+
+    def get_state(self) -> dict:
+        """
+        Finished bars and the partial bar.
+        """
+        with self.lock:
+            return {
+                "series": self.series.get_state(),
+                "start": self.start,
+                "end": self.end,
+                "values": list(self.values) if self.values else self.values,
+            }
+
+    def set_state(self, state: dict) -> None:
+        """"""
+        with self.lock:
+            self.series.set_state(state["series"])
+            self.start = state["start"]
+            self.end = state["end"]
+            self.values = state["values"]
+
+    def flush(self) -> None:
+        """"""
+        with self.lock:
+            if self.values is None:
+                return
+
+            row: int = self.series.append(self.start, self.end, self.values)
+            self.values = None
+
+            for listener in self.listeners:
+                listener(row)
+
+
+class SharedTickIntake:
+    """
+    Tick intake of one symbol feeding any number of timeframes.
+
+    Timeframes must be multiples of base_seconds. With a calendar, bars are
+    aligned to session opens and never span a session break.
+
+    A tick or bar arriving after its base bar was closed, e.g. by a timer
+    close, never reopens the closed bucket: its volume and turnover are
+    folded into the next bar, its price is dropped.
+    """
+
+    def __init__(self, base_seconds: int = 60, calendar: SessionCalendar = None) -> None:
+        """"""
+        self.lock: RLock = RLock()
+        self.base: FrameAggregator = FrameAggregator(base_seconds, calendar, self.lock)
+        self.calendar: Optional[SessionCalendar] = calendar
+        self.frames: Dict[int, FrameAggregator] = {base_seconds: self.base}
+
+        self.start: Optional[int] = None
+        self.end: int = 0
+        self.values: Optional[List[float]] = None
+        # end of the last closed base bar, and late volume waiting for the next bar
+        self.closed_end: int = 0
+        self.carry_volume: float = 0
+        self.carry_turnover: float = 0
+
+        self.last_volume: Optional[float] = None
+        self.last_turnover: float = 0
+
+    @property
+    def index(self) -> BarSeries:
+        """
+        Finished base bars, the time index shared by all timeframes.
+        """
+        return self.base.series
+
+    def add_frame(self, seconds: int) -> FrameAggregator:
+        """"""
+        base_seconds: int = self.base.seconds
+        if seconds % base_seconds:
+            raise ValueError(f"timeframe {seconds}s is not a multiple of the base {base_seconds}s")
+        if self.calendar and seconds > DAY_SECONDS:
+            raise ValueError(f"timeframe {seconds}s is longer than a trading day")
+
+        with self.lock:
+            frame: Optional[FrameAggregator] = self.frames.get(seconds, None)
+            if frame is None:
+                frame = FrameAggregator(seconds, self.calendar, self.lock)
+                self.frames[seconds] = frame
+            return frame
+
+    def get_state(self) -> dict:
+        """
+        Partial base bar, volume reference and the state of every timeframe.
+        """
+        with self.lock:
+            return {
+                "start": self.start,
+                "end": self.end,
+                "values": list(self.values) if self.values else self.values,
+                "closed_end": self.closed_end,
+                "carry_volume": self.carry_volume,
+                "carry_turnover": self.carry_turnover,
+                "last_volume": self.last_volume,
+                "last_turnover": self.last_turnover,
+                "frames": {str(seconds): frame.get_state() for seconds, frame in self.frames.items()},
+            }
+
+    def set_state(self, state: dict) -> None:
+        """
+        Restore a state, timeframes not added yet are created.
+        """
+        with self.lock:
+            self.start = state["start"]
+            self.end = state["end"]
+            self.values = state["values"]
+            self.closed_end = state.get("closed_end", 0)
+            self.carry_volume = state.get("carry_volume", 0)
+            self.carry_turnover = state.get("carry_turnover", 0)
+            self.last_volume = state["last_volume"]
+            self.last_turnover = state["last_turnover"]
+
+            for seconds, frame_state in state["frames"].items():
+                self.add_frame(int(seconds)).set_state(frame_state)
+
+    def on_tick(self, tick: TickData) -> None:
+        """"""
+        if not tick.last_price:
+            return
+
+        ts: float = tick.datetime.timestamp()
+        price: float = tick.last_price
+
+        with self.lock:
+            if self.values is not None and ts >= self.end:
+                self.close_bar(ts)
+
+            volume: float = 0
+            turnover: float = 0
+            if self.last_volume is not None and tick.volume >= self.last_volume:
+                volume = tick.volume - self.last_volume
+                turnover = tick.turnover - self.last_turnover
+            self.last_volume = tick.volume
+            self.last_turnover = tick.turnover
+
+            if ts < self.closed_end or (self.values is not None and ts < self.start):
+                self.fold_late(volume, turnover)
+                return
+
+            if self.values is None:
+                if self.calendar and not self.calendar.is_in_session(ts):
+                    return
+
+                self.start, self.end = get_bucket(int(ts), self.base.seconds, self.calendar)
+                self.values = [price, price, price, price, volume, turnover]
+                self.take_carry()
+                return
+
+            values: List[float] = self.values
+            if price > values[1]:
+                values[1] = price
+            if price < values[2]:
+                values[2] = price
+            values[3] = price
+            values[4] += volume
+            values[5] += turnover
+
+    def on_bar(self, bar: BarData, seconds: int = 60) -> None:
+        """
+        Merge a fetched bar of at most base_seconds, e.g. from a gap backfill, into the base bars.
+        """
+        # futu stamps intraday bars with their end time
+        start: int = int(bar.datetime.timestamp()) - seconds
+        values: List[float] = [
+            bar.open_price, bar.high_price, bar.low_price, bar.close_price, bar.volume, bar.turnover
+        ]
+
+        with self.lock:
+            if self.values is not None and start >= self.end:
+                self.close_bar(start)
+
+            if start < self.closed_end or (self.values is not None and start < self.start):
+                self.fold_late(bar.volume, bar.turnover)
+            elif self.values is None:
+                self.start, self.end = get_bucket(start, self.base.seconds, self.calendar)
+                self.values = values
+                self.take_carry()
+            else:
+                merge_values(self.values, values)
+
+            # the next tick's cumulative volume includes the bar, on_tick ignores it after a day change
+            if self.last_volume is not None:
+                self.last_volume += bar.volume
+                self.last_turnover += bar.turnover
+
+    def fold_late(self, volume: float, turnover: float) -> None:
+        """
+        Add volume traded in an already closed bucket to the running bar, or to the next one.
+        """
+        if self.values is not None:
+            self.values[4] += volume
+            self.values[5] += turnover
+        else:
+            self.carry_volume += volume
+            self.carry_turnover += turnover
+
+    def take_carry(self) -> None:
+        """"""
+        self.values[4] += self.carry_volume
+        self.values[5] += self.carry_turnover
+        self.carry_volume = 0
+        self.carry_turnover = 0
+
+    def close_bar(self, boundary: float) -> None:
+        """
+        Finish the running base bar if it ends by boundary and pass it to every
+        timeframe, then finish the bars of larger timeframes ending by boundary.
+        """
+        with self.lock:
+            if self.values is not None and boundary >= self.end:
+                start, end, values = self.start, self.end, self.values
+                self.values = None
+                self.closed_end = end
+
+                # the base frame closes every bar at once, larger frames when their bucket is complete
+                for frame in self.frames.values():
+                    frame.on_base_bar(start, end, values)
+
+            for frame in self.frames.values():
+                frame.close(boundary)
+
+
+def get_bucket(ts: int, seconds: int, calendar: Optional[SessionCalendar]) -> Tuple[int, int]:
+    """
+    [start, end) of the bar containing ts, a trading day for DAY_SECONDS with a calendar.
+    """
+    if calendar:
+        bucket: Optional[Tuple[float, float]]
+        if seconds == DAY_SECONDS:
+            bucket = calendar.get_day_bucket(ts)
+        else:
+            bucket = calendar.get_bar_bucket(ts, seconds)
+        if bucket:
+            return int(bucket[0]), int(bucket[1])
+
+    start: int = ts - ts % seconds
+    return start, start + seconds
+
+
+def merge_values(values: List[float], other: List[float]) -> None:
+    """
+    Merge a later bar into running OHLCV values.
+    """
+    if other[1] > values[1]:
+        values[1] = other[1]
+    if other[2] < values[2]:
+        values[2] = other[2]
+    values[3] = other[3]
+    values[4] += other[4]
+    values[5] += other[5]
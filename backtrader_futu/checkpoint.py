@@ -0,0 +1,231 @@
+"""
+Checkpoint and restore of live feed state for warm restarts.
+
+A snapshot holds, per registered FutuTickData, the last depth rows of its
+lines, last_volume, the last tick, the ticks queued but not loaded yet and
+the partial bars of its shared tick intake, plus the partial bars of
+registered TickResamplers. It is written
+as one .npz file: arrays as they are and everything else as a JSON blob.
+
+Indicators are not serialized. Restoring queues the stored rows into the
+feeds, so indicators and strategies rebuild their state by running over
+them as over any other bars, then only the gap since the snapshot is
+fetched and queued behind them. depth must cover the longest indicator
+warm-up, recursive indicators such as EMA converge within their warm-up
+rather than matching to the last digit.
+"""
+
+import logging
+import os
+import time
+from dataclasses import fields, is_dataclass
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+
+import numpy as np
+
+from .gap_backfill import make_gap_request, select_gap_bars
+from .object import BarData, Direction, Exchange, Interval, TickData
+from .utility import CHINA_TZ, get_file_path
+
+
+CHECKPOINT_FILE: str = "feed_checkpoint.npz"
+VERSION: int = 1
+
+META_KEY: str = "__meta__"
+
+DATA_CLASSES: Dict[str, type] = {cls.__name__: cls for cls in (TickData, BarData)}
+ENUM_CLASSES: Dict[str, type] = {cls.__name__: cls for cls in (Exchange, Interval, Direction)}
+
+
+def encode_state(value: Any, path: str, arrays: Dict[str, np.ndarray]) -> Any:
+    """
+    Convert a state tree to JSON types, moving numpy arrays into arrays.
+    """
+    if isinstance(value, np.ndarray):
+        arrays[path] = value
+        return {"__array__": path}
+    if isinstance(value, np.generic):
+        return value.item()
+    if isinstance(value, datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, Enum):
+        return {"__enum__": type(value).__name__, "value": value.value}
+    if is_dataclass(value) and type(value).__name__ in DATA_CLASSES:
+        data: dict = {f.name: getattr(value, f.name) for f in fields(value)}
+        return {"__data__": type(value).__name__, "fields": encode_state(data, path, arrays)}
+    if isinstance(value, dict):
+        return {str(k): encode_state(v, f"{path}/{k}", arrays) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [encode_state(v, f"{path}/{i}", arrays) for i, v in enumerate(value)]
+    return value
+
+
+def decode_state(value: Any, arrays: Dict[str, np.ndarray]) -> Any:
+    """"""
+    if isinstance(value, list):
+        return [decode_state(v, arrays) for v in value]
+    if not isinstance(value, dict):
+        return value
+
+    if "__array__" in value:
+        return arrays[value["__array__"]]
+    if "__datetime__" in value:
+        return datetime.fromisoformat(value["__datetime__"])
+    if "__enum__" in value:
+        return ENUM_CLASSES[value["__enum__"]](value["value"])
+    if "__data__" in value:
+        cls: type = DATA_CLASSES[value["__data__"]]
+        data: dict = decode_state(value["fields"], arrays)
+        init_names: List[str] = [f.name for f in fields(cls) if f.init]
+        obj = cls(**{name: data[name] for name in init_names if name in data})
+        for name, field_value in data.items():
+            if name not in init_names:
+                setattr(obj, name, field_value)
+        return obj
+
+    return {k: decode_state(v, arrays) for k, v in value.items()}
+
+
+class FeedCheckpoint:
+    """
+    Periodic snapshots of registered feeds and resamplers.
+
+    Feed lines are not thread safe, call maybe_save from the strategy, e.g.
+    at the end of next().
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        interval: float = 60.0,
+        depth: int = 500,
+        clock: Callable[[], float] = time.monotonic,
+        output: Callable = None,
+    ) -> None:
+        """
+        :param depth: rows kept per feed, at least the longest indicator warm-up
+        """
+        self.path: Path = Path(path) if path else get_file_path(CHECKPOINT_FILE)
+        self.interval: float = interval
+        self.depth: int = depth
+        self.clock: Callable[[], float] = clock
+        self.output: Callable = output or print
+
+        self.feeds: Dict[str, Any] = {}
+        self.resamplers: Dict[str, Any] = {}
+        self.last_save: float = clock()
+
+    def add_feed(self, name: str, feed) -> None:
+        """
+        Register a FutuTickData under a name stable across restarts, e.g. its vt_symbol.
+        """
+        self.feeds[name] = feed
+
+    def add_resampler(self, name: str, resampler) -> None:
+        """"""
+        self.resamplers[name] = resampler
+
+    def maybe_save(self) -> bool:
+        """
+        Save if interval seconds passed since the last save.
+        """
+        now: float = self.clock()
+        if now - self.last_save < self.interval:
+            return False
+
+        self.save()
+        return True
+
+    def save(self) -> None:
+        """
+        Write a snapshot, through a temporary file so a crash never leaves a truncated one.
+        """
+        import orjson
+
+        arrays: Dict[str, np.ndarray] = {}
+        meta: dict = {
+            "version": VERSION,
+            "saved_at": datetime.now(CHINA_TZ).isoformat(),
+            "feeds": {
+                name: encode_state(feed.get_state(self.depth), f"feeds/{name}", arrays)
+                for name, feed in self.feeds.items()
+            },
+            "resamplers": {
+                name: encode_state(resampler.get_state(), f"resamplers/{name}", arrays)
+                for name, resampler in self.resamplers.items()
+            },
+        }
+        arrays[META_KEY] = np.frombuffer(orjson.dumps(meta, option=orjson.OPT_SERIALIZE_NUMPY), dtype=np.uint8)
+
+        tmp_path: Path = self.path.with_suffix(".tmp")
+        with open(tmp_path, "wb") as f:
+            np.savez(f, **arrays)
+        os.replace(tmp_path, self.path)
+
+        self.last_save = self.clock()
+
+    def load(self) -> Optional[dict]:
+        """
+        Decoded snapshot, None if there is none or it is unreadable.
+        """
+        import orjson
+
+        if not self.path.exists():
+            return None
+
+        try:
+            with np.load(self.path) as data:
+                arrays: Dict[str, np.ndarray] = {key: data[key] for key in data.files}
+            meta: dict = orjson.loads(arrays.pop(META_KEY).tobytes())
+        except Exception as e:
+            self.output(f"checkpoint {self.path} unreadable: {e}", logging.WARNING)
+            return None
+
+        if meta.get("version", None) != VERSION:
+            self.output(f"checkpoint {self.path} has version {meta.get('version')}, ignored", logging.WARNING)
+            return None
+
+        return decode_state(meta, arrays)
+
+    def restore(self, fetcher=None, end: datetime = None) -> bool:
+        """
+        Restore every registered feed and resampler found in the snapshot.
+
+        With a HistoryFetcher, the minute bars between the last stored tick
+        and end (now by default) are fetched and queued behind the stored rows.
+        """
+        snapshot: Optional[dict] = self.load()
+        if snapshot is None:
+            return False
+
+        for name, resampler in self.resamplers.items():
+            state: Optional[dict] = snapshot["resamplers"].get(name, None)
+            if state:
+                resampler.set_state(state)
+
+        for name, feed in self.feeds.items():
+            state = snapshot["feeds"].get(name, None)
+            if not state:
+                self.output(f"feed {name} not in checkpoint {self.path}", logging.WARNING)
+                continue
+
+            feed.set_state(state)
+            if fetcher and state["last_tick"]:
+                self.fill_gap(feed, fetcher, end)
+
+        self.output(f"restored checkpoint of {snapshot['saved_at']}")
+        return True
+
+    def fill_gap(self, feed, fetcher, end: datetime = None) -> List[BarData]:
+        """
+        Queue the minute bars after the last tick of a feed.
+        """
+        tick: TickData = feed.last_tick
+        bars: List[BarData] = select_gap_bars(fetcher.query_history(make_gap_request(tick, end)), tick.datetime, end)
+
+        # the feed moves its volume references past the bars
+        feed.add_bars(bars)
+        return bars
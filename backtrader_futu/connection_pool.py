@@ -0,0 +1,374 @@
+"""
+Process-wide pool of futu quote and trade contexts.
+
+Contexts are keyed by connection settings (as returned by
+futu_utility.load_connect_setting), created lazily on first acquire and
+shared by every store or tool in the process.
+
+Contexts are created and reconnected outside the pool lock, so a slow or
+failing OpenD connect only blocks the callers waiting for that context.
+"""
+
+import logging
+import random
+import time
+from dataclasses import dataclass, field
+from threading import Event, RLock, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+
+QUOTE_CONTEXT: str = "quote"
+TRADE_CONTEXT: str = "trade"
+
+# (kind, host, port, market, security firm, trd_env), the last three for trade contexts
+PoolKey = Tuple[str, str, int, str, str, str]
+
+
+class UnlockError(Exception):
+    """
+    Raised when a REAL trade context could not be unlocked.
+    """
+
+
+def _create_quote_context(setting: dict):
+    """"""
+    import futu as ft
+
+    return ft.OpenQuoteContext(host=setting["host"], port=int(setting["port"]))
+
+
+def _create_trade_context(setting: dict):
+    """"""
+    import futu as ft
+
+    kwargs: dict = {}
+    if setting.get("security_firm", ""):
+        kwargs["security_firm"] = setting["security_firm"]
+
+    ctx = ft.OpenSecTradeContext(
+        filter_trdmarket=setting.get("market", "HK"),
+        host=setting["host"],
+        port=int(setting["port"]),
+        **kwargs,
+    )
+
+    password: str = setting.get("password", "")
+    if password and str(setting.get("trd_env", "")).upper() == "REAL":
+        ret, data = ctx.unlock_trade(password)
+        if ret != ft.RET_OK:
+            ctx.close()
+            raise UnlockError(f"unlock trade on {setting['host']}:{setting['port']} failed: {data}")
+    return ctx
+
+
+def _check_context(ctx) -> bool:
+    """"""
+    import futu as ft
+
+    ret, _ = ctx.get_global_state()
+    return ret == ft.RET_OK
+
+
+@dataclass
+class PoolEntry:
+    """
+    One shared context and its bookkeeping.
+
+    The setting, including the unlock password, stays here and out of the key,
+    which appears in log messages. lock serializes creating and reconnecting
+    the context without holding the pool lock.
+    """
+
+    key: PoolKey
+    setting: dict
+    ctx: Any = None
+    created: bool = False
+    refs: int = 0
+    failures: int = 0
+    next_retry: float = 0
+    handles: List["PooledContext"] = field(default_factory=list)
+    lock: RLock = field(default_factory=RLock)
+
+
+class PooledContext:
+    """
+    Handle to a pooled context.
+
+    Attribute access is forwarded to the current underlying context, so the
+    handle stays valid when the pool replaces the context after a reconnect.
+    """
+
+    def __init__(self, pool: "ContextPool", entry: PoolEntry) -> None:
+        """"""
+        self._pool: "ContextPool" = pool
+        self._entry: Optional[PoolEntry] = entry
+
+    @property
+    def context(self):
+        """"""
+        if self._entry is None:
+            raise RuntimeError("pooled context already released")
+        return self._entry.ctx
+
+    def __getattr__(self, name: str) -> Any:
+        """"""
+        return getattr(self.context, name)
+
+    def close(self) -> None:
+        """
+        Release the handle instead of closing the shared context.
+        """
+        self.release()
+
+    def release(self) -> None:
+        """"""
+        if self._entry is not None:
+            self._pool._release(self)
+            self._entry = None
+
+    def __enter__(self) -> "PooledContext":
+        """"""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """"""
+        self.release()
+
+
+class ContextPool:
+    """
+    Shares quote and trade contexts with reference counting, health checks
+    and reconnect with exponential backoff.
+    """
+
+    def __init__(
+        self,
+        quote_factory: Callable[[dict], Any] = None,
+        trade_factory: Callable[[dict], Any] = None,
+        health_check: Callable[[Any], bool] = None,
+        check_interval: float = 30.0,
+        base_backoff: float = 1.0,
+        max_backoff: float = 60.0,
+        clock: Callable[[], float] = time.monotonic,
+        output: Callable = None,
+    ) -> None:
+        """"""
+        self.factories: Dict[str, Callable[[dict], Any]] = {
+            QUOTE_CONTEXT: quote_factory or _create_quote_context,
+            TRADE_CONTEXT: trade_factory or _create_trade_context,
+        }
+        self.health_check: Callable[[Any], bool] = health_check or _check_context
+        self.check_interval: float = check_interval
+        self.base_backoff: float = base_backoff
+        self.max_backoff: float = max_backoff
+        self.clock: Callable[[], float] = clock
+        self.output: Callable = output or print
+
+        self.entries: Dict[PoolKey, PoolEntry] = {}
+        self.reconnect_listeners: List[Callable[[PoolKey], None]] = []
+        self.lock: RLock = RLock()
+
+        self.stop_event: Event = Event()
+        self.thread: Optional[Thread] = None
+
+    def _get_key(self, kind: str, setting: dict) -> PoolKey:
+        """
+        Settings creating different contexts give different keys, e.g. a trade
+        context unlocked for REAL is never shared with a SIMULATE one.
+        """
+        if kind != TRADE_CONTEXT:
+            return kind, setting["host"], int(setting["port"]), "", "", ""
+
+        return (
+            kind,
+            setting["host"],
+            int(setting["port"]),
+            setting.get("market", "HK"),
+            setting.get("security_firm", ""),
+            str(setting.get("trd_env", "")).upper(),
+        )
+
+    def acquire(self, kind: str, setting: dict = None) -> PooledContext:
+        """
+        Get a handle to the shared context for the settings, creating it on first use.
+        """
+        if setting is None:
+            from .futu_utility import load_connect_setting
+
+            setting = load_connect_setting()
+
+        key: PoolKey = self._get_key(kind, setting)
+
+        # the reference keeps the entry in the pool while its context is created
+        with self.lock:
+            entry: Optional[PoolEntry] = self.entries.get(key, None)
+            if entry is None:
+                entry = PoolEntry(key, dict(setting))
+                self.entries[key] = entry
+            entry.refs += 1
+
+        with entry.lock:
+            if not entry.created:
+                try:
+                    entry.ctx = self.factories[kind](entry.setting)
+                    entry.created = True
+                except Exception:
+                    self._unref(entry)
+                    raise
+
+        with self.lock:
+            handle: PooledContext = PooledContext(self, entry)
+            entry.handles.append(handle)
+            return handle
+
+    def acquire_quote(self, setting: dict = None) -> PooledContext:
+        """"""
+        return self.acquire(QUOTE_CONTEXT, setting)
+
+    def acquire_trade(self, setting: dict = None) -> PooledContext:
+        """"""
+        return self.acquire(TRADE_CONTEXT, setting)
+
+    def _release(self, handle: PooledContext) -> None:
+        """"""
+        entry: PoolEntry = handle._entry
+        with self.lock:
+            entry.handles.remove(handle)
+        self._unref(entry)
+
+    def _unref(self, entry: PoolEntry) -> None:
+        """
+        Drop a reference, closing the context after the last one.
+        """
+        with self.lock:
+            entry.refs -= 1
+            if entry.refs > 0:
+                return
+            self.entries.pop(entry.key, None)
+
+        with entry.lock:
+            self._close(entry)
+
+    def _close(self, entry: PoolEntry) -> None:
+        """"""
+        if entry.ctx is None:
+            return
+
+        try:
+            entry.ctx.close()
+        except Exception as e:
+            self.output(f"failed to close context {entry.key}: {e}", logging.WARNING)
+        entry.ctx = None
+
+    def add_reconnect_listener(self, listener: Callable[[PoolKey], None]) -> None:
+        """
+        Register a callback invoked with the pool key after a context is replaced.
+        """
+        self.reconnect_listeners.append(listener)
+
+    def check_health(self) -> None:
+        """
+        Check every context and replace unhealthy ones, backing off between attempts.
+        """
+        with self.lock:
+            entries: List[PoolEntry] = list(self.entries.values())
+
+        for entry in entries:
+            now: float = self.clock()
+            if now < entry.next_retry:
+                continue
+
+            # contexts still being created are left to their acquire
+            if not entry.created:
+                continue
+
+            healthy: bool = False
+            if entry.ctx is not None:
+                try:
+                    healthy = self.health_check(entry.ctx)
+                except Exception:
+                    healthy = False
+
+            if healthy:
+                entry.failures = 0
+                continue
+
+            self._reconnect(entry)
+
+    def _reconnect(self, entry: PoolEntry) -> None:
+        """"""
+        kind: str = entry.key[0]
+
+        with entry.lock:
+            with self.lock:
+                if self.entries.get(entry.key, None) is not entry:
+                    return
+
+            self._close(entry)
+            try:
+                entry.ctx = self.factories[kind](entry.setting)
+                reconnected: bool = self.health_check(entry.ctx)
+            except Exception as e:
+                self.output(f"reconnect {entry.key} failed: {e}", logging.WARNING)
+                reconnected = False
+
+            if reconnected:
+                entry.failures = 0
+                entry.next_retry = 0
+            else:
+                backoff: float = min(self.max_backoff, self.base_backoff * 2 ** entry.failures)
+                entry.failures += 1
+                entry.next_retry = self.clock() + backoff * random.uniform(0.5, 1.0)
+                return
+
+        self.output(f"context {entry.key} reconnected")
+        for listener in self.reconnect_listeners:
+            listener(entry.key)
+
+    def start(self) -> None:
+        """
+        Run health checks every check_interval seconds on a background thread.
+        """
+        if self.thread:
+            return
+
+        self.stop_event.clear()
+        self.thread = Thread(target=self.run, name="ContextPool", daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """"""
+        while not self.stop_event.wait(self.check_interval):
+            self.check_health()
+
+    def close(self) -> None:
+        """
+        Stop health checks and close every context.
+        """
+        if self.thread:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
+
+        with self.lock:
+            for entry in self.entries.values():
+                self._close(entry)
+                for handle in entry.handles:
+                    handle._entry = None
+            self.entries.clear()
+
+
+_context_pool: Optional[ContextPool] = None
+_context_pool_lock: RLock = RLock()
+
+
+def get_context_pool() -> ContextPool:
+    """
+    Get the process-wide context pool.
+    """
+    global _context_pool
+
+    with _context_pool_lock:
+        if _context_pool is None:
+            _context_pool = ContextPool()
+        return _context_pool
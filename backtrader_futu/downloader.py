@@ -0,0 +1,367 @@
+"""
+Resumable bulk history downloader for the selected stock universe.
+
+    python -m backtrader_futu.downloader --start 2020-01-01 --ktypes K_1M K_DAY
+
+Every (K-line type, code) job streams its pages through HistoryFetcher,
+all jobs share one quote context and the process-wide history limiter.
+Bars are written to Parquet files under
+
+    <root>/<ktype>/<code>/<first time>_<last time>.parquet
+
+and the time of the last stored bar of every job is checkpointed after
+each write, so an interrupted run continues where it stopped.
+
+Defaults for start, ktypes and concurrency are read from
+downloader_setting.json in the temp folder and overridden by arguments.
+"""
+
+import argparse
+import logging
+import os
+import shutil
+import sys
+from concurrent.futures import Future, ThreadPoolExecutor, as_completed
+from datetime import date, datetime
+from pathlib import Path
+from threading import Lock
+from typing import TYPE_CHECKING, Callable, Dict, List, Optional, Tuple
+
+from .history_fetcher import HistoryFetcher
+from .ratelimit import TokenBucket
+from .utility import CHINA_TZ, get_file_path, get_folder_path, load_json
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+SETTING_FILE: str = "downloader_setting.json"
+CHECKPOINT_FILE: str = "download_checkpoint.json"
+
+DEFAULT_KTYPES: List[str] = ["K_DAY"]
+
+# (column, pyarrow type name) of the stored bars
+BAR_COLUMNS: List[Tuple[str, str]] = [
+    ("time_key", "string"),
+    ("open", "float64"),
+    ("high", "float64"),
+    ("low", "float64"),
+    ("close", "float64"),
+    ("volume", "int64"),
+    ("turnover", "float64"),
+    ("last_close", "float64"),
+]
+
+
+def _get_schema():
+    """"""
+    import pyarrow as pa
+
+    return pa.schema([(name, getattr(pa, type_name)()) for name, type_name in BAR_COLUMNS])
+
+
+class DownloadCheckpoint:
+    """
+    Time of the last stored bar per K-line type and code.
+    """
+
+    def __init__(self, path: Path) -> None:
+        """"""
+        self.path: Path = path
+        self.lock: Lock = Lock()
+        self.data: Dict[str, Dict[str, str]] = {}
+
+        if path.exists():
+            import orjson
+
+            self.data = orjson.loads(path.read_bytes() or b"{}")
+
+    def get(self, ktype: str, code: str) -> str:
+        """"""
+        with self.lock:
+            return self.data.get(ktype, {}).get(code, "")
+
+    def update(self, ktype: str, code: str, time_key: str) -> None:
+        """
+        Record a stored bar time and save the checkpoint.
+        """
+        with self.lock:
+            self.data.setdefault(ktype, {})[code] = time_key
+            self._save()
+
+    def reset(self) -> None:
+        """"""
+        with self.lock:
+            self.data = {}
+            self._save()
+
+    def remove(self, ktype: str, code: str) -> None:
+        """"""
+        with self.lock:
+            if self.data.get(ktype, {}).pop(code, None) is not None:
+                self._save()
+
+    def _save(self) -> None:
+        """
+        Write to a temporary file first so a crash never leaves a truncated checkpoint.
+        """
+        import orjson
+
+        tmp_path: Path = self.path.with_suffix(".tmp")
+        tmp_path.write_bytes(orjson.dumps(self.data, option=orjson.OPT_INDENT_2))
+        os.replace(tmp_path, self.path)
+
+
+class BarStore:
+    """
+    Parquet files of K-line pages, one folder per K-line type and code.
+    """
+
+    def __init__(self, root: str = None) -> None:
+        """"""
+        self.root: Path = Path(root) if root else get_folder_path("history")
+
+    def get_folder(self, ktype: str, code: str) -> Path:
+        """"""
+        return self.root.joinpath(ktype, code)
+
+    def write(self, ktype: str, code: str, df: "pd.DataFrame") -> Path:
+        """"""
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        folder: Path = self.get_folder(ktype, code)
+        folder.mkdir(parents=True, exist_ok=True)
+
+        names: List[str] = [name for name, _ in BAR_COLUMNS]
+        table = pa.Table.from_pandas(df[names], schema=_get_schema(), preserve_index=False)
+
+        first: str = _to_file_time(df["time_key"].iloc[0])
+        last: str = _to_file_time(df["time_key"].iloc[-1])
+        path: Path = folder.joinpath(f"{first}_{last}.parquet")
+
+        tmp_path: Path = path.with_suffix(".tmp")
+        pq.write_table(table, str(tmp_path))
+        os.replace(tmp_path, path)
+        return path
+
+    def clear(self, ktype: str, code: str) -> None:
+        """
+        Delete all stored bars of a code.
+        """
+        shutil.rmtree(self.get_folder(ktype, code), ignore_errors=True)
+
+    def read(self, ktype: str, code: str) -> "pd.DataFrame":
+        """
+        Read all stored bars of a code in time order.
+
+        A page written again, e.g. after a crash before its checkpoint was
+        saved, is read once, the latest file wins.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        folder: Path = self.get_folder(ktype, code)
+        paths: List[Path] = sorted(folder.glob("*.parquet")) if folder.exists() else []
+        if not paths:
+            return _get_schema().empty_table().to_pandas()
+
+        table = pa.concat_tables([pq.read_table(str(path)) for path in paths])
+        df: "pd.DataFrame" = table.to_pandas()
+        df = df.drop_duplicates("time_key", keep="last").sort_values("time_key", kind="stable")
+        return df.reset_index(drop=True)
+
+
+def _to_file_time(time_key: str) -> str:
+    """"""
+    return time_key.replace("-", "").replace(":", "").replace(" ", "T")
+
+
+class UniverseDownloader:
+    """
+    Downloads history of many codes and K-line types with bounded concurrency.
+    """
+
+    def __init__(
+        self,
+        quote_ctx,
+        root: str = None,
+        checkpoint_path: str = None,
+        max_jobs: int = 4,
+        max_workers: int = 4,
+        flush_rows: int = 100000,
+        limiter: TokenBucket = None,
+        output: Callable = None,
+    ) -> None:
+        """
+        :param max_jobs: (K-line type, code) jobs consuming pages at the same time
+        :param max_workers: page requests in flight at the same time across all jobs
+        :param flush_rows: rows buffered per job before they are written and checkpointed
+        """
+        self.store: BarStore = BarStore(root)
+        self.checkpoint: DownloadCheckpoint = DownloadCheckpoint(
+            Path(checkpoint_path) if checkpoint_path else get_file_path(CHECKPOINT_FILE)
+        )
+        self.fetcher: HistoryFetcher = HistoryFetcher(quote_ctx, limiter=limiter, max_workers=max_workers, output=output)
+        self.max_jobs: int = max_jobs
+        self.flush_rows: int = flush_rows
+        self.output: Callable = output or print
+
+    def close(self) -> None:
+        """"""
+        self.fetcher.close()
+
+    def reset(self, codes: List[str], ktypes: List[str]) -> None:
+        """
+        Forget the checkpoints and delete the stored bars of the jobs, so they download from scratch.
+        """
+        for ktype in ktypes:
+            for code in codes:
+                self.checkpoint.remove(ktype, code)
+                self.store.clear(ktype, code)
+
+    def download(self, codes: List[str], ktypes: List[str], start: date, end: date) -> Dict[Tuple[str, str], str]:
+        """
+        Download [start, end] for every code and K-line type.
+
+        Returns the error message of every failed (ktype, code) job.
+        """
+        errors: Dict[Tuple[str, str], str] = {}
+        total: int = len(codes) * len(ktypes)
+        done: int = 0
+
+        executor: ThreadPoolExecutor = ThreadPoolExecutor(self.max_jobs, thread_name_prefix="Downloader")
+        futures: Dict[Future, Tuple[str, str]] = {
+            executor.submit(self.download_one, code, ktype, start, end): (ktype, code)
+            for ktype in ktypes
+            for code in codes
+        }
+
+        try:
+            for future in as_completed(futures):
+                ktype, code = futures[future]
+                done += 1
+
+                try:
+                    rows: int = future.result()
+                except Exception as e:
+                    errors[(ktype, code)] = str(e)
+                    self.output(f"[{done}/{total}] {code} {ktype} failed: {e}", logging.WARNING)
+                    continue
+
+                self.output(f"[{done}/{total}] {code} {ktype} {rows} bars")
+        finally:
+            # on interrupt only the running jobs finish, the checkpoint covers the rest
+            executor.shutdown(wait=True, cancel_futures=True)
+
+        return errors
+
+    def download_one(self, code: str, ktype: str, start: date, end: date) -> int:
+        """
+        Download one job from its checkpoint on and return the number of new bars.
+        """
+        import pandas as pd
+
+        last: str = self.checkpoint.get(ktype, code)
+        if last:
+            # the checkpointed day may be incomplete, fetch it again and skip the stored bars
+            start = max(start, date.fromisoformat(last[:10]))
+        if start > end:
+            return 0
+
+        frames: List["pd.DataFrame"] = []
+        buffered: int = 0
+        rows: int = 0
+
+        for df in self.fetcher.iter_frames(code, ktype, start, end):
+            if last:
+                df = df[df["time_key"] > last]
+                if df.empty:
+                    continue
+
+            frames.append(df)
+            buffered += len(df)
+            if buffered >= self.flush_rows:
+                last = self._flush(code, ktype, pd.concat(frames, ignore_index=True))
+                rows += buffered
+                frames, buffered = [], 0
+
+        if frames:
+            self._flush(code, ktype, pd.concat(frames, ignore_index=True))
+            rows += buffered
+
+        return rows
+
+    def _flush(self, code: str, ktype: str, df: "pd.DataFrame") -> str:
+        """"""
+        self.store.write(ktype, code, df)
+
+        last: str = df["time_key"].iloc[-1]
+        self.checkpoint.update(ktype, code, last)
+        return last
+
+
+def _parse_args(argv: Optional[List[str]], setting: dict) -> argparse.Namespace:
+    """"""
+    parser = argparse.ArgumentParser(
+        prog="python -m backtrader_futu.downloader",
+        description="Download history K-lines of the selected stock universe into Parquet files.",
+    )
+    parser.add_argument("--start", default=setting.get("start", ""), help="first day, YYYY-MM-DD")
+    parser.add_argument("--end", default=setting.get("end", ""), help="last day, YYYY-MM-DD, defaults to today")
+    parser.add_argument(
+        "--ktypes", nargs="+", default=setting.get("ktypes", DEFAULT_KTYPES), help="EKLType names, e.g. K_1M K_DAY"
+    )
+    parser.add_argument("--codes", nargs="+", default=None, help="futu codes, defaults to the selected stock list")
+    parser.add_argument("--exclude", action="store_true", help="skip symbols marked exclude in the stock list")
+    parser.add_argument("--jobs", type=int, default=setting.get("jobs", 4), help="jobs consuming pages at once")
+    parser.add_argument("--workers", type=int, default=setting.get("workers", 4), help="page requests in flight")
+    parser.add_argument("--root", default=setting.get("root", None), help="store folder")
+    parser.add_argument("--checkpoint", default=setting.get("checkpoint", None), help="checkpoint file")
+    parser.add_argument("--restart", action="store_true", help="delete the stored bars of the jobs and download everything")
+    return parser.parse_args(argv)
+
+
+def main(argv: List[str] = None) -> int:
+    """"""
+    from .connection_pool import get_context_pool
+    from .futu_utility import EKLType, get_selected_ft_stock_list, load_connect_setting
+
+    args: argparse.Namespace = _parse_args(argv, load_json(SETTING_FILE))
+    if not args.start:
+        print("--start is required unless set in " + SETTING_FILE)
+        return 2
+
+    invalid: List[str] = [ktype for ktype in args.ktypes if ktype not in EKLType.__members__]
+    if invalid:
+        print(f"unknown K-line types {invalid}, choose from {list(EKLType.__members__)}")
+        return 2
+
+    start: date = date.fromisoformat(args.start)
+    end: date = date.fromisoformat(args.end) if args.end else datetime.now(CHINA_TZ).date()
+    codes: List[str] = args.codes or get_selected_ft_stock_list(check_exclude=args.exclude)
+
+    quote_ctx = get_context_pool().acquire_quote(load_connect_setting())
+    downloader: UniverseDownloader = UniverseDownloader(
+        quote_ctx,
+        root=args.root,
+        checkpoint_path=args.checkpoint,
+        max_jobs=args.jobs,
+        max_workers=args.workers,
+    )
+
+    try:
+        if args.restart:
+            downloader.reset(codes, args.ktypes)
+
+        errors: Dict[Tuple[str, str], str] = downloader.download(codes, args.ktypes, start, end)
+    finally:
+        downloader.close()
+        quote_ctx.release()
+
+    print(f"downloaded {len(codes)} codes x {len(args.ktypes)} K-line types, {len(errors)} failed")
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,61 @@
+from __future__ import absolute_import, division, print_function, unicode_literals
+
+from datetime import datetime
+
+from backtrader.feed import DataBase
+from backtrader import date2num
+import backtrader as bt
+
+from ..bar_series import FrameAggregator
+from ..utility import CHINA_TZ
+
+
+class DerivedBarData(DataBase):
+    """
+    Bar feed reading the finished bars of one timeframe of a SharedTickIntake.
+
+    Created by FutuTickData.add_timeframe, the bars are stored once in the
+    intake and loaded from there, only the lines of this feed hold a copy.
+    Bars are stamped with their end, as backtrader resampled bars and futu
+    K-lines are.
+    """
+
+    params = (
+        ("frame", None),
+    )
+
+    def __init__(self, **kwargs):
+        frame: FrameAggregator = self.p.frame
+        if frame is None:
+            raise ValueError("DerivedBarData requires a frame, see FutuTickData.add_timeframe")
+
+        self.frame = frame
+        self.row = 0
+
+        seconds = frame.seconds
+        if seconds % 86400 == 0:
+            self.p.timeframe, self.p.compression = bt.TimeFrame.Days, seconds // 86400
+        elif seconds % 60 == 0:
+            self.p.timeframe, self.p.compression = bt.TimeFrame.Minutes, seconds // 60
+        else:
+            self.p.timeframe, self.p.compression = bt.TimeFrame.Seconds, seconds
+
+    def islive(self):
+        return True
+
+    def _load(self):
+        bar = self.frame.get_bar(self.row)
+        if bar is None:
+            return None
+
+        _, end, (open_price, high_price, low_price, close_price, volume, _) = bar
+        self.row += 1
+
+        self.lines.datetime[0] = date2num(datetime.fromtimestamp(end, CHINA_TZ).replace(tzinfo=None))
+        self.lines.open[0] = open_price
+        self.lines.high[0] = high_price
+        self.lines.low[0] = low_price
+        self.lines.close[0] = close_price
+        self.lines.volume[0] = volume
+        self.lines.openinterest[0] = 0
+        return True
@@ -1,6 +1,10 @@
 from __future__ import absolute_import, division, print_function, unicode_literals
 
-from datetime import timedelta
+from collections import deque
+from copy import copy
+from datetime import datetime, timedelta
+from threading import Lock
+import numpy as np
 import pandas as pd
 from backtrader.feed import DataBase
 from backtrader import date2num, num2date
@@ -8,36 +12,432 @@ from backtrader.utils.py3 import queue, with_metaclass
 import backtrader as bt
 
 from backtrader_futu.stores import futustore
+from ..bar_series import SharedTickIntake
+from ..line_spill import LineSpill
+from ..object import BarData, TickData
+from ..utility import CHINA_TZ
 from ..streamer import MsgType, _load_tick_lines
 
 
+def convert_bar_row(bar: BarData) -> dict:
+    """
+    Line values of a bar, datetime as naive China time like the ticks.
+    """
+    dt = bar.datetime
+    if dt.tzinfo is not None:
+        dt = dt.astimezone(CHINA_TZ).replace(tzinfo=None)
+
+    return {
+        "datetime": date2num(dt),
+        "open": bar.open_price,
+        "high": bar.high_price,
+        "low": bar.low_price,
+        "close": bar.close_price,
+        "volume": bar.volume,
+        "openinterest": bar.open_interest,
+    }
+
+
+# conflation policies, see FutuTickData
+CONFLATION_LOSSLESS = "lossless"
+CONFLATION_LATEST = "latest"
+CONFLATION_LATEST_VOLUME = "latest_volume"
+
+
+def _conflate_tick(old: TickData, new: TickData, aggregate_volume: bool) -> TickData:
+    """
+    Merge a newer quote into a pending one, keeping cumulative volume and the high/low in between.
+    """
+    tick = copy(new)
+    tick.volume = max(old.volume, new.volume)
+    tick.turnover = max(old.turnover, new.turnover)
+    tick.high_price = max(old.high_price, new.high_price)
+    if old.low_price and new.low_price:
+        tick.low_price = min(old.low_price, new.low_price)
+    if aggregate_volume:
+        tick.last_volume = old.last_volume + new.last_volume
+
+    old_extra = old.extra or {}
+    tick.extra = dict(
+        new.extra or {},
+        conflated=old_extra.get("conflated", 0) + 1,
+        high=max(old_extra.get("high", old.last_price), new.last_price),
+        low=min(old_extra.get("low", old.last_price), new.last_price),
+    )
+    return tick
+
+
 class FutuTickData(DataBase):
+    """
+    Live tick feed.
+
+    Messages pushed by add_tick wait in a queue until backtrader loads them.
+    The conflation param decides what happens when the strategy falls behind:
+
+    * lossless: every message is loaded
+    * latest: a pending quote of the symbol is replaced by the newer one,
+      keeping the highest cumulative volume and day high/low
+    * latest_volume: as latest, and last_volume is summed over the merged quotes
+
+    Merged ticks carry the number of merged updates and the high/low of
+    last_price since the pending one in extra["conflated"], extra["high"]
+    and extra["low"], merged_updates counts all merges of the feed.
+
+    add_timeframe derives bar feeds of several timeframes from this feed.
+    They share one SharedTickIntake, which sees every tick before conflation.
+
+    With rolling, the lines become fixed size ring buffers once the
+    strategies are running. The size is the largest strategy minimum
+    period, covering the lookback of their indicators, plus rolling_extra
+    for direct lookbacks such as data.close[-n], and at least rolling_size.
+    Values falling out of the buffers are appended to spill_path if set,
+    see line_spill.read_line_spill. Rolling is meant for live runs, which
+    do not preload.
+
+    The strategy indicators computed on the feed are bounded as well, as
+    with cerebro's exactbars: each line keeps its own minimum period plus
+    rolling_extra values. Observers and analyzers do not depend on the
+    feed and still grow, run long sessions with stdstats=False.
+
+    add_rows and add_bars queue stored or fetched values, e.g. from a
+    checkpoint or a gap backfill, ahead of later ticks. While they load the
+    feed notifies DELAYED and LIVE once they are through, so strategies can
+    tell warm-up bars from live ones.
+
+    hold keeps incoming ticks aside, e.g. while a gap after a reconnect is
+    fetched, and resume queues them behind whatever was added meanwhile.
+    Rows of add_bars advance last_volume by their volume when they load, as
+    the next tick's cumulative volume includes them.
+    """
+
     params = (
         ("useask", True),
+        ("latency_tracer", None),
+        # BarCloseScheduler closing bars at bar_seconds boundaries of calendar without waiting for the next tick
+        ("bar_scheduler", None),
+        ("bar_seconds", 60),
+        ("calendar", None),
+        ("conflation", CONFLATION_LATEST),
+        # smallest timeframe of add_timeframe feeds, the others must be multiples of it
+        ("base_seconds", 60),
+        ("rolling", False),
+        ("rolling_size", 0),
+        ("rolling_extra", 1),
+        ("spill_path", None),
     )
 
     def __init__(self, **kwargs):
-        self.msg = None
-        self.quote_update = False
+        if self.p.conflation not in (CONFLATION_LOSSLESS, CONFLATION_LATEST, CONFLATION_LATEST_VOLUME):
+            raise ValueError(f"unknown conflation {self.p.conflation}")
+
+        # (msg, quote_update)
+        self.pending = deque()
+        self.pending_lock = Lock()
+        self.merged_updates = 0
 
         self.last_volume = None
+        self.last_tick = None
+        self.intake = None
+
+        self.rolling_ready = False
+        self.spill = None
+
+        # rows queued by add_rows still to be loaded
+        self.backfill_rows = 0
+        # (msg, quote_update) kept aside between hold and resume
+        self.held = None
+
+        if self.p.bar_scheduler:
+            self.p.bar_scheduler.subscribe(self.new_minutes, self.p.bar_seconds, self.p.calendar)
+
+    def forward(self, value=float("nan"), size=1):
+        if self.p.rolling:
+            if not self.rolling_ready:
+                self._setup_rolling()
+            if self.spill:
+                self._spill_evicted(size)
+
+        super().forward(value, size)
+
+    def _setup_rolling(self):
+        """
+        Switch the lines to ring buffers sized from the running strategies.
+        """
+        strategies = getattr(self._env, "runningstrats", None) or []
+        size = max([self.p.rolling_size] + [strategy._minperiod for strategy in strategies])
+        size += self.p.rolling_extra
+
+        self.qbuffer(savemem=1)
+        for line in self.lines:
+            line.minbuffer(size)
+
+        for strategy in strategies:
+            for indicator in strategy._lineiterators[bt.LineIterator.IndType]:
+                if self._depends_on(indicator, set()):
+                    # sub-indicators included, their lines keep their minimum period
+                    indicator.qbuffer(savemem=1)
+                    self._extend_lines(indicator)
+
+        if self.p.spill_path:
+            self.spill = LineSpill(self.p.spill_path, self.lines.getlinealiases())
+
+        self.rolling_ready = True
+
+    def _depends_on(self, obj, seen) -> bool:
+        """
+        Whether an indicator, line operation or line reads, directly or not, the lines of this feed.
+        """
+        if obj is self:
+            return True
+        if id(obj) in seen:
+            return False
+        seen.add(id(obj))
+
+        sources = list(getattr(obj, "datas", [])) + list(getattr(obj, "_datas", []))
+        if not sources:
+            # a plain line, the owner of indicators and operations is the strategy instead
+            owner = getattr(obj, "_owner", None)
+            if owner is not None:
+                sources.append(owner)
+        return any(self._depends_on(source, seen) for source in sources)
+
+    def _extend_lines(self, obj):
+        """
+        Room for rolling_extra direct lookbacks on the lines of a bounded indicator and its sub-indicators.
+        """
+        for line in obj.lines:
+            line.minbuffer(line._minperiod + self.p.rolling_extra)
+        for child in getattr(obj, "_lineiterators", {}).get(bt.LineIterator.IndType, []):
+            self._extend_lines(child)
+
+    def _spill_evicted(self, size: int):
+        """
+        Write the oldest rows before forward pushes them out of the ring buffers.
+        """
+        arrays = [line.array for line in self.lines]
+        evicted = len(arrays[0]) + size - arrays[0].maxlen
+        if evicted > 0:
+            self.spill.write_rows([[values[i] for values in arrays] for i in range(min(evicted, len(arrays[0])))])
+
+    def stop(self):
+        if self.spill:
+            self.spill.close()
+            self.spill = None
 
     def _load(self):
-        if self.msg:
-            ret = self._load_tick(self.msg, self.quote_update)
-            self.msg = None
+        with self.pending_lock:
+            if not self.pending:
+                return False
+            msg, quote_update = self.pending.popleft()
+
+        if isinstance(msg, dict):
+            # for rows the flag tells whether they traded after the last tick
+            self._load_row(msg, quote_update)
+            return True
+
+        ret = self._load_tick(msg, quote_update)
+        if self.p.latency_tracer and isinstance(msg, TickData):
+            self.p.latency_tracer.on_load(msg.vt_symbol)
+
+        return ret
 
-            return ret
+    def _load_row(self, row, traded: bool):
+        # repeated notifications of the same status are dropped by backtrader
+        self.put_notification(self.DELAYED)
+        for alias, value in row.items():
+            getattr(self.lines, alias)[0] = value
 
-        return False
+        if traded and self.last_volume is not None:
+            # cumulative volume restarts with the day
+            if len(self) > 1 and int(self.lines.datetime[0]) != int(self.lines.datetime[-1]):
+                self.last_volume = None
+            else:
+                self.last_volume += row["volume"]
+
+        self.backfill_rows -= 1
+        if not self.backfill_rows:
+            self.put_notification(self.LIVE)
 
     def add_tick(self, msg, quote_update: bool):
-        self.msg = msg
-        self.quote_update = quote_update
+        if self.p.latency_tracer and isinstance(msg, TickData):
+            self.p.latency_tracer.on_tick(msg)
+
+        with self.pending_lock:
+            if self.held is not None:
+                self.held.append((msg, quote_update))
+                return
+
+        self._queue_tick(msg, quote_update)
+
+    def _queue_tick(self, msg, quote_update: bool):
+        if not isinstance(msg, TickData):
+            with self.pending_lock:
+                self.pending.append((msg, quote_update))
+            return
+
+        with self.pending_lock:
+            # intake, last_tick and pending change together, so new_minutes never queues its
+            # flush tick behind a newer tick and get_state never sees a tick in only some of them
+            if self.intake:
+                self.intake.on_tick(msg)
+            self.last_tick = msg
+            if self.p.conflation != CONFLATION_LOSSLESS and self.pending:
+                last_msg, last_quote_update = self.pending[-1]
+                if (
+                    isinstance(last_msg, TickData)
+                    and last_quote_update == quote_update
+                    and last_msg.vt_symbol == msg.vt_symbol
+                    and not (last_msg.extra and last_msg.extra.get("bar_close", False))
+                ):
+                    if quote_update:
+                        msg = _conflate_tick(last_msg, msg, self.p.conflation == CONFLATION_LATEST_VOLUME)
+                    self.pending[-1] = (msg, quote_update)
+                    self.merged_updates += 1
+                    return
+
+            self.pending.append((msg, quote_update))
+
+    def new_minutes(self, boundary: float = None):
+        """
+        Queue a copy of the last tick stamped at the bar boundary, without volume,
+        so the resampler closes the running bar at the boundary.
+        """
+        if boundary is None:
+            return
+
+        # the check and the append under one lock, a tick queued in between would end up before the flush tick
+        with self.pending_lock:
+            tick = self.last_tick
+            if tick is None or self.held is not None:
+                return
+
+            if self.intake:
+                self.intake.close_bar(boundary)
+
+            # naive tick times are China time, as everywhere in the package
+            dt = datetime.fromtimestamp(boundary, tick.datetime.tzinfo or CHINA_TZ)
+            if tick.datetime.tzinfo is None:
+                dt = dt.replace(tzinfo=None)
+            if dt <= tick.datetime:
+                return
+
+            flush_tick = copy(tick)
+            flush_tick.datetime = dt
+            flush_tick.last_volume = 0
+            flush_tick.extra = {"bar_close": True}
+
+            self.pending.append((flush_tick, True))
+
+    def add_timeframe(self, seconds: int, **kwargs):
+        """
+        Create a bar feed of the given timeframe sharing this feed's tick intake, add it to cerebro with adddata.
+        """
+        from .derivedbardata import DerivedBarData
+
+        if self.intake is None:
+            self.intake = SharedTickIntake(self.p.base_seconds, self.p.calendar)
+
+        frame = self.intake.add_frame(seconds)
+        return DerivedBarData(frame=frame, **kwargs)
+
+    def add_rows(self, rows, traded: bool = False):
+        """
+        Queue rows of line values by alias, e.g. {"datetime": ..., "close": ...}, ahead of later ticks.
+        """
+        if not rows:
+            return
+
+        with self.pending_lock:
+            self.pending.extend((row, traded) for row in rows)
+            self.backfill_rows += len(rows)
+
+    def add_bars(self, bars):
+        """
+        Queue bars traded after the last tick, e.g. a fetched gap, as rows ahead of later ticks.
+        """
+        if self.intake:
+            for bar in bars:
+                self.intake.on_bar(bar)
+        self.add_rows([convert_bar_row(bar) for bar in bars], traded=True)
+
+    def hold(self):
+        """
+        Keep incoming ticks aside until resume.
+        """
+        with self.pending_lock:
+            if self.held is None:
+                self.held = []
+
+    def get_held_start(self):
+        """
+        Datetime of the first tick kept aside, None if there is none yet.
+        """
+        with self.pending_lock:
+            for msg, _ in self.held or []:
+                if isinstance(msg, TickData):
+                    return msg.datetime
+        return None
+
+    def resume(self):
+        """
+        Queue the ticks kept aside since hold, in arrival order, and stop holding.
+        """
+        while True:
+            with self.pending_lock:
+                if not self.held:
+                    self.held = None
+                    return
+                # ticks arriving while these are queued are still kept aside, behind them
+                held, self.held = self.held, []
+
+            for msg, quote_update in held:
+                self._queue_tick(msg, quote_update)
+
+    def get_rows(self, depth: int):
+        """
+        Line values of the last depth loaded rows, oldest first, by alias.
+        """
+        size = min(depth, len(self))
+        if not size:
+            return {}
+        return {alias: np.array(line.get(0, size)) for alias, line in zip(self.lines.getlinealiases(), self.lines)}
+
+    def get_state(self, depth: int):
+        """
+        State for FeedCheckpoint: the last depth rows and last_volume as loaded,
+        the last tick, the intake and the ticks and rows queued but not loaded yet.
+
+        The intake and last_tick already include the queued ticks, so these are
+        stored with them rather than lost. Ticks kept aside by hold are not,
+        the gap fill after restore covers them.
+        """
+        with self.pending_lock:
+            queued = {
+                "last_tick": self.last_tick,
+                "intake": self.intake.get_state() if self.intake else None,
+                "pending": list(self.pending),
+            }
+
+        return {"rows": self.get_rows(depth), "last_volume": self.last_volume, **queued}
+
+    def set_state(self, state):
+        """
+        Restore a FeedCheckpoint state, the stored rows are queued to rebuild lines and indicators,
+        followed by the stored pending ticks and rows.
+        """
+        rows = state["rows"]
+        aliases = list(rows)
+        self.add_rows([dict(zip(aliases, values)) for values in zip(*(rows[alias].tolist() for alias in aliases))])
+
+        pending = [tuple(item) for item in state.get("pending", [])]
+        with self.pending_lock:
+            self.pending.extend(pending)
+            self.backfill_rows += sum(isinstance(msg, dict) for msg, _ in pending)
 
-    def new_minutes(self):
-        # self.last_volume = None
-        pass
+        self.last_volume = state["last_volume"]
+        self.last_tick = state["last_tick"]
+        if self.intake and state["intake"]:
+            self.intake.set_state(state["intake"])
 
     def _load_tick(self, msg, quote_update: bool):
         ret, self.last_volume = _load_tick_lines(self.lines, self.last_volume, msg, quote_update)
@@ -0,0 +1,152 @@
+"""
+Gap-only backfill of live feeds after a quote reconnect.
+
+When the pool replaces the quote context, every registered FutuTickData
+keeps its incoming ticks aside, the minute bars between its last tick and
+the first tick after the reconnect are fetched, and each feed gets its bars
+queued ahead of the ticks kept aside. Only the outage is requested, so
+latency and quota grow with its length rather than with the history held
+by the strategies.
+
+futu has no K-line request for several codes, so there is one request per
+feed. The requests run in parallel on a thread pool, all within the
+process-wide history limiter. The backfill itself runs on its own thread,
+never on the pool health check thread that reports the reconnect.
+"""
+
+import logging
+from concurrent.futures import Future, ThreadPoolExecutor
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterable, List, Optional
+
+from .connection_pool import QUOTE_CONTEXT, ContextPool, PoolKey
+from .object import BarData, HistoryRequest, Interval, TickData
+from .utility import CHINA_TZ
+
+
+def make_gap_request(tick: TickData, end: datetime = None) -> HistoryRequest:
+    """
+    Minute bars from the last tick to end, now by default.
+    """
+    return HistoryRequest(
+        symbol=tick.symbol,
+        exchange=tick.exchange,
+        start=tick.datetime,
+        end=end or datetime.now(CHINA_TZ),
+        interval=Interval.MINUTE,
+    )
+
+
+def select_gap_bars(
+    bars: Iterable[BarData], start: datetime, end: datetime = None, seconds: int = 60
+) -> List[BarData]:
+    """
+    Bars lying entirely after start and ending by end, now by default.
+
+    Futu stamps minute bars with their end time. The bar holding the last
+    processed tick is dropped, as its volume up to the tick is already
+    counted and the rest is in the cumulative volume of the next tick.
+    Likewise bars ending after end, including the bar still in progress,
+    are left to the live ticks.
+    """
+    end = end or datetime.now(CHINA_TZ)
+    span: timedelta = timedelta(seconds=seconds)
+    return [bar for bar in bars if bar.datetime - span > start and bar.datetime <= end]
+
+
+class GapBackfill:
+    """
+    Splices the bars missed during a quote disconnect into live feeds.
+    """
+
+    def __init__(self, fetcher, max_workers: int = 4, output: Callable = None) -> None:
+        """
+        :param fetcher: HistoryFetcher, its requests share the process-wide history limiter
+        """
+        self.fetcher = fetcher
+        self.output: Callable = output or print
+
+        self.feeds: Dict[str, object] = {}
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers, thread_name_prefix="GapBackfill")
+        # one backfill at a time, it waits for its requests on the executor above
+        self.runner: ThreadPoolExecutor = ThreadPoolExecutor(1, thread_name_prefix="GapBackfillRunner")
+
+    def add_feed(self, name: str, feed) -> None:
+        """
+        Register a FutuTickData, e.g. under its vt_symbol.
+        """
+        self.feeds[name] = feed
+
+    def remove_feed(self, name: str) -> None:
+        """"""
+        self.feeds.pop(name, None)
+
+    def attach(self, pool: ContextPool) -> None:
+        """
+        Backfill whenever the pool reconnects a quote context.
+        """
+        pool.add_reconnect_listener(self.on_reconnect)
+
+    def on_reconnect(self, key: PoolKey) -> Optional[Future]:
+        """
+        Start a backfill in the background and return at once, so the health
+        check goes on with the other contexts.
+        """
+        if key[0] != QUOTE_CONTEXT:
+            return None
+        return self.runner.submit(self._run_backfill)
+
+    def _run_backfill(self) -> None:
+        """"""
+        try:
+            self.backfill()
+        except Exception as e:
+            self.output(f"gap backfill failed: {e}", logging.WARNING)
+
+    def close(self) -> None:
+        """"""
+        self.runner.shutdown(wait=True, cancel_futures=True)
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def backfill(self, end: datetime = None) -> Dict[str, List[BarData]]:
+        """
+        Fetch and queue the gap of every feed that has seen a tick, return the bars by feed name.
+
+        Feeds whose request fails resume without a backfill.
+        """
+        feeds: Dict[str, object] = {name: feed for name, feed in self.feeds.items() if feed.last_tick is not None}
+
+        # the last processed tick of each feed marks the start of its gap
+        marks: Dict[str, TickData] = {}
+        for name, feed in feeds.items():
+            feed.hold()
+            marks[name] = feed.last_tick
+
+        results: Dict[str, List[BarData]] = {}
+        try:
+            futures: Dict[str, Future] = {
+                name: self.executor.submit(self.fetcher.query_history, make_gap_request(tick, end))
+                for name, tick in marks.items()
+            }
+
+            for name, future in futures.items():
+                feed = feeds[name]
+                try:
+                    bars: List[BarData] = future.result()
+                except Exception as e:
+                    self.output(f"gap backfill of {name} failed: {e}", logging.WARNING)
+                    feed.resume()
+                    continue
+
+                # bars overlapping the first live tick are left to it
+                live_start: Optional[datetime] = feed.get_held_start()
+                results[name] = select_gap_bars(bars, marks[name].datetime, live_start or end)
+                feed.add_bars(results[name])
+                feed.resume()
+        finally:
+            for feed in feeds.values():
+                feed.resume()
+
+        count: int = sum(len(bars) for bars in results.values())
+        self.output(f"gap backfill queued {count} bars for {len(results)} feeds")
+        return results
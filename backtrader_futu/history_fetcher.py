@@ -0,0 +1,309 @@
+"""
+Concurrent paged history K-line fetcher.
+
+A long range is split into date chunks which are fetched concurrently on a
+thread pool. Inside a chunk the pages are requested one after another, and
+each worker asks for the next page as soon as it has handed the current one
+over, so page requests overlap with parsing in the consumer. Bars are still
+yielded in time order, chunk by chunk, as soon as they arrive.
+
+Every page request takes a token from a limiter shared by the whole process,
+which keeps all fetchers within the OpenD history K-line frequency limit.
+
+Futu formats K-line times in the local time of the market, e.g. US/Eastern
+for US stocks, so request dates are built and bar times localized in the
+timezone of the requested exchange.
+"""
+
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import date, datetime, timedelta
+from queue import Queue
+from threading import Event, Lock
+from typing import TYPE_CHECKING, Callable, Deque, Dict, Iterator, List, Optional, Tuple
+
+from .object import BarData, HistoryRequest, Interval
+from .ratelimit import TokenBucket
+from .session_calendar import get_exchange_timezone
+from .utility import ZoneInfo
+
+if TYPE_CHECKING:
+    import pandas as pd
+
+
+# futu: at most 60 history K-line requests in 30 seconds
+HISTORY_LIMIT: Tuple[int, float] = (60, 30.0)
+
+INTERVAL_VT2FUTU: Dict[Interval, str] = {
+    Interval.MINUTE: "K_1M",
+    Interval.HOUR: "K_60M",
+    Interval.DAILY: "K_DAY",
+    Interval.WEEKLY: "K_WEEK",
+}
+INTERVAL_FUTU2VT: Dict[str, Interval] = {v: k for k, v in INTERVAL_VT2FUTU.items()}
+
+# calendar days per chunk, about ten pages of bars for intraday K-line types
+CHUNK_DAYS: Dict[str, int] = {
+    "K_1M": 30,
+    "K_3M": 90,
+    "K_5M": 150,
+    "K_15M": 365,
+    "K_30M": 730,
+    "K_60M": 1460,
+}
+DEFAULT_CHUNK_DAYS: int = 3650
+
+_DONE: object = object()
+
+
+class HistoryFetchError(Exception):
+    """
+    Raised when a history K-line request failed.
+    """
+
+
+class _ChunkTask:
+    """
+    Pages of one chunk, handed from its worker to the consumer.
+
+    The queue is unbounded so later chunks keep fetching while the consumer
+    is still on an earlier one, memory is bounded by the chunks in flight.
+    """
+
+    def __init__(self, start: str, end: str) -> None:
+        """"""
+        self.start: str = start
+        self.end: str = end
+        self.queue: Queue = Queue()
+        self.cancelled: Event = Event()
+
+
+def split_range(start: date, end: date, chunk_days: int) -> List[Tuple[str, str]]:
+    """
+    Split [start, end] into consecutive inclusive date ranges.
+    """
+    chunks: List[Tuple[str, str]] = []
+    step: timedelta = timedelta(days=chunk_days)
+
+    chunk_start: date = start
+    while chunk_start <= end:
+        chunk_end: date = min(end, chunk_start + step - timedelta(days=1))
+        chunks.append((chunk_start.isoformat(), chunk_end.isoformat()))
+        chunk_start = chunk_end + timedelta(days=1)
+
+    return chunks
+
+
+class HistoryFetcher:
+    """
+    Fetches history K-lines with concurrent chunks and page prefetch.
+    """
+
+    def __init__(
+        self,
+        quote_ctx,
+        limiter: TokenBucket = None,
+        max_workers: int = 4,
+        page_size: int = 1000,
+        autype: str = "qfq",
+        max_retries: int = 3,
+        gateway_name: str = "FUTU",
+        output: Callable = None,
+    ) -> None:
+        """
+        :param limiter: bucket for page requests, defaults to the process-wide history limiter
+        """
+        self.quote_ctx = quote_ctx
+        self.limiter: TokenBucket = limiter or get_history_limiter()
+        self.max_workers: int = max_workers
+        self.page_size: int = page_size
+        self.autype: str = autype
+        self.max_retries: int = max_retries
+        self.gateway_name: str = gateway_name
+        self.output: Callable = output or print
+
+        self.executor: ThreadPoolExecutor = ThreadPoolExecutor(max_workers, thread_name_prefix="HistoryFetcher")
+
+    def close(self) -> None:
+        """"""
+        self.executor.shutdown(wait=True, cancel_futures=True)
+
+    def query_history(self, req: HistoryRequest) -> List[BarData]:
+        """"""
+        return list(self.iter_bars(req))
+
+    def iter_bars(self, req: HistoryRequest) -> Iterator[BarData]:
+        """
+        Yield the bars of the request in time order while later pages are still being fetched.
+        """
+        from .futu_utility import convert_symbol_vt2futu
+
+        ktype: Optional[str] = INTERVAL_VT2FUTU.get(req.interval, None)
+        if ktype is None:
+            raise ValueError(f"interval {req.interval} not supported for history K-line")
+
+        code: str = convert_symbol_vt2futu(req.symbol, req.exchange)
+        tz: ZoneInfo = get_exchange_timezone(req.exchange)
+        end: datetime = req.end or datetime.now(tz)
+
+        start_dt: datetime = _to_market_time(req.start, tz)
+        end_dt: datetime = _to_market_time(end, tz)
+
+        for df in self.iter_frames(code, ktype, start_dt.date(), end_dt.date()):
+            for bar in self.parse_bars(df, req, ktype):
+                if start_dt <= bar.datetime <= end_dt:
+                    yield bar
+
+    def iter_frames(
+        self, code: str, ktype: str, start: date, end: date, chunk_days: int = None
+    ) -> Iterator["pd.DataFrame"]:
+        """
+        Yield the raw K-line pages of [start, end] in time order.
+
+        At most max_workers chunks are in flight, the next one is submitted
+        whenever the consumer has finished a chunk.
+        """
+        chunk_days = chunk_days or CHUNK_DAYS.get(ktype, DEFAULT_CHUNK_DAYS)
+        chunks: Iterator[Tuple[str, str]] = iter(split_range(start, end, chunk_days))
+        tasks: Deque[_ChunkTask] = deque()
+
+        def submit_next() -> None:
+            chunk: Optional[Tuple[str, str]] = next(chunks, None)
+            if chunk:
+                task: _ChunkTask = _ChunkTask(*chunk)
+                tasks.append(task)
+                self.executor.submit(self._fetch_chunk, code, ktype, task)
+
+        for _ in range(self.max_workers):
+            submit_next()
+
+        try:
+            while tasks:
+                task: _ChunkTask = tasks[0]
+                item: object = task.queue.get()
+
+                if item is _DONE:
+                    tasks.popleft()
+                    submit_next()
+                elif isinstance(item, Exception):
+                    raise item
+                else:
+                    yield item
+        finally:
+            # consumer stopped early or failed: stop the workers after their current page
+            for task in tasks:
+                task.cancelled.set()
+
+    def _fetch_chunk(self, code: str, ktype: str, task: _ChunkTask) -> None:
+        """
+        Request the pages of one chunk, fetching the next page while the current one is consumed.
+        """
+        page_req_key: Optional[bytes] = None
+
+        try:
+            while not task.cancelled.is_set():
+                df, page_req_key = self._request_page(code, ktype, task.start, task.end, page_req_key)
+                if not df.empty:
+                    task.queue.put(df)
+                if page_req_key is None:
+                    break
+        except Exception as e:
+            task.queue.put(e)
+            return
+
+        task.queue.put(_DONE)
+
+    def _request_page(
+        self, code: str, ktype: str, start: str, end: str, page_req_key: Optional[bytes]
+    ) -> Tuple["pd.DataFrame", Optional[bytes]]:
+        """"""
+        import futu as ft
+
+        for _ in range(self.max_retries + 1):
+            self.limiter.acquire()
+            ret, data, next_key = self.quote_ctx.request_history_kline(
+                code,
+                start=start,
+                end=end,
+                ktype=ktype,
+                autype=self.autype,
+                max_count=self.page_size,
+                page_req_key=page_req_key,
+            )
+            if ret == ft.RET_OK:
+                return data, next_key
+
+            msg: str = str(data)
+            if "频率" in msg or "frequen" in msg.lower():
+                # the server counted more requests than our bucket: back off and retry
+                self.output(f"history K-line {code} rate limited by server, retrying", logging.WARNING)
+                self.limiter.drain()
+                continue
+
+            raise HistoryFetchError(f"history K-line {code} {ktype} {start}~{end} failed: {msg}")
+
+        raise HistoryFetchError(f"history K-line {code} {ktype} {start}~{end} rate limited {self.max_retries} times")
+
+    def parse_bars(self, df: "pd.DataFrame", req: HistoryRequest, ktype: str) -> List[BarData]:
+        """
+        Convert one K-line page into BarData, column-wise rather than per row.
+        """
+        import pandas as pd
+
+        tz: ZoneInfo = get_exchange_timezone(req.exchange)
+        times: List[datetime] = [
+            dt.replace(tzinfo=tz)
+            for dt in pd.to_datetime(df["time_key"], format="%Y-%m-%d %H:%M:%S").dt.to_pydatetime()
+        ]
+        interval: Optional[Interval] = INTERVAL_FUTU2VT.get(ktype, None)
+
+        return [
+            BarData(
+                gateway_name=self.gateway_name,
+                symbol=req.symbol,
+                exchange=req.exchange,
+                datetime=dt,
+                interval=interval,
+                volume=volume,
+                turnover=turnover,
+                open_price=open_price,
+                high_price=high_price,
+                low_price=low_price,
+                close_price=close_price,
+            )
+            for dt, open_price, high_price, low_price, close_price, volume, turnover in zip(
+                times,
+                df["open"].tolist(),
+                df["high"].tolist(),
+                df["low"].tolist(),
+                df["close"].tolist(),
+                df["volume"].tolist(),
+                df["turnover"].tolist(),
+            )
+        ]
+
+
+def _to_market_time(dt: datetime, tz: ZoneInfo) -> datetime:
+    """
+    Convert to market local time, naive datetimes are taken as market local already.
+    """
+    if dt.tzinfo is None:
+        return dt.replace(tzinfo=tz)
+    return dt.astimezone(tz)
+
+
+_history_limiter: Optional[TokenBucket] = None
+_history_limiter_lock: Lock = Lock()
+
+
+def get_history_limiter() -> TokenBucket:
+    """
+    Get the process-wide bucket for history K-line requests.
+    """
+    global _history_limiter
+
+    with _history_limiter_lock:
+        if _history_limiter is None:
+            _history_limiter = TokenBucket.for_window(*HISTORY_LIMIT)
+        return _history_limiter
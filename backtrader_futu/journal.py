@@ -0,0 +1,388 @@
+"""
+Background columnar journal of TradeData and OrderData.
+
+Records are buffered in column lists on a writer thread and flushed to
+Parquet files partitioned by date and strategy:
+
+    <root>/<kind>/date=YYYY-MM-DD/strategy=<strategy_class_name>/part-*.parquet
+
+Records that cannot be converted to the schema, and buffers whose write
+still fails after max_retries flushes or at stop, are written as JSON lines
+to <root>/quarantine instead, so one bad record never blocks its partition.
+
+pyarrow is only imported by the writer thread and by read_journal.
+"""
+
+import importlib.util
+import logging
+import time
+from datetime import date, datetime
+from enum import Enum
+from operator import attrgetter
+from pathlib import Path
+from queue import Empty, SimpleQueue
+from threading import Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from .object import OrderData, TradeData
+from .utility import CHINA_TZ, get_folder_path
+
+
+TRADE_KIND: str = "trades"
+ORDER_KIND: str = "orders"
+
+DEFAULT_STRATEGY: str = "default"
+
+TRADE_FIELDS: List[str] = [
+    "gateway_name",
+    "vt_symbol",
+    "symbol",
+    "exchange",
+    "orderid",
+    "tradeid",
+    "direction",
+    "offset",
+    "price",
+    "volume",
+    "datetime",
+    "strategy_class_name",
+]
+
+ORDER_FIELDS: List[str] = [
+    "gateway_name",
+    "vt_symbol",
+    "symbol",
+    "exchange",
+    "orderid",
+    "type",
+    "direction",
+    "offset",
+    "price",
+    "volume",
+    "traded",
+    "status",
+    "datetime",
+    "reference",
+    "strategy_class_name",
+]
+
+FIELDS: Dict[str, List[str]] = {TRADE_KIND: TRADE_FIELDS, ORDER_KIND: ORDER_FIELDS}
+
+FLOAT_FIELDS = {"price", "volume", "traded"}
+
+QUARANTINE_FOLDER: str = "quarantine"
+
+
+def _get_schema(kind: str):
+    """"""
+    import pyarrow as pa
+
+    columns: list = []
+    for name in FIELDS[kind]:
+        if name == "datetime":
+            columns.append((name, pa.timestamp("us", tz="UTC")))
+        elif name in FLOAT_FIELDS:
+            columns.append((name, pa.float64()))
+        else:
+            columns.append((name, pa.string()))
+    columns.append(("journal_time", pa.timestamp("us", tz="UTC")))
+
+    return pa.schema(columns)
+
+
+def _convert_value(value: Any) -> Any:
+    """"""
+    if isinstance(value, Enum):
+        return value.name
+    elif isinstance(value, datetime) and value.tzinfo is None:
+        return value.replace(tzinfo=CHINA_TZ)
+    return value
+
+
+class TradeJournal:
+    """
+    Asynchronous Parquet journal for fills and order updates.
+
+    add_trade/add_order only snapshot the record fields and put them on a
+    queue; conversion and file I/O happen on the writer thread. Buffers are
+    flushed when max_rows records are pending or every flush_interval seconds.
+    """
+
+    def __init__(
+        self,
+        root: str = None,
+        max_rows: int = 10000,
+        flush_interval: float = 5.0,
+        max_retries: int = 3,
+        output: Callable = None,
+    ) -> None:
+        """
+        :param max_retries: failed writes of a buffer before it is quarantined
+        """
+        if importlib.util.find_spec("pyarrow") is None:
+            raise ImportError("pyarrow is required by TradeJournal")
+
+        self.root: Path = Path(root) if root else get_folder_path("journal")
+        self.max_rows: int = max_rows
+        self.flush_interval: float = flush_interval
+        self.max_retries: int = max_retries
+        self.output: Callable = output or print
+
+        self.getters: Dict[str, attrgetter] = {kind: attrgetter(*fields) for kind, fields in FIELDS.items()}
+
+        self.queue: SimpleQueue = SimpleQueue()
+        self.buffers: Dict[Tuple[str, date, str], Dict[str, list]] = {}
+        self.failures: Dict[Tuple[str, date, str], int] = {}
+        self.pending: int = 0
+        # records buffered since the last flush, failed buffers waiting for a retry do not count
+        self.added: int = 0
+        self.file_count: int = 0
+
+        self.quarantined: int = 0
+        self.lost: int = 0
+
+        self.active: bool = False
+        self.thread: Optional[Thread] = None
+
+    def start(self) -> None:
+        """"""
+        if self.active:
+            return
+
+        self.active = True
+        self.thread = Thread(target=self.run, name="TradeJournal", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """
+        Stop the writer thread after flushing everything queued so far.
+
+        Buffers whose write still fails are quarantined, records neither
+        written nor quarantined are reported as lost.
+        """
+        if not self.active:
+            return
+
+        self.active = False
+        self.queue.put(None)
+        self.thread.join()
+        self.thread = None
+
+        if self.quarantined or self.lost:
+            self.output(
+                f"journal stopped with {self.quarantined} records quarantined in "
+                f"{self.root.joinpath(QUARANTINE_FOLDER)} and {self.lost} records lost",
+                logging.WARNING,
+            )
+
+    def add_trade(self, trade: TradeData) -> None:
+        """"""
+        self.queue.put((TRADE_KIND, self.getters[TRADE_KIND](trade), time.time()))
+
+    def add_order(self, order: OrderData) -> None:
+        """"""
+        self.queue.put((ORDER_KIND, self.getters[ORDER_KIND](order), time.time()))
+
+    def run(self) -> None:
+        """"""
+        last_flush: float = time.monotonic()
+
+        while True:
+            timeout: float = max(0, last_flush + self.flush_interval - time.monotonic())
+            try:
+                item = self.queue.get(timeout=timeout)
+            except Empty:
+                item = False
+
+            if item is None:
+                # drain anything queued before stop
+                while True:
+                    try:
+                        item = self.queue.get_nowait()
+                    except Empty:
+                        break
+                    if item:
+                        self._buffer(*item)
+                self.flush()
+
+                for key in list(self.buffers):
+                    self._quarantine(key, self.buffers.pop(key), "journal stopped")
+                self.failures.clear()
+                self.pending = 0
+                return
+
+            if item:
+                self._buffer(*item)
+
+            if self.added >= self.max_rows or time.monotonic() - last_flush >= self.flush_interval:
+                self.flush()
+                last_flush = time.monotonic()
+
+    def _buffer(self, kind: str, values: tuple, journal_time: float) -> None:
+        """"""
+        fields: List[str] = FIELDS[kind]
+        record: Dict[str, Any] = dict(zip(fields, map(_convert_value, values)))
+
+        dt: Optional[datetime] = record["datetime"]
+        day: date = dt.date() if dt else datetime.now(CHINA_TZ).date()
+        strategy: str = record["strategy_class_name"] or DEFAULT_STRATEGY
+
+        key: Tuple[str, date, str] = (kind, day, strategy)
+        columns: Optional[Dict[str, list]] = self.buffers.get(key, None)
+        if columns is None:
+            columns = {name: [] for name in fields + ["journal_time"]}
+            self.buffers[key] = columns
+
+        for name, value in record.items():
+            columns[name].append(value)
+        columns["journal_time"].append(datetime.fromtimestamp(journal_time, CHINA_TZ))
+
+        self.pending += 1
+        self.added += 1
+
+    def flush(self) -> None:
+        """
+        Write all buffered records, called on the writer thread.
+
+        A buffer whose write failed with an OSError is kept and written again
+        by the next flush, up to max_retries times. Other failures are permanent
+        and quarantine the buffer at once.
+        """
+        self.added = 0
+        if not self.pending:
+            return
+
+        for key, columns in list(self.buffers.items()):
+            error: Optional[Exception] = self._write(key, columns)
+            if error is None:
+                self.failures.pop(key, None)
+            else:
+                failures: int = self.failures.get(key, 0) + 1
+                if isinstance(error, OSError) and failures < self.max_retries:
+                    self.failures[key] = failures
+                    continue
+
+                self.failures.pop(key, None)
+                self._quarantine(key, columns, f"write failed {failures} times: {error}")
+
+            del self.buffers[key]
+            self.pending -= len(columns["journal_time"])
+
+    def _write(self, key: Tuple[str, date, str], columns: Dict[str, list]) -> Optional[Exception]:
+        """
+        Write a buffer as one part file, returning the error of a failed write.
+
+        Records that do not convert to the schema are quarantined and dropped
+        from the buffer, the remaining ones are written.
+        """
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        kind, day, strategy = key
+        schema = _get_schema(kind)
+
+        try:
+            table = pa.Table.from_pydict(columns, schema=schema)
+        except (pa.ArrowException, TypeError, ValueError) as e:
+            # rows failing only together are quarantined as a whole
+            bad_rows: List[int] = _find_bad_rows(columns, schema) or list(range(len(columns["journal_time"])))
+            self._quarantine(key, _take_rows(columns, bad_rows), f"conversion failed: {e}")
+
+            bad: set = set(bad_rows)
+            good_rows: List[int] = [i for i in range(len(columns["journal_time"])) if i not in bad]
+            for name, values in _take_rows(columns, good_rows).items():
+                columns[name][:] = values
+            self.pending -= len(bad_rows)
+
+            if not good_rows:
+                return None
+            table = pa.Table.from_pydict(columns, schema=schema)
+
+        folder: Path = self.root.joinpath(kind, f"date={day.isoformat()}", f"strategy={strategy}")
+        self.file_count += 1
+        path: Path = folder.joinpath(f"part-{time.time_ns()}-{self.file_count}.parquet")
+
+        try:
+            folder.mkdir(parents=True, exist_ok=True)
+            pq.write_table(table, str(path))
+        except Exception as e:
+            self.output(f"failed to write journal {path}: {e}", logging.ERROR)
+            # a partly written file would be read back as a corrupt part
+            if path.is_file():
+                path.unlink()
+            return e
+
+        return None
+
+    def _quarantine(self, key: Tuple[str, date, str], columns: Dict[str, list], reason: str) -> None:
+        """
+        Write records that cannot go to their partition as JSON lines under the quarantine folder.
+        """
+        import orjson
+
+        count: int = len(columns["journal_time"])
+        if not count:
+            return
+
+        kind, day, strategy = key
+        folder: Path = self.root.joinpath(QUARANTINE_FOLDER)
+        self.file_count += 1
+        path: Path = folder.joinpath(f"{kind}-{time.time_ns()}-{self.file_count}.jsonl")
+
+        names: List[str] = list(columns)
+        try:
+            folder.mkdir(parents=True, exist_ok=True)
+            with open(path, "wb") as f:
+                for values in zip(*columns.values()):
+                    record: dict = {"kind": kind, "date": day, "strategy": strategy, "reason": reason}
+                    record.update(zip(names, values))
+                    f.write(orjson.dumps(record, default=str, option=orjson.OPT_APPEND_NEWLINE))
+        except Exception as e:
+            self.output(f"failed to quarantine {count} journal records of {key}: {e}", logging.ERROR)
+            self.lost += count
+            return
+
+        self.quarantined += count
+        self.output(f"quarantined {count} journal records of {key} in {path}: {reason}", logging.WARNING)
+
+
+def _find_bad_rows(columns: Dict[str, list], schema) -> List[int]:
+    """
+    Rows that do not convert to the schema on their own.
+    """
+    import pyarrow as pa
+
+    bad_rows: List[int] = []
+    for i in range(len(columns["journal_time"])):
+        try:
+            pa.Table.from_pydict(_take_rows(columns, [i]), schema=schema)
+        except (pa.ArrowException, TypeError, ValueError):
+            bad_rows.append(i)
+    return bad_rows
+
+
+def _take_rows(columns: Dict[str, list], rows: List[int]) -> Dict[str, list]:
+    """"""
+    return {name: [values[i] for i in rows] for name, values in columns.items()}
+
+
+def read_journal(kind: str, day: date, strategy: str = "", root: str = None):
+    """
+    Read one day of journal records as a pyarrow Table.
+    """
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    root_path: Path = Path(root) if root else get_folder_path("journal")
+    folder: Path = root_path.joinpath(kind, f"date={day.isoformat()}")
+    if strategy:
+        folder = folder.joinpath(f"strategy={strategy}")
+
+    schema = _get_schema(kind)
+    if not folder.exists():
+        return schema.empty_table()
+
+    tables: list = [pq.read_table(str(path), schema=schema) for path in sorted(folder.rglob("*.parquet"))]
+    if not tables:
+        return schema.empty_table()
+    return pa.concat_tables(tables)
@@ -0,0 +1,349 @@
+"""
+End-to-end tick latency tracing.
+
+A tick is stamped at three points:
+    * receipt   - when the futu SDK callback hands the tick to us
+    * load      - when the feed loads the tick into its lines
+    * deliver   - when the strategy sees the tick
+
+The exchange-to-receipt delay covers OpenD and the network, receipt-to-load
+is queueing inside our process and load-to-deliver is backtrader/strategy
+processing.
+"""
+
+import logging
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime
+from threading import Lock
+from typing import Callable, Deque, Dict, List, Optional
+
+from .object import TickData
+
+
+US_PER_SECOND: int = 1_000_000
+
+# stage names used as histogram keys
+EXCHANGE_TO_RECEIPT: str = "exchange_to_receipt"
+RECEIPT_TO_LOAD: str = "receipt_to_load"
+LOAD_TO_DELIVER: str = "load_to_deliver"
+RECEIPT_TO_DELIVER: str = "receipt_to_deliver"
+
+STAGES: List[str] = [EXCHANGE_TO_RECEIPT, RECEIPT_TO_LOAD, LOAD_TO_DELIVER, RECEIPT_TO_DELIVER]
+
+
+class LatencyHistogram:
+    """
+    HDR-style log-linear histogram of latencies in microseconds.
+
+    Values below 2 ** sub_bucket_bits are counted exactly, above that every
+    power of two is split into 2 ** (sub_bucket_bits - 1) buckets, so the
+    relative error stays below 1 / 2 ** (sub_bucket_bits - 1).
+    """
+
+    def __init__(self, sub_bucket_bits: int = 7, max_value_bits: int = 40) -> None:
+        """"""
+        self.sub_bucket_bits: int = sub_bucket_bits
+        self.max_value: int = (1 << max_value_bits) - 1
+
+        self.counts: List[int] = [0] * (self._index(self.max_value) + 1)
+        self.count: int = 0
+        self.negative: int = 0
+        self.total: int = 0
+        self.min: int = 0
+        self.max: int = 0
+
+    def _index(self, value: int) -> int:
+        """"""
+        bits: int = self.sub_bucket_bits
+        if value < (1 << bits):
+            return value
+
+        shift: int = value.bit_length() - bits
+        return (shift << (bits - 1)) + (value >> shift)
+
+    def _highest_equivalent(self, index: int) -> int:
+        """"""
+        bits: int = self.sub_bucket_bits
+        if index < (1 << bits):
+            return index
+
+        shift: int = (index >> (bits - 1)) - 1
+        mantissa: int = index - (shift << (bits - 1))
+        return ((mantissa + 1) << shift) - 1
+
+    def record(self, value: int) -> None:
+        """
+        Record one latency value in microseconds.
+
+        Negative values (possible with clock skew) are counted separately
+        and recorded as zero.
+        """
+        if value < 0:
+            self.negative += 1
+            value = 0
+        elif value > self.max_value:
+            value = self.max_value
+
+        self.counts[self._index(value)] += 1
+
+        if not self.count or value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+
+        self.count += 1
+        self.total += value
+
+    def percentile(self, q: float) -> int:
+        """
+        Return the value at percentile q (0-100).
+        """
+        if not self.count:
+            return 0
+
+        target: int = max(1, int(round(self.count * q / 100)))
+        seen: int = 0
+        for index, n in enumerate(self.counts):
+            if not n:
+                continue
+            seen += n
+            if seen >= target:
+                return min(self._highest_equivalent(index), self.max)
+
+        return self.max
+
+    def mean(self) -> float:
+        """"""
+        if not self.count:
+            return 0
+        return self.total / self.count
+
+    def merge(self, other: "LatencyHistogram") -> None:
+        """
+        Add the counts of another histogram with the same layout.
+        """
+        if not other.count:
+            return
+
+        for index, n in enumerate(other.counts):
+            if n:
+                self.counts[index] += n
+
+        if not self.count or other.min < self.min:
+            self.min = other.min
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.negative += other.negative
+        self.total += other.total
+
+    def reset(self) -> None:
+        """"""
+        self.counts = [0] * len(self.counts)
+        self.count = 0
+        self.negative = 0
+        self.total = 0
+        self.min = 0
+        self.max = 0
+
+    def summary(self) -> dict:
+        """
+        Summary statistics in microseconds.
+        """
+        return {
+            "count": self.count,
+            "negative": self.negative,
+            "min": self.min,
+            "mean": round(self.mean(), 1),
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "p999": self.percentile(99.9),
+            "max": self.max,
+        }
+
+
+@dataclass
+class ClockSkew:
+    """
+    Clock skew estimate of one market, in microseconds.
+
+    The exchange time of a tick can never be later than its receipt time,
+    so a negative minimum delay over the recent window means the local clock
+    is behind the exchange clock by at least that much.
+    """
+
+    market: str
+    offset: int = 0
+    window_min: int = 0
+    detected: bool = False
+
+
+class LatencyTracer:
+    """
+    Collects per-symbol and per-market latency histograms for ticks.
+    """
+
+    def __init__(
+        self,
+        skew_window: int = 1000,
+        skew_tolerance: float = 0.05,
+        sub_bucket_bits: int = 7,
+        output: Callable = None,
+    ) -> None:
+        """
+        :param skew_window: number of recent exchange-to-receipt samples used for skew detection
+        :param skew_tolerance: negative delay in seconds tolerated before reporting skew
+        """
+        self.skew_window: int = skew_window
+        self.skew_tolerance: int = int(skew_tolerance * US_PER_SECOND)
+        self.sub_bucket_bits: int = sub_bucket_bits
+        self.output: Callable = output or print
+
+        self.symbol_histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self.market_histograms: Dict[str, Dict[str, LatencyHistogram]] = {}
+        self.skews: Dict[str, ClockSkew] = {}
+
+        self._markets: Dict[str, str] = {}
+        self._skew_samples: Dict[str, Deque[int]] = {}
+        self._receipt_ns: Dict[str, int] = {}
+        self._load_ns: Dict[str, int] = {}
+
+        self._lock: Lock = Lock()
+
+    def _get_histograms(self, vt_symbol: str, market: str) -> List[Dict[str, LatencyHistogram]]:
+        """"""
+        result: List[Dict[str, LatencyHistogram]] = []
+
+        for histograms, key in ((self.symbol_histograms, vt_symbol), (self.market_histograms, market)):
+            stage_histograms: Optional[Dict[str, LatencyHistogram]] = histograms.get(key, None)
+            if stage_histograms is None:
+                stage_histograms = {stage: LatencyHistogram(self.sub_bucket_bits) for stage in STAGES}
+                histograms[key] = stage_histograms
+            result.append(stage_histograms)
+
+        return result
+
+    def _record(self, vt_symbol: str, stage: str, value: int) -> None:
+        """"""
+        market: str = self._markets.get(vt_symbol, "")
+        for stage_histograms in self._get_histograms(vt_symbol, market):
+            stage_histograms[stage].record(value)
+
+    def _update_skew(self, market: str, delay: int) -> int:
+        """
+        Track the windowed minimum delay and return the correction to apply.
+        """
+        samples: Optional[Deque[int]] = self._skew_samples.get(market, None)
+        if samples is None:
+            samples = deque(maxlen=self.skew_window)
+            self._skew_samples[market] = samples
+            self.skews[market] = ClockSkew(market)
+
+        evicted: Optional[int] = samples[0] if len(samples) == samples.maxlen else None
+        samples.append(delay)
+
+        skew: ClockSkew = self.skews[market]
+        if delay <= skew.window_min or len(samples) == 1:
+            skew.window_min = delay
+        elif evicted == skew.window_min:
+            # the old minimum left the window
+            skew.window_min = min(samples)
+
+        detected: bool = skew.window_min < -self.skew_tolerance
+        if detected and not skew.detected:
+            self.output(
+                f"clock skew detected for market {market}: local clock is behind "
+                f"the exchange clock by at least {-skew.window_min / US_PER_SECOND:.3f}s",
+                logging.WARNING,
+            )
+        skew.detected = detected
+        skew.offset = skew.window_min if detected else 0
+
+        return skew.offset
+
+    def on_receipt(
+        self,
+        vt_symbol: str,
+        market: str,
+        exchange_time: datetime,
+        receipt_time: datetime = None,
+    ) -> None:
+        """
+        Stamp a tick at SDK receipt.
+
+        Naive datetimes are interpreted as local time.
+        """
+        now_ns: int = time.perf_counter_ns()
+        if receipt_time is None:
+            receipt_time = datetime.now()
+
+        delay: int = int((receipt_time.timestamp() - exchange_time.timestamp()) * US_PER_SECOND)
+
+        with self._lock:
+            self._markets[vt_symbol] = market
+            self._receipt_ns[vt_symbol] = now_ns
+            self._load_ns.pop(vt_symbol, None)
+
+            offset: int = self._update_skew(market, delay)
+            self._record(vt_symbol, EXCHANGE_TO_RECEIPT, delay - offset)
+
+    def on_tick(self, tick: TickData) -> None:
+        """
+        Stamp a TickData at SDK receipt, using its localtime when set.
+        """
+        self.on_receipt(tick.vt_symbol, tick.exchange.value, tick.datetime, tick.localtime)
+
+    def on_load(self, vt_symbol: str) -> None:
+        """
+        Stamp the most recent tick of a symbol when the feed loads it.
+        """
+        now_ns: int = time.perf_counter_ns()
+
+        with self._lock:
+            receipt_ns: Optional[int] = self._receipt_ns.get(vt_symbol, None)
+            if receipt_ns is None or vt_symbol in self._load_ns:
+                return
+
+            self._load_ns[vt_symbol] = now_ns
+            self._record(vt_symbol, RECEIPT_TO_LOAD, (now_ns - receipt_ns) // 1000)
+
+    def on_deliver(self, vt_symbol: str) -> None:
+        """
+        Stamp the most recent tick of a symbol when the strategy sees it.
+        """
+        now_ns: int = time.perf_counter_ns()
+
+        with self._lock:
+            load_ns: Optional[int] = self._load_ns.pop(vt_symbol, None)
+            receipt_ns: Optional[int] = self._receipt_ns.pop(vt_symbol, None)
+
+            if load_ns is not None:
+                self._record(vt_symbol, LOAD_TO_DELIVER, (now_ns - load_ns) // 1000)
+            if receipt_ns is not None:
+                self._record(vt_symbol, RECEIPT_TO_DELIVER, (now_ns - receipt_ns) // 1000)
+
+    def summary(self, by_market: bool = True) -> Dict[str, Dict[str, dict]]:
+        """
+        Per-market (or per-symbol) summary of every stage.
+        """
+        histograms: Dict[str, Dict[str, LatencyHistogram]] = (
+            self.market_histograms if by_market else self.symbol_histograms
+        )
+
+        with self._lock:
+            return {
+                key: {stage: h.summary() for stage, h in stage_histograms.items()}
+                for key, stage_histograms in histograms.items()
+            }
+
+    def reset(self) -> None:
+        """
+        Clear all histograms, keeping the clock skew estimates.
+        """
+        with self._lock:
+            for histograms in (self.symbol_histograms, self.market_histograms):
+                for stage_histograms in histograms.values():
+                    for h in stage_histograms.values():
+                        h.reset()
@@ -0,0 +1,87 @@
+"""
+Append-only file of line values evicted from bounded live feed buffers.
+
+    file := MAGIC header_length header row*
+    header := json list of line names
+    row := one little-endian float64 per line
+"""
+
+import struct
+from array import array
+from pathlib import Path
+from typing import BinaryIO, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+
+MAGIC: bytes = b"BTLS"
+HEADER_LENGTH: struct.Struct = struct.Struct("<I")
+
+
+class LineSpill:
+    """
+    Writes rows of line values, the header is written once when the file is created.
+    """
+
+    def __init__(self, path: str, names: Sequence[str]) -> None:
+        """"""
+        import orjson
+
+        self.path: Path = Path(path)
+        self.names: List[str] = list(names)
+        self.file: Optional[BinaryIO] = None
+
+        header: bytes = orjson.dumps(self.names)
+        if self.path.exists() and self.path.stat().st_size:
+            existing, _ = read_header(self.path)
+            if existing != self.names:
+                raise ValueError(f"{path} holds lines {existing}, not {self.names}")
+            self.file = open(self.path, "ab")
+        else:
+            self.path.parent.mkdir(parents=True, exist_ok=True)
+            self.file = open(self.path, "wb")
+            self.file.write(MAGIC + HEADER_LENGTH.pack(len(header)) + header)
+
+    def write_rows(self, rows: List[Sequence[float]]) -> None:
+        """"""
+        values: array = array("d")
+        for row in rows:
+            values.extend(row)
+        self.file.write(values.tobytes())
+
+    def flush(self) -> None:
+        """"""
+        if self.file:
+            self.file.flush()
+
+    def close(self) -> None:
+        """"""
+        if self.file:
+            self.file.close()
+            self.file = None
+
+
+def read_header(path: Path) -> Tuple[List[str], int]:
+    """
+    Line names and the offset of the first row.
+    """
+    import orjson
+
+    with open(path, "rb") as f:
+        head: bytes = f.read(len(MAGIC) + HEADER_LENGTH.size)
+        if head[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a line spill file")
+
+        (length,) = HEADER_LENGTH.unpack(head[len(MAGIC):])
+        names: List[str] = orjson.loads(f.read(length))
+
+    return names, len(head) + length
+
+
+def read_line_spill(path: str) -> Tuple[List[str], np.ndarray]:
+    """
+    Line names and all spilled rows as a (rows, lines) float64 array.
+    """
+    names, offset = read_header(Path(path))
+    values: np.ndarray = np.fromfile(path, dtype="<f8", offset=offset)
+    return names, values.reshape(-1, len(names))
@@ -486,6 +486,23 @@ class CancelRequest:
         self.vt_symbol: str = f"{self.symbol}.{self.exchange.value}"
 
 
+@dataclass
+class ModifyRequest:
+    """
+    Request sending to specific gateway for changing price and volume of an existing order.
+    """
+
+    orderid: str
+    symbol: str
+    exchange: Exchange
+    price: float
+    volume: float
+
+    def __post_init__(self) -> None:
+        """"""
+        self.vt_symbol: str = f"{self.symbol}.{self.exchange.value}"
+
+
 @dataclass
 class HistoryRequest:
     """
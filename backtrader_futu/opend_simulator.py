@@ -0,0 +1,1192 @@
+"""
+Local stand-in for OpenD.
+
+Speaks the OpenD TCP protocol used by the futu SDK for connection setup,
+keep alive, quote subscription, basic quote and ticker pushes, history
+K-lines, trading accounts and order placement/modification. Feeds, stores
+and brokers can therefore be run and benchmarked against it without a live
+OpenD, at any message rate.
+
+Quotes come from a random walk or from recorded TickData. Responses can be
+delayed, failed at random or rejected for trading frequency, and every
+client connection can be dropped on demand.
+
+    simulator = OpenDSimulator(SimulatorSetting(port=11112, tick_rate=50))
+    simulator.start()
+    quote_ctx = ft.OpenQuoteContext(port=11112)
+"""
+
+import hashlib
+import heapq
+import importlib
+import logging
+import math
+import random
+import socket
+import socketserver
+import struct
+import time
+from collections import deque
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from threading import Condition, Event, Lock, RLock, Thread
+from typing import Any, Callable, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+from .object import TickData
+from .utility import CHINA_TZ, ZoneInfo
+
+
+HEAD: struct.Struct = struct.Struct("<1s1sI2B2I20s8s")
+
+PROTO_FMT_PROTOBUF: int = 0
+PROTO_FMT_JSON: int = 1
+
+INIT_CONNECT: int = 1001
+GET_GLOBAL_STATE: int = 1002
+KEEP_ALIVE: int = 1004
+TRD_GET_ACC_LIST: int = 2001
+TRD_UNLOCK_TRADE: int = 2005
+TRD_SUB_ACC_PUSH: int = 2008
+TRD_GET_ORDER_LIST: int = 2201
+TRD_PLACE_ORDER: int = 2202
+TRD_MODIFY_ORDER: int = 2205
+TRD_UPDATE_ORDER: int = 2208
+TRD_UPDATE_ORDER_FILL: int = 2218
+QOT_SUB: int = 3001
+QOT_REG_QOT_PUSH: int = 3002
+QOT_GET_SUB_INFO: int = 3003
+QOT_GET_BASIC_QOT: int = 3004
+QOT_UPDATE_BASIC_QOT: int = 3005
+QOT_UPDATE_TICKER: int = 3011
+QOT_REQUEST_HISTORY_KL: int = 3103
+
+# requests that are never failed by error injection
+CONNECTION_PROTOS: Set[int] = {INIT_CONNECT, KEEP_ALIVE}
+
+SUB_TYPE_BASIC: int = 1
+SUB_TYPE_TICKER: int = 4
+
+ORDER_STATUS_SUBMITTED: int = 5
+ORDER_STATUS_FILLED_ALL: int = 11
+ORDER_STATUS_CANCELLED_ALL: int = 15
+
+MODIFY_ORDER_OP_NORMAL: int = 1
+MODIFY_ORDER_OP_CANCEL: int = 2
+
+TRD_ENV_SIMULATE: int = 0
+TRD_MARKET_HK: int = 1
+
+# TrdMarket -> TrdSecMarket of orders placed without secMarket
+TRD_SEC_MARKETS: Dict[int, int] = {1: 1, 2: 2, 3: 31}
+
+# futu code prefix -> QotMarket
+QOT_MARKETS: Dict[str, int] = {"HK": 1, "US": 11, "SH": 21, "SZ": 22}
+QOT_MARKET_PREFIXES: Dict[int, str] = {v: k for k, v in QOT_MARKETS.items()}
+
+MARKET_TZ: Dict[int, Any] = {11: ZoneInfo("America/New_York")}
+
+# KLType -> bar length in seconds
+KL_SECONDS: Dict[int, int] = {
+    1: 60,
+    6: 300,
+    7: 900,
+    8: 1800,
+    9: 3600,
+    2: 86400,
+    3: 7 * 86400,
+}
+
+# (proto_id, request message) -> (retType, retMsg, fill s2c)
+Handler = Callable[["ClientConnection", Any], Tuple[int, str, Callable[[Any], None]]]
+
+
+def _get_pb_module(proto_id: int):
+    """"""
+    from futu.common.utils import pb_map
+
+    return importlib.import_module("futu.common.pb." + type(pb_map[proto_id]).__module__)
+
+
+def _format_time(dt: datetime, market: int, ms: bool = False) -> str:
+    """"""
+    local: datetime = dt.astimezone(MARKET_TZ.get(market, CHINA_TZ))
+    if ms:
+        return local.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+    return local.strftime("%Y-%m-%d %H:%M:%S")
+
+
+def _parse_time(s: str, market: int) -> datetime:
+    """"""
+    for fmt in ("%Y-%m-%d %H:%M:%S", "%Y-%m-%d %H:%M", "%Y-%m-%d"):
+        try:
+            dt: datetime = datetime.strptime(s, fmt)
+        except ValueError:
+            continue
+        return dt.replace(tzinfo=MARKET_TZ.get(market, CHINA_TZ))
+    raise ValueError(f"invalid time {s}")
+
+
+@dataclass
+class SimulatorSetting:
+    """
+    Rates and fault injection of the simulator.
+    """
+
+    host: str = "127.0.0.1"
+    port: int = 11111
+
+    # quote pushes per second for every subscribed code
+    tick_rate: float = 10.0
+    # subscription quota of the whole server
+    quota: int = 1000
+
+    # seconds added to every response, also the exchange-to-push delay of quotes
+    latency: float = 0
+    jitter: float = 0
+    # fraction of requests answered with an error
+    error_rate: float = 0
+
+    # (requests, seconds) windows for order placement and modification, None disables
+    place_limit: Optional[Tuple[int, float]] = None
+    modify_limit: Optional[Tuple[int, float]] = None
+    # fill orders at their limit price right after they are placed
+    fill_orders: bool = True
+
+    acc_id: int = 1000001
+    trd_market: int = TRD_MARKET_HK
+    seed: Optional[int] = None
+
+
+@dataclass
+class QuoteState:
+    """
+    Running market statistics of one code.
+    """
+
+    code: str
+    market: int
+    price: float
+    last_close: float
+    open_price: float = 0
+    high_price: float = 0
+    low_price: float = 0
+    volume: int = 0
+    turnover: float = 0
+    sequence: int = 0
+    last_volume: int = 0
+    dt: datetime = None
+
+    def update(self, price: float, volume: int, dt: datetime) -> None:
+        """"""
+        if not self.open_price:
+            self.open_price = self.high_price = self.low_price = price
+
+        self.price = price
+        self.high_price = max(self.high_price, price)
+        self.low_price = min(self.low_price, price)
+        self.last_volume = volume
+        self.volume += volume
+        self.turnover += price * volume
+        self.sequence += 1
+        self.dt = dt
+
+
+class SyntheticSource:
+    """
+    Random walk quotes on the price tick grid, one walk per code.
+    """
+
+    def __init__(
+        self,
+        start_price: float = 100.0,
+        price_tick: float = 0.01,
+        volatility: float = 0.0005,
+        lot_size: int = 100,
+        max_lots: int = 10,
+        seed: int = None,
+    ) -> None:
+        """"""
+        self.start_price: float = start_price
+        self.price_tick: float = price_tick
+        self.volatility: float = volatility
+        self.lot_size: int = lot_size
+        self.max_lots: int = max_lots
+        self.random: random.Random = random.Random(seed)
+
+    def first_price(self, code: str) -> float:
+        """"""
+        return self.start_price
+
+    def next_tick(self, state: QuoteState) -> Optional[Tuple[float, int]]:
+        """
+        Get the next (price, volume) of a code.
+        """
+        price: float = state.price * (1 + self.random.gauss(0, self.volatility))
+        price = max(self.price_tick, round(round(price / self.price_tick) * self.price_tick, 6))
+        volume: int = self.random.randint(1, self.max_lots) * self.lot_size
+        return price, volume
+
+
+class ReplaySource:
+    """
+    Replays recorded ticks of every code in order, starting over at the end.
+    """
+
+    def __init__(self, ticks: Iterable[TickData], loop: bool = True) -> None:
+        """"""
+        from .futu_utility import convert_symbol_vt2futu
+
+        self.loop: bool = loop
+        self.ticks: Dict[str, List[Tuple[float, int]]] = {}
+        self.positions: Dict[str, int] = {}
+
+        last_volumes: Dict[str, float] = {}
+        for tick in ticks:
+            code: str = convert_symbol_vt2futu(tick.symbol, tick.exchange)
+
+            volume: float = tick.last_volume
+            if not volume and code in last_volumes:
+                volume = max(0, tick.volume - last_volumes[code])
+            last_volumes[code] = tick.volume
+
+            self.ticks.setdefault(code, []).append((tick.last_price, int(volume)))
+
+    def first_price(self, code: str) -> float:
+        """"""
+        ticks: List[Tuple[float, int]] = self.ticks.get(code, None)
+        return ticks[0][0] if ticks else 0
+
+    def next_tick(self, state: QuoteState) -> Optional[Tuple[float, int]]:
+        """"""
+        ticks: List[Tuple[float, int]] = self.ticks.get(state.code, None)
+        if not ticks:
+            return None
+
+        pos: int = self.positions.get(state.code, 0)
+        if pos >= len(ticks):
+            if not self.loop:
+                return None
+            pos = 0
+
+        self.positions[state.code] = pos + 1
+        return ticks[pos]
+
+
+@dataclass
+class SimOrder:
+    """"""
+
+    order_id: int
+    acc_id: int
+    trd_env: int
+    trd_market: int
+    trd_side: int
+    order_type: int
+    code: str
+    qty: float
+    price: float
+    sec_market: int = 0
+    status: int = ORDER_STATUS_SUBMITTED
+    fill_qty: float = 0
+    remark: str = ""
+    create_time: datetime = None
+    update_time: datetime = None
+
+
+class ClientConnection:
+    """
+    State of one SDK connection.
+    """
+
+    def __init__(self, sock: socket.socket, conn_id: int) -> None:
+        """"""
+        self.sock: socket.socket = sock
+        self.conn_id: int = conn_id
+        self.push_fmt: int = PROTO_FMT_PROTOBUF
+        self.alive: bool = True
+
+        # futu code -> subscribed SubTypes
+        self.subscriptions: Dict[str, Set[int]] = {}
+        self.push_enabled: Set[Tuple[str, int]] = set()
+        self.acc_push: Set[int] = set()
+
+        self.send_lock: Lock = Lock()
+
+    def send(self, data: bytes) -> bool:
+        """"""
+        if not self.alive:
+            return False
+
+        try:
+            with self.send_lock:
+                self.sock.sendall(data)
+        except OSError:
+            self.alive = False
+        return self.alive
+
+    def close(self) -> None:
+        """"""
+        self.alive = False
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+
+    def quota_used(self) -> int:
+        """"""
+        return sum(len(subtypes) for subtypes in self.subscriptions.values())
+
+    def wants_push(self, code: str, sub_type: int) -> bool:
+        """"""
+        return (code, sub_type) in self.push_enabled
+
+
+class _RequestHandler(socketserver.BaseRequestHandler):
+    """"""
+
+    def handle(self) -> None:
+        """"""
+        self.server.simulator.serve_connection(self.request)
+
+
+class _TCPServer(socketserver.ThreadingTCPServer):
+    """"""
+
+    daemon_threads: bool = True
+    allow_reuse_address: bool = True
+
+
+class OpenDSimulator:
+    """
+    Threaded TCP server answering futu SDK requests.
+    """
+
+    def __init__(self, setting: SimulatorSetting = None, source=None, output: Callable = None) -> None:
+        """
+        :param source: SyntheticSource (default), ReplaySource or any object
+            with first_price(code) and next_tick(QuoteState)
+        """
+        self.setting: SimulatorSetting = setting or SimulatorSetting()
+        self.source = source or SyntheticSource(seed=self.setting.seed)
+        self.output: Callable = output or print
+        self.random: random.Random = random.Random(self.setting.seed)
+
+        self.handlers: Dict[int, Handler] = {
+            INIT_CONNECT: self.on_init_connect,
+            GET_GLOBAL_STATE: self.on_get_global_state,
+            KEEP_ALIVE: self.on_keep_alive,
+            QOT_SUB: self.on_sub,
+            QOT_REG_QOT_PUSH: self.on_reg_push,
+            QOT_GET_SUB_INFO: self.on_get_sub_info,
+            QOT_GET_BASIC_QOT: self.on_get_basic_qot,
+            QOT_REQUEST_HISTORY_KL: self.on_request_history_kl,
+            TRD_GET_ACC_LIST: self.on_get_acc_list,
+            TRD_UNLOCK_TRADE: self.on_unlock_trade,
+            TRD_SUB_ACC_PUSH: self.on_sub_acc_push,
+            TRD_GET_ORDER_LIST: self.on_get_order_list,
+            TRD_PLACE_ORDER: self.on_place_order,
+            TRD_MODIFY_ORDER: self.on_modify_order,
+        }
+        self.modules: Dict[int, Any] = {}
+
+        self.connections: Dict[int, ClientConnection] = {}
+        self.quotes: Dict[str, QuoteState] = {}
+        self.orders: Dict[int, SimOrder] = {}
+        self.order_times: Dict[int, Deque[float]] = {TRD_PLACE_ORDER: deque(), TRD_MODIFY_ORDER: deque()}
+
+        self.conn_count: int = 0
+        self.order_count: int = 0
+        self.fill_count: int = 0
+        self.request_count: int = 0
+        self.push_count: int = 0
+        self.lock: RLock = RLock()
+
+        # responses waiting for their injected latency: (due, seq, conn, data, callback)
+        self.delayed: List[Tuple[float, int, ClientConnection, bytes, Optional[Callable]]] = []
+        self.delayed_seq: int = 0
+        self.delayed_condition: Condition = Condition()
+
+        self.server: Optional[_TCPServer] = None
+        self.threads: List[Thread] = []
+        self.stop_event: Event = Event()
+
+    @property
+    def address(self) -> Tuple[str, int]:
+        """
+        (host, port) the server listens on, the port is known once started.
+        """
+        if self.server:
+            return self.server.server_address[:2]
+        return self.setting.host, self.setting.port
+
+    def start(self) -> None:
+        """
+        Listen for connections and start pushing quotes.
+        """
+        if self.server:
+            return
+
+        self.server = _TCPServer((self.setting.host, self.setting.port), _RequestHandler)
+        self.server.simulator = self
+        self.stop_event.clear()
+
+        self.threads = [
+            Thread(target=self.server.serve_forever, name="OpenDSimulator", daemon=True),
+            Thread(target=self.run_pusher, name="OpenDSimulatorPush", daemon=True),
+            Thread(target=self.run_sender, name="OpenDSimulatorSend", daemon=True),
+        ]
+        for thread in self.threads:
+            thread.start()
+
+        self.output(f"OpenD simulator listening on {self.address[0]}:{self.address[1]}")
+
+    def stop(self) -> None:
+        """"""
+        if not self.server:
+            return
+
+        self.stop_event.set()
+        with self.delayed_condition:
+            self.delayed_condition.notify()
+        self.server.shutdown()
+        self.drop_connections()
+        for thread in self.threads:
+            thread.join()
+        self.server.server_close()
+
+        self.server = None
+        self.threads = []
+
+    def drop_connections(self) -> None:
+        """
+        Close every client connection, e.g. to exercise reconnect handling.
+        """
+        with self.lock:
+            connections: List[ClientConnection] = list(self.connections.values())
+
+        for conn in connections:
+            conn.close()
+
+    def serve_connection(self, sock: socket.socket) -> None:
+        """
+        Read and answer requests of one connection until it is closed.
+        """
+        with self.lock:
+            self.conn_count += 1
+            conn: ClientConnection = ClientConnection(sock, self.conn_count)
+            self.connections[conn.conn_id] = conn
+
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        try:
+            while conn.alive and not self.stop_event.is_set():
+                head: bytes = self._recv_exact(sock, HEAD.size)
+                if not head:
+                    break
+
+                _, _, proto_id, fmt, _, serial_no, body_len, _, _ = HEAD.unpack(head)
+                body: bytes = self._recv_exact(sock, body_len) if body_len else b""
+                if body_len and not body:
+                    break
+
+                self.handle_request(conn, proto_id, fmt, serial_no, body)
+        except OSError:
+            pass
+        finally:
+            conn.alive = False
+            with self.lock:
+                self.connections.pop(conn.conn_id, None)
+
+    def _recv_exact(self, sock: socket.socket, size: int) -> bytes:
+        """"""
+        chunks: List[bytes] = []
+        while size:
+            chunk: bytes = sock.recv(size)
+            if not chunk:
+                return b""
+            chunks.append(chunk)
+            size -= len(chunk)
+        return b"".join(chunks)
+
+    def _get_module(self, proto_id: int):
+        """"""
+        module = self.modules.get(proto_id, None)
+        if module is None:
+            module = _get_pb_module(proto_id)
+            self.modules[proto_id] = module
+        return module
+
+    def _decode(self, proto_id: int, fmt: int, body: bytes) -> Any:
+        """"""
+        req = self._get_module(proto_id).Request()
+        if fmt == PROTO_FMT_JSON:
+            from google.protobuf.json_format import Parse
+
+            Parse(body.decode("utf-8"), req)
+        else:
+            req.ParseFromString(body)
+        return req
+
+    def _encode(self, proto_id: int, fmt: int, serial_no: int, msg: Any) -> bytes:
+        """"""
+        if fmt == PROTO_FMT_JSON:
+            from google.protobuf.json_format import MessageToJson
+
+            body: bytes = MessageToJson(msg).encode("utf-8")
+        else:
+            body = msg.SerializeToString()
+
+        head: bytes = HEAD.pack(
+            b"F", b"T", proto_id, fmt, 0, serial_no, len(body), hashlib.sha1(body).digest(), b"\x00" * 8
+        )
+        return head + body
+
+    def _make_response(self, proto_id: int, ret_type: int, ret_msg: str = "", fill: Callable = None) -> Any:
+        """"""
+        rsp = self._get_module(proto_id).Response()
+        rsp.retType = ret_type
+        if ret_msg:
+            rsp.retMsg = ret_msg
+        if fill and ret_type == 0:
+            fill(rsp.s2c)
+        return rsp
+
+    def _delay(self) -> float:
+        """"""
+        delay: float = self.setting.latency
+        if self.setting.jitter:
+            delay += self.random.uniform(0, self.setting.jitter)
+        return delay
+
+    def handle_request(self, conn: ClientConnection, proto_id: int, fmt: int, serial_no: int, body: bytes) -> None:
+        """"""
+        self.request_count += 1
+
+        handler: Optional[Handler] = self.handlers.get(proto_id, None)
+        if handler is None:
+            self.output(f"OpenD simulator: unsupported proto {proto_id}", logging.WARNING)
+            ret_type, ret_msg, fill = -1, f"proto {proto_id} not supported by simulator", None
+        elif (
+            proto_id not in CONNECTION_PROTOS
+            and self.setting.error_rate
+            and self.random.random() < self.setting.error_rate
+        ):
+            ret_type, ret_msg, fill = -1, "simulated error", None
+        else:
+            try:
+                ret_type, ret_msg, fill = handler(conn, self._decode(proto_id, fmt, body))
+            except Exception as e:
+                self.output(f"OpenD simulator: proto {proto_id} failed: {e}", logging.WARNING)
+                ret_type, ret_msg, fill = -1, str(e), None
+
+        rsp = self._make_response(proto_id, ret_type, ret_msg, fill)
+        data: bytes = self._encode(proto_id, fmt, serial_no, rsp)
+        callback: Optional[Callable] = None
+        if proto_id == QOT_SUB and ret_type == 0:
+            callback = lambda: self._push_first(conn)   # noqa: E731
+
+        # the SDK pipelines requests, so a delayed response must not hold up the next request
+        delay: float = self._delay()
+        if delay > 0:
+            self._send_later(conn, data, delay, callback)
+            return
+
+        conn.send(data)
+        if callback:
+            callback()
+
+    def _send_later(self, conn: ClientConnection, data: bytes, delay: float, callback: Callable = None) -> None:
+        """"""
+        with self.delayed_condition:
+            self.delayed_seq += 1
+            heapq.heappush(self.delayed, (time.monotonic() + delay, self.delayed_seq, conn, data, callback))
+            self.delayed_condition.notify()
+
+    def run_sender(self) -> None:
+        """
+        Send delayed responses once they are due.
+        """
+        while not self.stop_event.is_set():
+            with self.delayed_condition:
+                if not self.delayed:
+                    self.delayed_condition.wait()
+                    continue
+
+                wait: float = self.delayed[0][0] - time.monotonic()
+                if wait > 0:
+                    self.delayed_condition.wait(wait)
+                    continue
+
+                _, _, conn, data, callback = heapq.heappop(self.delayed)
+
+            conn.send(data)
+            if callback:
+                callback()
+
+    def _push(self, conns: Iterable[ClientConnection], proto_id: int, fill: Callable) -> None:
+        """
+        Send one push message, encoded once per format.
+        """
+        rsp = self._make_response(proto_id, 0, "", fill)
+        encoded: Dict[int, bytes] = {}
+
+        for conn in conns:
+            data: bytes = encoded.get(conn.push_fmt, None)
+            if data is None:
+                data = self._encode(proto_id, conn.push_fmt, 0, rsp)
+                encoded[conn.push_fmt] = data
+
+            if conn.send(data):
+                self.push_count += 1
+
+    def on_init_connect(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        if req.c2s.HasField("pushProtoFmt"):
+            conn.push_fmt = req.c2s.pushProtoFmt
+
+        def fill(s2c) -> None:
+            s2c.serverVer = 900
+            s2c.loginUserID = 10000
+            s2c.connID = conn.conn_id
+            s2c.connAESKey = "0123456789ABCDEF"
+            s2c.keepAliveInterval = 10
+
+        return 0, "", fill
+
+    def on_get_global_state(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        def fill(s2c) -> None:
+            s2c.marketHK = 0
+            s2c.marketUS = 0
+            s2c.marketSH = 0
+            s2c.marketSZ = 0
+            s2c.marketHKFuture = 0
+            s2c.qotLogined = True
+            s2c.trdLogined = True
+            s2c.serverVer = 900
+            s2c.serverBuildNo = 1
+            s2c.time = int(time.time())
+            s2c.localTime = time.time()
+            s2c.connID = conn.conn_id
+
+        return 0, "", fill
+
+    def on_keep_alive(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        def fill(s2c) -> None:
+            s2c.time = int(time.time())
+
+        return 0, "", fill
+
+    def on_sub(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        c2s = req.c2s
+        codes: List[str] = [self._get_code(s.market, s.code) for s in c2s.securityList]
+        sub_types: List[int] = list(c2s.subTypeList)
+
+        with self.lock:
+            if c2s.HasField("isUnsubAll") and c2s.isUnsubAll:
+                conn.subscriptions.clear()
+                conn.push_enabled.clear()
+                return 0, "", None
+
+            if c2s.isSubOrUnSub:
+                new: int = sum(
+                    1 for code in codes for sub_type in sub_types
+                    if sub_type not in conn.subscriptions.get(code, ())
+                )
+                used: int = sum(c.quota_used() for c in self.connections.values())
+                if used + new > self.setting.quota:
+                    return -1, f"subscription quota {self.setting.quota} exceeded", None
+
+            for code in codes:
+                if code not in self.quotes:
+                    self._create_quote(code)
+
+                subtypes: Set[int] = conn.subscriptions.setdefault(code, set())
+                for sub_type in sub_types:
+                    if c2s.isSubOrUnSub:
+                        subtypes.add(sub_type)
+                        if c2s.isRegOrUnRegPush:
+                            conn.push_enabled.add((code, sub_type))
+                    else:
+                        subtypes.discard(sub_type)
+                        conn.push_enabled.discard((code, sub_type))
+
+                if not subtypes:
+                    conn.subscriptions.pop(code)
+
+        return 0, "", None
+
+    def on_reg_push(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        c2s = req.c2s
+        with self.lock:
+            for s in c2s.securityList:
+                code: str = self._get_code(s.market, s.code)
+                for sub_type in c2s.subTypeList:
+                    if c2s.isRegOrUnReg and sub_type in conn.subscriptions.get(code, ()):
+                        conn.push_enabled.add((code, sub_type))
+                    else:
+                        conn.push_enabled.discard((code, sub_type))
+
+        return 0, "", None
+
+    def on_get_sub_info(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        with self.lock:
+            connections: List[ClientConnection] = list(self.connections.values())
+            if not req.c2s.isReqAllConn:
+                connections = [conn]
+            used: int = sum(c.quota_used() for c in self.connections.values())
+
+            def fill(s2c) -> None:
+                for c in connections:
+                    info = s2c.connSubInfoList.add()
+                    info.usedQuota = c.quota_used()
+                    info.isOwnConnData = c is conn
+
+                    by_type: Dict[int, List[str]] = {}
+                    for code, sub_types in c.subscriptions.items():
+                        for sub_type in sub_types:
+                            by_type.setdefault(sub_type, []).append(code)
+
+                    for sub_type, codes in by_type.items():
+                        sub_info = info.subInfoList.add()
+                        sub_info.subType = sub_type
+                        for code in codes:
+                            self._fill_security(sub_info.securityList.add(), code)
+
+                s2c.totalUsedQuota = used
+                s2c.remainQuota = max(0, self.setting.quota - used)
+
+        return 0, "", fill
+
+    def on_get_basic_qot(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        codes: List[str] = [self._get_code(s.market, s.code) for s in req.c2s.securityList]
+        missing: List[str] = [code for code in codes if code not in conn.subscriptions]
+        if missing:
+            return -1, f"{missing} not subscribed", None
+
+        def fill(s2c) -> None:
+            with self.lock:
+                for code in codes:
+                    self._fill_basic_qot(s2c.basicQotList.add(), self.quotes[code])
+
+        return 0, "", fill
+
+    def on_request_history_kl(self, conn: ClientConnection, req: Any) -> tuple:
+        """
+        Deterministic synthetic bars, paged by maxAckKLNum and nextReqKey.
+        """
+        c2s = req.c2s
+        market: int = c2s.security.market
+        seconds: Optional[int] = KL_SECONDS.get(c2s.klType, None)
+        if seconds is None:
+            return -1, f"KLType {c2s.klType} not supported by simulator", None
+
+        start: datetime = _parse_time(c2s.beginTime, market)
+        end: datetime = _parse_time(c2s.endTime, market)
+        if len(c2s.endTime) <= 10:
+            end += timedelta(days=1)
+
+        if c2s.HasField("nextReqKey") and c2s.nextReqKey:
+            start = datetime.fromtimestamp(float(c2s.nextReqKey.decode()), start.tzinfo)
+        else:
+            # align to the bar grid
+            epoch: float = start.timestamp() + start.utcoffset().total_seconds()
+            start += timedelta(seconds=-epoch % seconds)
+
+        max_num: int = c2s.maxAckKLNum if c2s.HasField("maxAckKLNum") and c2s.maxAckKLNum else 1000
+        code: str = self._get_code(market, c2s.security.code)
+        base: float = self.source.first_price(code) or 100.0
+
+        def fill(s2c) -> None:
+            s2c.security.market = market
+            s2c.security.code = c2s.security.code
+
+            dt: datetime = start
+            step: timedelta = timedelta(seconds=seconds)
+            count: int = 0
+            while dt < end and count < max_num:
+                self._fill_kline(s2c.klList.add(), code, base, dt, seconds, market)
+                dt += step
+                count += 1
+
+            if dt < end:
+                s2c.nextReqKey = str(dt.timestamp()).encode()
+
+        return 0, "", fill
+
+    def on_get_acc_list(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        def fill(s2c) -> None:
+            acc = s2c.accList.add()
+            acc.trdEnv = TRD_ENV_SIMULATE
+            acc.accID = self.setting.acc_id
+            acc.trdMarketAuthList.append(self.setting.trd_market)
+            acc.accType = 2
+            acc.simAccType = 1
+
+        return 0, "", fill
+
+    def on_unlock_trade(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        return 0, "", None
+
+    def on_sub_acc_push(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        conn.acc_push = set(req.c2s.accIDList)
+        return 0, "", None
+
+    def on_get_order_list(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        c2s = req.c2s
+        conditions = c2s.filterConditions
+        order_ids: Set[int] = set(conditions.idList) | {int(i) for i in conditions.orderIDExList}
+        codes: Set[str] = set(conditions.codeList)
+        statuses: Set[int] = set(c2s.filterStatusList)
+
+        with self.lock:
+            orders: List[SimOrder] = [
+                order for order in self.orders.values()
+                if order.acc_id == c2s.header.accID
+                and (not order_ids or order.order_id in order_ids)
+                and (not codes or order.code in codes)
+                and (not statuses or order.status in statuses)
+            ]
+
+            def fill(s2c) -> None:
+                s2c.header.CopyFrom(c2s.header)
+                for order in orders:
+                    self._fill_order(s2c.orderList.add(), order)
+
+        return 0, "", fill
+
+    def _check_order_limit(self, proto_id: int) -> bool:
+        """
+        Sliding window check of the trading frequency limit.
+        """
+        limit: Optional[Tuple[int, float]] = (
+            self.setting.place_limit if proto_id == TRD_PLACE_ORDER else self.setting.modify_limit
+        )
+        if not limit:
+            return True
+
+        count, period = limit
+        now: float = time.monotonic()
+        times: Deque[float] = self.order_times[proto_id]
+        while times and now - times[0] >= period:
+            times.popleft()
+
+        if len(times) >= count:
+            return False
+        times.append(now)
+        return True
+
+    def on_place_order(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        c2s = req.c2s
+
+        with self.lock:
+            if not self._check_order_limit(TRD_PLACE_ORDER):
+                return -1, "下单频率太高 (order frequency too high)", None
+
+            self.order_count += 1
+            now: datetime = datetime.now(CHINA_TZ)
+            order: SimOrder = SimOrder(
+                order_id=self.order_count,
+                acc_id=c2s.header.accID,
+                trd_env=c2s.header.trdEnv,
+                trd_market=c2s.header.trdMarket,
+                trd_side=c2s.trdSide,
+                order_type=c2s.orderType,
+                code=c2s.code,
+                qty=c2s.qty,
+                price=c2s.price,
+                sec_market=c2s.secMarket or TRD_SEC_MARKETS.get(c2s.header.trdMarket, 0),
+                remark=c2s.remark,
+                create_time=now,
+                update_time=now,
+            )
+            self.orders[order.order_id] = order
+
+        def fill(s2c) -> None:
+            s2c.header.CopyFrom(c2s.header)
+            s2c.orderID = order.order_id
+            s2c.orderIDEx = str(order.order_id)
+
+        Thread(target=self._process_order, args=(order,), daemon=True).start()
+        return 0, "", fill
+
+    def on_modify_order(self, conn: ClientConnection, req: Any) -> tuple:
+        """"""
+        c2s = req.c2s
+
+        with self.lock:
+            if not self._check_order_limit(TRD_MODIFY_ORDER):
+                return -1, "改单频率太高 (modify frequency too high)", None
+
+            # the SDK sends the id in orderIDEx and leaves orderID 0
+            order_id: int = int(c2s.orderIDEx) if c2s.orderIDEx else c2s.orderID
+            order: Optional[SimOrder] = self.orders.get(order_id, None)
+            if order is None:
+                return -1, f"order {order_id} not found", None
+            if order.status != ORDER_STATUS_SUBMITTED:
+                return -1, f"order {order_id} is not active", None
+
+            if c2s.modifyOrderOp == MODIFY_ORDER_OP_CANCEL:
+                order.status = ORDER_STATUS_CANCELLED_ALL
+            elif c2s.modifyOrderOp == MODIFY_ORDER_OP_NORMAL:
+                order.qty = c2s.qty
+                order.price = c2s.price
+            else:
+                return -1, f"modify op {c2s.modifyOrderOp} not supported by simulator", None
+            order.update_time = datetime.now(CHINA_TZ)
+
+        def fill(s2c) -> None:
+            s2c.header.CopyFrom(c2s.header)
+            s2c.orderID = order.order_id
+            s2c.orderIDEx = str(order.order_id)
+
+        Thread(target=self._push_order, args=(order,), daemon=True).start()
+        return 0, "", fill
+
+    def _process_order(self, order: SimOrder) -> None:
+        """
+        Push the order update after its response has been sent, then fill it.
+        """
+        delay: float = self._delay()
+        if delay > 0:
+            time.sleep(delay)
+        self._push_order(order)
+
+        if not self.setting.fill_orders:
+            return
+
+        with self.lock:
+            if order.status != ORDER_STATUS_SUBMITTED:
+                return
+
+            order.status = ORDER_STATUS_FILLED_ALL
+            order.fill_qty = order.qty
+            order.update_time = datetime.now(CHINA_TZ)
+            self.fill_count += 1
+            fill_id: int = self.fill_count
+
+        self._push_order(order)
+        self._push_fill(order, fill_id)
+
+    def _get_acc_conns(self, acc_id: int) -> List[ClientConnection]:
+        """"""
+        with self.lock:
+            return [c for c in self.connections.values() if acc_id in c.acc_push]
+
+    def _fill_trd_header(self, header: Any, order: SimOrder) -> None:
+        """"""
+        header.trdEnv = order.trd_env
+        header.accID = order.acc_id
+        header.trdMarket = order.trd_market
+
+    def _push_order(self, order: SimOrder) -> None:
+        """"""
+        conns: List[ClientConnection] = self._get_acc_conns(order.acc_id)
+        if not conns:
+            return
+
+        def fill(s2c) -> None:
+            self._fill_trd_header(s2c.header, order)
+            self._fill_order(s2c.order, order)
+
+        self._push(conns, TRD_UPDATE_ORDER, fill)
+
+    def _fill_order(self, o: Any, order: SimOrder) -> None:
+        """"""
+        o.trdSide = order.trd_side
+        o.orderType = order.order_type
+        o.orderStatus = order.status
+        o.orderID = order.order_id
+        o.orderIDEx = str(order.order_id)
+        o.code = order.code
+        o.name = order.code
+        o.qty = order.qty
+        o.price = order.price
+        o.createTime = _format_time(order.create_time, 0)
+        o.updateTime = _format_time(order.update_time, 0)
+        o.createTimestamp = order.create_time.timestamp()
+        o.updateTimestamp = order.update_time.timestamp()
+        o.fillQty = order.fill_qty
+        o.fillAvgPrice = order.price if order.fill_qty else 0
+        o.secMarket = order.sec_market
+        if order.remark:
+            o.remark = order.remark
+
+    def _push_fill(self, order: SimOrder, fill_id: int) -> None:
+        """"""
+        conns: List[ClientConnection] = self._get_acc_conns(order.acc_id)
+        if not conns:
+            return
+
+        def fill(s2c) -> None:
+            self._fill_trd_header(s2c.header, order)
+
+            f = s2c.orderFill
+            f.trdSide = order.trd_side
+            f.fillID = fill_id
+            f.fillIDEx = str(fill_id)
+            f.orderID = order.order_id
+            f.orderIDEx = str(order.order_id)
+            f.code = order.code
+            f.name = order.code
+            f.qty = order.fill_qty
+            f.price = order.price
+            f.createTime = _format_time(order.update_time, 0)
+            f.createTimestamp = order.update_time.timestamp()
+            f.secMarket = order.sec_market
+
+        self._push(conns, TRD_UPDATE_ORDER_FILL, fill)
+
+    def _get_code(self, market: int, code: str) -> str:
+        """"""
+        return f"{QOT_MARKET_PREFIXES.get(market, 'HK')}.{code}"
+
+    def _fill_security(self, security: Any, code: str) -> None:
+        """"""
+        prefix, symbol = code.split(".", 1)
+        security.market = QOT_MARKETS[prefix]
+        security.code = symbol
+
+    def _create_quote(self, code: str) -> QuoteState:
+        """"""
+        price: float = self.source.first_price(code) or 100.0
+        prefix: str = code.split(".", 1)[0]
+        state: QuoteState = QuoteState(code, QOT_MARKETS.get(prefix, 1), price, price, dt=datetime.now(CHINA_TZ))
+        self.quotes[code] = state
+        return state
+
+    def _fill_basic_qot(self, qot: Any, state: QuoteState) -> None:
+        """"""
+        self._fill_security(qot.security, state.code)
+        qot.name = state.code
+        qot.isSuspended = False
+        qot.listTime = "2000-01-01"
+        qot.priceSpread = 0.01
+        qot.updateTime = _format_time(state.dt, state.market)
+        qot.updateTimestamp = state.dt.timestamp()
+        qot.highPrice = state.high_price or state.price
+        qot.openPrice = state.open_price or state.price
+        qot.lowPrice = state.low_price or state.price
+        qot.curPrice = state.price
+        qot.lastClosePrice = state.last_close
+        qot.volume = state.volume
+        qot.turnover = state.turnover
+        qot.turnoverRate = 0
+        qot.amplitude = (
+            (qot.highPrice - qot.lowPrice) / state.last_close * 100 if state.last_close else 0
+        )
+
+    def _fill_kline(self, kl: Any, code: str, base: float, dt: datetime, seconds: int, market: int) -> None:
+        """
+        Bar values depend only on code and time, so pages and repeated requests agree.
+        """
+        rng: random.Random = random.Random(f"{code}{seconds}{dt.timestamp()}")
+        t: float = dt.timestamp() / 86400
+        mid: float = base * (1 + 0.1 * math.sin(t / 30) + 0.02 * math.sin(t * 7))
+
+        open_price: float = round(mid * (1 + rng.uniform(-0.005, 0.005)), 2)
+        close_price: float = round(mid * (1 + rng.uniform(-0.005, 0.005)), 2)
+        high_price: float = round(max(open_price, close_price) * (1 + rng.uniform(0, 0.005)), 2)
+        low_price: float = round(min(open_price, close_price) * (1 - rng.uniform(0, 0.005)), 2)
+        volume: int = rng.randint(1, 1000) * 100
+
+        kl.time = _format_time(dt, market)
+        kl.timestamp = dt.timestamp()
+        kl.isBlank = False
+        kl.openPrice = open_price
+        kl.highPrice = high_price
+        kl.lowPrice = low_price
+        kl.closePrice = close_price
+        kl.lastClosePrice = open_price
+        kl.volume = volume
+        kl.turnover = volume * (open_price + close_price) / 2
+
+    def _push_first(self, conn: ClientConnection) -> None:
+        """
+        Push the current quote of the subscribed codes, as OpenD does with isFirstPush.
+        """
+        with self.lock:
+            states: List[QuoteState] = [
+                self.quotes[code] for code in conn.subscriptions if conn.wants_push(code, SUB_TYPE_BASIC)
+            ]
+
+        for state in states:
+            self._push([conn], QOT_UPDATE_BASIC_QOT, lambda s2c, state=state: self._fill_basic_qot(
+                s2c.basicQotList.add(), state
+            ))
+
+    def run_pusher(self) -> None:
+        """
+        Advance every subscribed code tick_rate times a second and push the updates.
+        """
+        interval: float = 1 / self.setting.tick_rate
+        next_time: float = time.monotonic()
+
+        while not self.stop_event.is_set():
+            self.push_quotes()
+
+            next_time += interval
+            wait: float = next_time - time.monotonic()
+            if wait > 0:
+                self.stop_event.wait(wait)
+            else:
+                # running behind, do not try to catch up in a burst
+                next_time = time.monotonic()
+
+    def push_quotes(self) -> None:
+        """
+        Advance every subscribed code by one tick and push it to its subscribers.
+        """
+        with self.lock:
+            subscribers: Dict[str, Dict[int, List[ClientConnection]]] = {}
+            for conn in self.connections.values():
+                for code in conn.subscriptions:
+                    for sub_type in (SUB_TYPE_BASIC, SUB_TYPE_TICKER):
+                        if conn.wants_push(code, sub_type):
+                            subscribers.setdefault(code, {}).setdefault(sub_type, []).append(conn)
+
+            # quotes are stamped as if they left the exchange one latency ago
+            dt: datetime = datetime.now(CHINA_TZ) - timedelta(seconds=self._delay())
+            updated: List[QuoteState] = []
+            for code in subscribers:
+                state: QuoteState = self.quotes[code]
+                tick: Optional[Tuple[float, int]] = self.source.next_tick(state)
+                if tick:
+                    state.update(tick[0], tick[1], dt)
+                    updated.append(state)
+
+        for state in updated:
+            conns: Dict[int, List[ClientConnection]] = subscribers[state.code]
+
+            if SUB_TYPE_TICKER in conns:
+                self._push(conns[SUB_TYPE_TICKER], QOT_UPDATE_TICKER, lambda s2c, state=state: self._fill_ticker(
+                    s2c, state
+                ))
+            if SUB_TYPE_BASIC in conns:
+                self._push(conns[SUB_TYPE_BASIC], QOT_UPDATE_BASIC_QOT, lambda s2c, state=state: self._fill_basic_qot(
+                    s2c.basicQotList.add(), state
+                ))
+
+    def _fill_ticker(self, s2c: Any, state: QuoteState) -> None:
+        """"""
+        self._fill_security(s2c.security, state.code)
+        s2c.name = state.code
+
+        ticker = s2c.tickerList.add()
+        ticker.time = _format_time(state.dt, state.market, ms=True)
+        ticker.timestamp = state.dt.timestamp()
+        ticker.sequence = state.sequence
+        ticker.dir = 1
+        ticker.price = state.price
+        ticker.volume = state.last_volume
+        ticker.turnover = state.price * state.last_volume
+        ticker.type = 1
@@ -0,0 +1,142 @@
+"""
+Vectorized lot size and price tick normalization for many symbols at once.
+
+Lot sizes and price units of all symbols are loaded once into numpy arrays,
+whole portfolios of target volumes and prices are then rounded with a few
+array operations instead of per-symbol lookups and Python rounding.
+"""
+
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+
+from .object import Exchange
+from .pricetick import HK_PRICE_UNIT, HK_TICK_LADDER, TICK_EPSILON, get_decimals
+
+
+HK_BOUNDS: np.ndarray = np.array([round(upper / HK_PRICE_UNIT) for upper, _ in HK_TICK_LADDER[:-1]], dtype=np.int64)
+HK_STEPS: np.ndarray = np.array([round(step / HK_PRICE_UNIT) for _, step in HK_TICK_LADDER], dtype=np.int64)
+
+
+class OrderNormalizer:
+    """
+    Per-symbol tables of lot size and price unit.
+
+    Array arguments are aligned with vt_symbols unless rows are given, see get_rows.
+    """
+
+    def __init__(self, vt_symbols: List[str], lot_sizes: List[int], price_ticks: List[float]) -> None:
+        """
+        :param price_ticks: price tick of every symbol, ignored for SEHK symbols which follow the HK spread table
+        """
+        self.vt_symbols: List[str] = list(vt_symbols)
+        self.rows: Dict[str, int] = {vt_symbol: i for i, vt_symbol in enumerate(self.vt_symbols)}
+
+        self.lot_sizes: np.ndarray = np.maximum(np.asarray(lot_sizes, dtype=np.int64), 1)
+        self.ladder: np.ndarray = np.array(
+            [vt_symbol.endswith("." + Exchange.SEHK.value) for vt_symbol in self.vt_symbols], dtype=bool
+        )
+
+        self.units: np.ndarray = np.where(self.ladder, HK_PRICE_UNIT, np.asarray(price_ticks, dtype=np.float64))
+        # prices are rounded to the decimals of the unit, removing the error of ticks * unit, as in PriceScale
+        self.decimal_scales: np.ndarray = 10.0 ** np.array([get_decimals(unit) for unit in self.units.tolist()])
+
+    @classmethod
+    def from_basic_info(cls, vt_symbols: List[str]) -> "OrderNormalizer":
+        """
+        Build the tables from the stock basic info file, parsed once for all symbols.
+        """
+        from .futu_utility import BASIC_INFO_FILE
+        from .utility import load_json
+
+        basic_info: dict = load_json(BASIC_INFO_FILE)
+        missing: List[str] = [vt_symbol for vt_symbol in vt_symbols if vt_symbol not in basic_info]
+        assert not missing, f"{missing} don't exist in the stock basic info"
+
+        return cls(
+            vt_symbols,
+            [basic_info[vt_symbol]["lot_size"] for vt_symbol in vt_symbols],
+            [basic_info[vt_symbol]["price_tick"] for vt_symbol in vt_symbols],
+        )
+
+    def get_rows(self, vt_symbols: List[str]) -> np.ndarray:
+        """"""
+        return np.array([self.rows[vt_symbol] for vt_symbol in vt_symbols], dtype=np.int64)
+
+    def _select(self, table: np.ndarray, rows: Optional[np.ndarray]) -> np.ndarray:
+        """"""
+        return table if rows is None else table[rows]
+
+    def round_volumes(self, volumes: np.ndarray, rows: np.ndarray = None, nearest: bool = False) -> np.ndarray:
+        """
+        Round signed volumes to whole lots, toward zero unless nearest.
+        """
+        lot_sizes: np.ndarray = self._select(self.lot_sizes, rows)
+        lots: np.ndarray = np.asarray(volumes, dtype=np.float64) / lot_sizes
+
+        if nearest:
+            lots = np.rint(lots)
+        else:
+            lots = np.trunc(lots + np.sign(lots) * 1e-9)
+        return lots.astype(np.int64) * lot_sizes
+
+    def to_ticks(self, prices: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """
+        Prices to the nearest int tick counts.
+        """
+        return np.rint(np.asarray(prices, dtype=np.float64) / self._select(self.units, rows)).astype(np.int64)
+
+    def to_prices(self, ticks: np.ndarray, rows: np.ndarray = None) -> np.ndarray:
+        """"""
+        decimal_scales: np.ndarray = self._select(self.decimal_scales, rows)
+        return np.rint(ticks * self._select(self.units, rows) * decimal_scales) / decimal_scales
+
+    def get_steps(self, ticks: np.ndarray, rows: np.ndarray = None, up: bool = True) -> np.ndarray:
+        """
+        Spread in tick counts above (up) or below every price.
+        """
+        ladder: np.ndarray = self._select(self.ladder, rows)
+        i: np.ndarray = np.searchsorted(HK_BOUNDS, ticks, side="right" if up else "left")
+        return np.where(ladder, HK_STEPS[np.minimum(i, len(HK_STEPS) - 1)], 1)
+
+    def round_prices(self, prices: np.ndarray, directions: np.ndarray = None, rows: np.ndarray = None) -> np.ndarray:
+        """
+        Round prices to valid prices: down where direction > 0 (buy),
+        up where direction < 0 (sell) and to the nearest valid price where 0.
+
+        Buys and sells are floored and ceiled from the raw prices, not from the
+        nearest tick counts, so a rounded price never crosses its limit.
+        """
+        raw: np.ndarray = np.asarray(prices, dtype=np.float64) / self._select(self.units, rows)
+
+        floor_ticks: np.ndarray = np.floor(raw + TICK_EPSILON).astype(np.int64)
+        floor_steps: np.ndarray = self.get_steps(floor_ticks, rows, up=False)
+        floor: np.ndarray = floor_ticks // floor_steps * floor_steps
+
+        ceil_ticks: np.ndarray = np.ceil(raw - TICK_EPSILON).astype(np.int64)
+        ceil_steps: np.ndarray = self.get_steps(ceil_ticks, rows, up=True)
+        ceil: np.ndarray = -(-ceil_ticks // ceil_steps) * ceil_steps
+
+        ticks: np.ndarray = np.rint(raw).astype(np.int64)
+        down_steps: np.ndarray = self.get_steps(ticks, rows, up=False)
+        up_steps: np.ndarray = self.get_steps(ticks, rows, up=True)
+        low: np.ndarray = ticks // down_steps * down_steps
+        high: np.ndarray = -(-ticks // up_steps) * up_steps
+        nearest: np.ndarray = np.where(ticks - low <= high - ticks, low, high)
+
+        if directions is None:
+            directions = np.zeros(len(ticks), dtype=np.int64)
+        else:
+            directions = np.sign(np.broadcast_to(directions, ticks.shape))
+
+        result: np.ndarray = np.where(directions > 0, floor, np.where(directions < 0, ceil, nearest))
+        return self.to_prices(result, rows)
+
+    def normalize(
+        self, volumes: np.ndarray, prices: np.ndarray, rows: np.ndarray = None
+    ) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Lot-rounded signed volumes and valid limit prices, buys rounded down and sells up.
+        """
+        volumes = self.round_volumes(volumes, rows)
+        return volumes, self.round_prices(prices, volumes, rows)
@@ -0,0 +1,300 @@
+"""
+Rate-limit-aware order scheduler.
+
+Requests are queued in priority lanes (cancels, then modifies, then new
+orders) and sent only when the token bucket of their limit class has a
+token, so orders are delayed locally instead of being bounced by OpenD.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from threading import Condition, Thread
+from typing import Any, Callable, Dict, List, Optional, Tuple, Union
+
+from .object import CancelRequest, Direction, ModifyRequest, OrderRequest, OrderType
+from .ratelimit import TokenBucket
+
+
+PLACE_LIMIT: str = "place"
+MODIFY_LIMIT: str = "modify"
+
+# futu trading frequency limits per account: (requests, seconds)
+FUTU_ORDER_LIMITS: Dict[str, Tuple[int, float]] = {
+    PLACE_LIMIT: (15, 30.0),
+    MODIFY_LIMIT: (20, 30.0),
+}
+
+Request = Union[OrderRequest, CancelRequest, ModifyRequest]
+
+
+class RateLimitError(Exception):
+    """
+    Raised by an endpoint when the server rejected a request for frequency.
+    """
+
+
+class OrderRejected(Exception):
+    """
+    Raised by an endpoint when the server rejected a request.
+    """
+
+
+class FutuTradeEndpoint:
+    """
+    Sends scheduler requests through a futu trade context.
+    """
+
+    def __init__(self, trade_ctx, trd_env: str = "SIMULATE", acc_id: int = 0) -> None:
+        """"""
+        self.trade_ctx = trade_ctx
+        self.trd_env: str = trd_env
+        self.acc_id: int = acc_id
+
+    def _check(self, ret: int, data: Any) -> Any:
+        """"""
+        import futu as ft
+
+        if ret == ft.RET_OK:
+            return data
+
+        msg: str = str(data)
+        if "频率" in msg or "frequen" in msg.lower():
+            raise RateLimitError(msg)
+        raise OrderRejected(msg)
+
+    def send_order(self, req: OrderRequest) -> str:
+        """"""
+        import futu as ft
+        from .futu_utility import convert_symbol_vt2futu
+
+        if req.type in (OrderType.LIMIT, OrderType.NORMAL):
+            order_type: str = ft.OrderType.NORMAL
+        else:
+            order_type = getattr(ft.OrderType, req.type.name)
+
+        trd_side: str = ft.TrdSide.BUY if req.direction == Direction.LONG else ft.TrdSide.SELL
+
+        ret, data = self.trade_ctx.place_order(
+            req.price,
+            req.volume,
+            convert_symbol_vt2futu(req.symbol, req.exchange),
+            trd_side,
+            order_type=order_type,
+            trd_env=self.trd_env,
+            acc_id=self.acc_id,
+            remark=req.reference or None,
+            time_in_force=req.time_in_force.value,
+            aux_price=req.aux_price,
+            trail_type=req.trail_type.value if req.trail_type else None,
+            trail_value=req.trail_value,
+            trail_spread=req.trail_spread,
+        )
+        data = self._check(ret, data)
+        return str(data["order_id"][0])
+
+    def cancel_order(self, req: CancelRequest) -> None:
+        """"""
+        import futu as ft
+
+        ret, data = self.trade_ctx.modify_order(
+            ft.ModifyOrderOp.CANCEL, req.orderid, 0, 0, trd_env=self.trd_env, acc_id=self.acc_id
+        )
+        self._check(ret, data)
+
+    def modify_order(self, req: ModifyRequest) -> None:
+        """"""
+        import futu as ft
+
+        ret, data = self.trade_ctx.modify_order(
+            ft.ModifyOrderOp.NORMAL, req.orderid, req.volume, req.price, trd_env=self.trd_env, acc_id=self.acc_id
+        )
+        self._check(ret, data)
+
+
+class OrderScheduler:
+    """
+    Queues order requests and sends them within the trading frequency limits.
+
+    * cancels are sent before modifies, modifies before new orders
+    * a newer ModifyRequest for the same order replaces the queued one
+    * a CancelRequest drops any queued ModifyRequest of the same order
+    * withdraw_order() drops a queued OrderRequest by the handle submit_order returned
+
+    The endpoint needs send_order(OrderRequest) -> orderid,
+    cancel_order(CancelRequest) and modify_order(ModifyRequest).
+    dispatch() can be driven by the caller or by the thread from start().
+    """
+
+    def __init__(
+        self,
+        endpoint,
+        limits: Dict[str, Tuple[int, float]] = None,
+        clock: Callable[[], float] = time.monotonic,
+        on_sent: Callable[[Request, Any], None] = None,
+        on_rejected: Callable[[Request, Exception], None] = None,
+        output: Callable = None,
+    ) -> None:
+        """"""
+        self.endpoint = endpoint
+        self.clock: Callable[[], float] = clock
+        self.on_sent: Optional[Callable[[Request, Any], None]] = on_sent
+        self.on_rejected: Optional[Callable[[Request, Exception], None]] = on_rejected
+        self.output: Callable = output or print
+
+        limits = limits or FUTU_ORDER_LIMITS
+        self.buckets: Dict[str, TokenBucket] = {
+            name: TokenBucket.for_window(limit, period, clock=clock) for name, (limit, period) in limits.items()
+        }
+
+        self.cancels: "OrderedDict[str, CancelRequest]" = OrderedDict()
+        self.modifies: "OrderedDict[str, ModifyRequest]" = OrderedDict()
+        # keyed by a sequence number, references are shared by all orders of a strategy
+        self.orders: "OrderedDict[int, OrderRequest]" = OrderedDict()
+        self.order_seq: int = 0
+
+        # (lane, limit class, endpoint method name) in priority order
+        self.lanes: List[Tuple["OrderedDict", str, str]] = [
+            (self.cancels, MODIFY_LIMIT, "cancel_order"),
+            (self.modifies, MODIFY_LIMIT, "modify_order"),
+            (self.orders, PLACE_LIMIT, "send_order"),
+        ]
+
+        self.coalesced: int = 0
+        self.sent: int = 0
+
+        self.condition: Condition = Condition()
+        self.active: bool = False
+        self.thread: Optional[Thread] = None
+
+    def submit_order(self, req: OrderRequest) -> int:
+        """
+        Queue a new order and return its handle for withdraw_order.
+        """
+        with self.condition:
+            self.order_seq += 1
+            self.orders[self.order_seq] = req
+            self.condition.notify()
+            return self.order_seq
+
+    def withdraw_order(self, handle: int) -> bool:
+        """
+        Drop a queued new order that has not been sent yet.
+        """
+        with self.condition:
+            return self.orders.pop(handle, None) is not None
+
+    def submit_modify(self, req: ModifyRequest) -> None:
+        """"""
+        with self.condition:
+            if req.orderid in self.cancels:
+                self.coalesced += 1
+                return
+
+            if req.orderid in self.modifies:
+                self.coalesced += 1
+            self.modifies[req.orderid] = req
+            self.condition.notify()
+
+    def submit_cancel(self, req: CancelRequest) -> None:
+        """"""
+        with self.condition:
+            if self.modifies.pop(req.orderid, None) is not None:
+                self.coalesced += 1
+            if req.orderid in self.cancels:
+                self.coalesced += 1
+
+            self.cancels[req.orderid] = req
+            self.condition.notify()
+
+    def pending(self) -> int:
+        """"""
+        with self.condition:
+            return len(self.cancels) + len(self.modifies) + len(self.orders)
+
+    def _pop_next(self, now: float) -> Optional[Tuple["OrderedDict", Any, Request, str, str]]:
+        """"""
+        with self.condition:
+            for lane, limit, method in self.lanes:
+                if not lane:
+                    continue
+                if not self.buckets[limit].try_acquire(now=now):
+                    continue
+
+                key, req = lane.popitem(last=False)
+                return lane, key, req, limit, method
+
+        return None
+
+    def dispatch(self, now: float = None) -> int:
+        """
+        Send every queued request the rate limits allow right now.
+        """
+        count: int = 0
+
+        while True:
+            item = self._pop_next(self.clock() if now is None else now)
+            if item is None:
+                return count
+
+            lane, key, req, limit, method = item
+            try:
+                result: Any = getattr(self.endpoint, method)(req)
+            except RateLimitError:
+                # the server disagrees with our bucket: put it back in front and back off
+                with self.condition:
+                    lane[key] = req
+                    lane.move_to_end(key, last=False)
+                self.buckets[limit].drain()
+                continue
+            except Exception as e:
+                self.output(f"{method} failed for {req}: {e}", logging.WARNING)
+                if self.on_rejected:
+                    self.on_rejected(req, e)
+                continue
+
+            count += 1
+            self.sent += 1
+            if self.on_sent:
+                self.on_sent(req, result)
+
+    def next_wait(self) -> Optional[float]:
+        """
+        Seconds until some queued request can be sent, None if nothing is queued.
+        """
+        with self.condition:
+            waits: List[float] = [
+                self.buckets[limit].wait_time() for lane, limit, _ in self.lanes if lane
+            ]
+        return min(waits) if waits else None
+
+    def start(self) -> None:
+        """"""
+        if self.active:
+            return
+
+        self.active = True
+        self.thread = Thread(target=self.run, name="OrderScheduler", daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        """"""
+        if not self.active:
+            return
+
+        with self.condition:
+            self.active = False
+            self.condition.notify()
+        self.thread.join()
+        self.thread = None
+
+    def run(self) -> None:
+        """"""
+        while True:
+            self.dispatch()
+
+            # submits notify under the same lock, so no wakeup is lost here
+            with self.condition:
+                if not self.active:
+                    return
+                self.condition.wait(self.next_wait())
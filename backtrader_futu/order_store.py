@@ -0,0 +1,173 @@
+"""
+Indexed store of OrderData.
+"""
+
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+from .object import ACTIVE_STATUSES, OrderData, Status
+
+
+class OrderStore:
+    """
+    Keeps the latest OrderData of every order keyed by vt_orderid.
+
+    Active orders are indexed by vt_symbol, status, reference and strategy
+    name, and the indexes are updated incrementally on each status change.
+    Orders reaching a terminal status are moved to a bounded archive, which
+    is only indexed by vt_orderid and status. The vt_orderids of orders
+    evicted from the archive are remembered in a second bounded set, so a
+    late active update never revives them.
+    """
+
+    def __init__(self, max_archived: int = 10000, max_evicted: int = 100000) -> None:
+        """
+        :param max_evicted: vt_orderids of evicted orders remembered, oldest are forgotten first
+        """
+        self.max_archived: int = max_archived
+        self.max_evicted: int = max_evicted
+
+        self.active_orders: Dict[str, OrderData] = {}
+        self.archived_orders: "OrderedDict[str, OrderData]" = OrderedDict()
+        self.evicted_ids: "OrderedDict[str, None]" = OrderedDict()
+
+        self.symbol_orders: Dict[str, Dict[str, OrderData]] = {}
+        self.status_orders: Dict[Status, Dict[str, OrderData]] = {status: {} for status in Status}
+        self.reference_orders: Dict[str, Dict[str, OrderData]] = {}
+        self.strategy_orders: Dict[str, Dict[str, OrderData]] = {}
+
+        # index keys as of the last update, the OrderData may be mutated in place
+        self._index_keys: Dict[str, Tuple[Status, str, str, str]] = {}
+
+    def update_order(self, order: OrderData) -> None:
+        """
+        Insert a new order or apply a status change.
+
+        An active update of an archived or evicted order arrived out of order,
+        after its terminal status, and is ignored.
+        """
+        vt_orderid: str = order.vt_orderid
+        if order.status in ACTIVE_STATUSES:
+            if vt_orderid in self.archived_orders or vt_orderid in self.evicted_ids:
+                return
+
+        self._unindex(vt_orderid)
+
+        if order.status in ACTIVE_STATUSES:
+            self.active_orders[vt_orderid] = order
+
+            self._add(self.symbol_orders, order.vt_symbol, order)
+            self._add(self.reference_orders, order.reference, order)
+            self._add(self.strategy_orders, order.strategy_class_name, order)
+        else:
+            self.active_orders.pop(vt_orderid, None)
+            self.archived_orders[vt_orderid] = order
+            self.archived_orders.move_to_end(vt_orderid)
+
+        self.status_orders[order.status][vt_orderid] = order
+        self._index_keys[vt_orderid] = (order.status, order.vt_symbol, order.reference, order.strategy_class_name)
+
+        # evict after indexing, the order itself may be evicted right away
+        while len(self.archived_orders) > self.max_archived:
+            evicted_id, _ = self.archived_orders.popitem(last=False)
+            self._unindex(evicted_id)
+
+            self.evicted_ids[evicted_id] = None
+            if len(self.evicted_ids) > self.max_evicted:
+                self.evicted_ids.popitem(last=False)
+
+    def remove_order(self, vt_orderid: str) -> Optional[OrderData]:
+        """
+        Drop an order from the store.
+        """
+        self._unindex(vt_orderid)
+
+        order: Optional[OrderData] = self.active_orders.pop(vt_orderid, None)
+        if order is None:
+            order = self.archived_orders.pop(vt_orderid, None)
+        return order
+
+    def get_order(self, vt_orderid: str) -> Optional[OrderData]:
+        """
+        Get active or archived order by vt_orderid.
+        """
+        order: Optional[OrderData] = self.active_orders.get(vt_orderid, None)
+        if order is None:
+            order = self.archived_orders.get(vt_orderid, None)
+        return order
+
+    def get_active_orders(self, vt_symbol: str = "") -> List[OrderData]:
+        """
+        Get all active orders, or active orders of one vt_symbol.
+        """
+        if not vt_symbol:
+            return list(self.active_orders.values())
+        return list(self.symbol_orders.get(vt_symbol, {}).values())
+
+    def get_orders_by_status(self, status: Status) -> List[OrderData]:
+        """
+        Get stored orders with the status.
+        """
+        return list(self.status_orders[status].values())
+
+    def get_orders_by_reference(self, reference: str) -> List[OrderData]:
+        """
+        Get active orders with the reference.
+        """
+        return list(self.reference_orders.get(reference, {}).values())
+
+    def get_orders_by_strategy(self, strategy_class_name: str) -> List[OrderData]:
+        """
+        Get active orders of the strategy.
+        """
+        return list(self.strategy_orders.get(strategy_class_name, {}).values())
+
+    def has_active_orders(self, vt_symbol: str) -> bool:
+        """"""
+        return vt_symbol in self.symbol_orders
+
+    def clear(self) -> None:
+        """"""
+        self.__init__(self.max_archived, self.max_evicted)
+
+    def __len__(self) -> int:
+        """"""
+        return len(self.active_orders) + len(self.archived_orders)
+
+    def __contains__(self, vt_orderid: str) -> bool:
+        """"""
+        return vt_orderid in self.active_orders or vt_orderid in self.archived_orders
+
+    def _add(self, index: Dict[str, Dict[str, OrderData]], key: str, order: OrderData) -> None:
+        """"""
+        bucket: Optional[Dict[str, OrderData]] = index.get(key, None)
+        if bucket is None:
+            bucket = {}
+            index[key] = bucket
+        bucket[order.vt_orderid] = order
+
+    def _discard(self, index: Dict[str, Dict[str, OrderData]], key: str, vt_orderid: str) -> None:
+        """"""
+        bucket: Optional[Dict[str, OrderData]] = index.get(key, None)
+        if bucket is None:
+            return
+
+        bucket.pop(vt_orderid, None)
+        if not bucket:
+            del index[key]
+
+    def _unindex(self, vt_orderid: str) -> None:
+        """
+        Remove an order from the secondary indexes using its last index keys.
+        """
+        keys: Optional[Tuple[Status, str, str, str]] = self._index_keys.pop(vt_orderid, None)
+        if keys is None:
+            return
+
+        status, vt_symbol, reference, strategy_class_name = keys
+        self.status_orders[status].pop(vt_orderid, None)
+
+        if status in ACTIVE_STATUSES:
+            self._discard(self.symbol_orders, vt_symbol, vt_orderid)
+            self._discard(self.reference_orders, reference, vt_orderid)
+            self._discard(self.strategy_orders, strategy_class_name, vt_orderid)
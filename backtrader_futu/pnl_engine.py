@@ -0,0 +1,268 @@
+"""
+Incremental position and PnL engine fed by TradeData and TickData.
+"""
+
+import logging
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .object import AccountData, Direction, PositionData, TickData, TradeData
+from .futu_utility import extract_vt_symbol
+
+
+class PnlEngine:
+    """
+    Keeps net positions, average cost, realized/unrealized pnl and account
+    balance up to date between broker polls.
+
+    Per-symbol state lives in numpy arrays indexed by a slot number and the
+    account totals are adjusted by deltas, so every fill or tick is O(1)
+    regardless of the number of positions.
+    """
+
+    def __init__(
+        self,
+        gateway_name: str = "FUTU",
+        accountid: str = "",
+        cash: float = 0,
+        commission_rate: float = 0,
+        capacity: int = 256,
+        max_tradeids: int = 100000,
+        output: Callable = None,
+    ) -> None:
+        """
+        :param max_tradeids: vt_tradeids remembered for deduplication, oldest are forgotten first
+        """
+        self.gateway_name: str = gateway_name
+        self.accountid: str = accountid
+        self.commission_rate: float = commission_rate
+
+        self.cash: float = cash
+        self.frozen: float = 0
+        self.market_val: float = 0
+        self.realized: float = 0
+        self.unrealized: float = 0
+
+        self.slots: Dict[str, int] = {}
+        self.vt_symbols: List[str] = []
+
+        self.volume: np.ndarray = np.zeros(capacity)
+        self.frozen_volume: np.ndarray = np.zeros(capacity)
+        self.yd_volume: np.ndarray = np.zeros(capacity)
+        self.avg_price: np.ndarray = np.zeros(capacity)
+        self.last_price: np.ndarray = np.zeros(capacity)
+        self.realized_pnl: np.ndarray = np.zeros(capacity)
+        self.multiplier: np.ndarray = np.ones(capacity)
+
+        self.max_tradeids: int = max_tradeids
+        self.tradeids: "OrderedDict[str, None]" = OrderedDict()
+        self.output: Callable = output or print
+
+    def _grow(self) -> None:
+        """"""
+        capacity: int = len(self.volume) * 2
+
+        for name in ("volume", "frozen_volume", "yd_volume", "avg_price", "last_price", "realized_pnl"):
+            old: np.ndarray = getattr(self, name)
+            new: np.ndarray = np.zeros(capacity)
+            new[: len(old)] = old
+            setattr(self, name, new)
+
+        multiplier: np.ndarray = np.ones(capacity)
+        multiplier[: len(self.multiplier)] = self.multiplier
+        self.multiplier = multiplier
+
+    def get_slot(self, vt_symbol: str) -> int:
+        """
+        Get the array slot of a symbol, allocating one on first use.
+        """
+        slot: Optional[int] = self.slots.get(vt_symbol, None)
+        if slot is None:
+            slot = len(self.vt_symbols)
+            if slot == len(self.volume):
+                self._grow()
+
+            self.slots[vt_symbol] = slot
+            self.vt_symbols.append(vt_symbol)
+        return slot
+
+    def set_multiplier(self, vt_symbol: str, multiplier: float) -> None:
+        """
+        Set contract multiplier, 1 for stocks.
+        """
+        slot: int = self.get_slot(vt_symbol)
+
+        self._remove_contribution(slot)
+        self.multiplier[slot] = multiplier
+        self._add_contribution(slot)
+
+    def _remove_contribution(self, slot: int) -> None:
+        """"""
+        value: float = self.volume[slot] * self.multiplier[slot]
+        self.market_val -= value * self.last_price[slot]
+        self.unrealized -= value * (self.last_price[slot] - self.avg_price[slot])
+
+    def _add_contribution(self, slot: int) -> None:
+        """"""
+        value: float = self.volume[slot] * self.multiplier[slot]
+        self.market_val += value * self.last_price[slot]
+        self.unrealized += value * (self.last_price[slot] - self.avg_price[slot])
+
+    def update_trade(self, trade: TradeData) -> bool:
+        """
+        Apply a fill. Returns False if the trade was already applied or has no direction.
+        """
+        if trade.vt_tradeid in self.tradeids:
+            return False
+
+        if trade.direction not in (Direction.LONG, Direction.SHORT):
+            self.output(f"trade {trade.vt_tradeid} with direction {trade.direction} skipped", logging.WARNING)
+            return False
+
+        self.tradeids[trade.vt_tradeid] = None
+        if len(self.tradeids) > self.max_tradeids:
+            self.tradeids.popitem(last=False)
+
+        # a zero volume fill changes nothing, and on a flat position would divide by zero
+        if not trade.volume:
+            return True
+
+        slot: int = self.get_slot(trade.vt_symbol)
+        self._remove_contribution(slot)
+
+        multiplier: float = self.multiplier[slot]
+        pos: float = self.volume[slot]
+        avg: float = self.avg_price[slot]
+        qty: float = trade.volume if trade.direction == Direction.LONG else -trade.volume
+        new_pos: float = pos + qty
+
+        if pos == 0 or (pos > 0) == (qty > 0):
+            avg = (avg * abs(pos) + trade.price * abs(qty)) / abs(new_pos)
+        else:
+            closed: float = min(abs(qty), abs(pos))
+            pnl: float = closed * (trade.price - avg) * multiplier
+            if pos < 0:
+                pnl = -pnl
+            self.realized_pnl[slot] += pnl
+            self.realized += pnl
+
+            if new_pos == 0:
+                avg = 0
+            elif (new_pos > 0) != (pos > 0):
+                avg = trade.price
+
+        commission: float = abs(qty) * trade.price * multiplier * self.commission_rate
+        if commission:
+            self.realized_pnl[slot] -= commission
+            self.realized -= commission
+
+        self.cash -= qty * trade.price * multiplier + commission
+
+        self.volume[slot] = new_pos
+        self.avg_price[slot] = avg
+        if not self.last_price[slot]:
+            self.last_price[slot] = trade.price
+
+        self._add_contribution(slot)
+        return True
+
+    def update_price(self, vt_symbol: str, price: float) -> None:
+        """
+        Mark a symbol to a new price.
+        """
+        slot: Optional[int] = self.slots.get(vt_symbol, None)
+        if slot is None or not price:
+            return
+
+        delta: float = self.volume[slot] * self.multiplier[slot] * (price - self.last_price[slot])
+        self.market_val += delta
+        self.unrealized += delta
+        self.last_price[slot] = price
+
+    def update_tick(self, tick: TickData) -> None:
+        """"""
+        self.update_price(tick.vt_symbol, tick.last_price)
+
+    def update_position(self, position: PositionData) -> None:
+        """
+        Reset a symbol from a broker position snapshot.
+        """
+        slot: int = self.get_slot(position.vt_symbol)
+        self._remove_contribution(slot)
+
+        volume: float = -position.volume if position.direction == Direction.SHORT else position.volume
+        self.volume[slot] = volume
+        self.frozen_volume[slot] = position.frozen
+        self.yd_volume[slot] = position.yd_volume
+        self.avg_price[slot] = position.price
+        if not self.last_price[slot]:
+            self.last_price[slot] = position.price
+
+        self._add_contribution(slot)
+
+    def update_account(self, account: AccountData) -> None:
+        """
+        Reset cash and frozen from a broker account snapshot.
+        """
+        self.accountid = account.accountid
+        self.cash = account.cash
+        self.frozen = account.frozen
+
+    def recalculate(self) -> None:
+        """
+        Recompute the totals from the arrays to drop accumulated rounding error.
+        """
+        n: int = len(self.vt_symbols)
+        value: np.ndarray = self.volume[:n] * self.multiplier[:n]
+
+        self.market_val = float(np.dot(value, self.last_price[:n]))
+        self.unrealized = float(np.dot(value, self.last_price[:n] - self.avg_price[:n]))
+        self.realized = float(self.realized_pnl[:n].sum())
+
+    @property
+    def balance(self) -> float:
+        """"""
+        return self.cash + self.market_val
+
+    def get_position(self, vt_symbol: str) -> Optional[PositionData]:
+        """"""
+        slot: Optional[int] = self.slots.get(vt_symbol, None)
+        if slot is None:
+            return None
+
+        symbol, exchange = extract_vt_symbol(vt_symbol)
+        volume: float = float(self.volume[slot])
+        pnl: float = float(
+            volume * self.multiplier[slot] * (self.last_price[slot] - self.avg_price[slot]) + self.realized_pnl[slot]
+        )
+
+        position: PositionData = PositionData(
+            symbol=symbol,
+            exchange=exchange,
+            direction=Direction.NET,
+            volume=volume,
+            frozen=float(self.frozen_volume[slot]),
+            price=float(self.avg_price[slot]),
+            pnl=pnl,
+            yd_volume=float(self.yd_volume[slot]),
+            gateway_name=self.gateway_name,
+        )
+        return position
+
+    def get_all_positions(self) -> List[PositionData]:
+        """"""
+        return [self.get_position(vt_symbol) for vt_symbol in self.vt_symbols]
+
+    def get_account(self) -> AccountData:
+        """"""
+        account: AccountData = AccountData(
+            accountid=self.accountid,
+            balance=float(self.balance),
+            frozen=float(self.frozen),
+            cash=float(self.cash),
+            market_val=float(self.market_val),
+            gateway_name=self.gateway_name,
+        )
+        return account
@@ -0,0 +1,287 @@
+"""
+Integer price tick arithmetic.
+
+PriceScale converts prices to int tick counts and volumes to int lot counts
+for one symbol, so hot loops compare and add integers instead of floats.
+Prices are converted back only at the edges, when an OrderRequest,
+QuoteRequest or BarData is built.
+
+For SEHK the tick count is in units of the smallest HK spread (0.001) and
+valid prices follow the HK spread table, so a price that is a whole number
+of units is not necessarily a valid order price, see PriceScale.floor/ceil.
+"""
+
+import math
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass, field
+from decimal import Decimal
+from functools import lru_cache
+from typing import List, Optional, Tuple
+
+from .object import (
+    Direction,
+    Exchange,
+    Offset,
+    OrderRequest,
+    OrderType,
+    QuoteRequest,
+    TickData,
+    TimeInForce,
+)
+
+
+HK_PRICE_UNIT: float = 0.001
+
+# slack in tick counts for directional rounding, so that 10.01 / 0.01 = 1000.9999 still floors to 1001
+TICK_EPSILON: float = 1e-6
+
+# HK spread table: (upper price bound of the band, spread), bands are (lower, upper]
+HK_TICK_LADDER: List[Tuple[float, float]] = [
+    (0.25, 0.001),
+    (0.5, 0.005),
+    (10, 0.01),
+    (20, 0.02),
+    (100, 0.05),
+    (200, 0.1),
+    (500, 0.2),
+    (1000, 0.5),
+    (2000, 1),
+    (5000, 2),
+    (9995, 5),
+]
+
+
+@dataclass
+class PriceScale:
+    """
+    Price and volume units of one symbol.
+
+    unit is the price of one tick count. bounds and steps describe a price
+    dependent ladder in tick counts, without them every count is valid.
+    """
+
+    vt_symbol: str
+    unit: float
+    lot_size: int = 1
+    bounds: List[int] = field(default_factory=list)
+    steps: List[int] = field(default_factory=list)
+
+    def __post_init__(self) -> None:
+        """"""
+        # prices are rounded to the decimals of the unit, removing the error of ticks * unit
+        self.decimal_scale: float = 10.0 ** get_decimals(self.unit)
+
+    def to_ticks(self, price: float) -> int:
+        """
+        Price to the nearest tick count.
+        """
+        return int(round(price / self.unit))
+
+    def to_price(self, ticks: int) -> float:
+        """"""
+        return round(ticks * self.unit * self.decimal_scale) / self.decimal_scale
+
+    def to_lots(self, volume: float) -> int:
+        """
+        Volume to whole lots, odd shares are dropped.
+        """
+        return int(volume + 1e-9) // self.lot_size
+
+    def to_volume(self, lots: int) -> int:
+        """"""
+        return lots * self.lot_size
+
+    def get_step(self, ticks: int, up: bool = True) -> int:
+        """
+        Spread in tick counts above (up) or below a price.
+        """
+        if not self.steps:
+            return 1
+
+        if up:
+            i: int = bisect_right(self.bounds, ticks)
+        else:
+            i = bisect_left(self.bounds, ticks)
+        return self.steps[min(i, len(self.steps) - 1)]
+
+    def floor(self, ticks: int) -> int:
+        """
+        Highest valid price at or below ticks.
+        """
+        step: int = self.get_step(ticks, up=False)
+        return ticks // step * step
+
+    def ceil(self, ticks: int) -> int:
+        """
+        Lowest valid price at or above ticks.
+        """
+        step: int = self.get_step(ticks, up=True)
+        return -(-ticks // step) * step
+
+    def nearest(self, ticks: int) -> int:
+        """"""
+        low: int = self.floor(ticks)
+        high: int = self.ceil(ticks)
+        return low if ticks - low <= high - ticks else high
+
+    def shift(self, ticks: int, n: int) -> int:
+        """
+        Move a valid price n spreads up (n > 0) or down.
+        """
+        for _ in range(abs(n)):
+            if n > 0:
+                ticks += self.get_step(ticks, up=True)
+            else:
+                ticks -= self.get_step(ticks, up=False)
+        return ticks
+
+    def is_valid(self, ticks: int) -> bool:
+        """"""
+        return self.floor(ticks) == ticks
+
+    def round_price(self, price: float, direction: Direction = None) -> float:
+        """
+        Round a float price to a valid price: down for long, up for short, nearest otherwise.
+
+        Long and short prices are floored and ceiled from the raw price, never
+        from the nearest tick count, so the result never crosses the price.
+        """
+        ticks: float = price / self.unit
+        if direction == Direction.LONG:
+            return self.to_price(self.floor(math.floor(ticks + TICK_EPSILON)))
+        elif direction == Direction.SHORT:
+            return self.to_price(self.ceil(math.ceil(ticks - TICK_EPSILON)))
+        return self.to_price(self.nearest(self.to_ticks(price)))
+
+
+def get_decimals(unit: float) -> int:
+    """
+    Number of decimals of a price unit, e.g. 3 for 0.005 and 0 for 2.
+    """
+    exponent: int = Decimal(str(unit)).normalize().as_tuple().exponent
+    return max(0, -exponent)
+
+
+def make_hk_scale(vt_symbol: str, lot_size: int = 1) -> PriceScale:
+    """"""
+    bounds: List[int] = [int(round(upper / HK_PRICE_UNIT)) for upper, _ in HK_TICK_LADDER[:-1]]
+    steps: List[int] = [int(round(step / HK_PRICE_UNIT)) for _, step in HK_TICK_LADDER]
+    return PriceScale(vt_symbol, HK_PRICE_UNIT, lot_size, bounds, steps)
+
+
+@lru_cache(maxsize=999)
+def get_price_scale(vt_symbol: str) -> PriceScale:
+    """
+    Scale of a symbol from the stock basic info, HK symbols use the HK spread table.
+    """
+    from .futu_utility import extract_vt_symbol, get_stock_lot_size, get_stock_price_tick
+
+    _, exchange = extract_vt_symbol(vt_symbol)
+    lot_size: int = int(get_stock_lot_size(vt_symbol) or 1)
+
+    if exchange == Exchange.SEHK:
+        return make_hk_scale(vt_symbol, lot_size)
+    return PriceScale(vt_symbol, get_stock_price_tick(vt_symbol), lot_size)
+
+
+@dataclass
+class IntBook:
+    """
+    Five level order book in tick counts and lots.
+    """
+
+    vt_symbol: str
+    bid_prices: List[int]
+    bid_lots: List[int]
+    ask_prices: List[int]
+    ask_lots: List[int]
+
+    @property
+    def best_bid(self) -> int:
+        """"""
+        return self.bid_prices[0]
+
+    @property
+    def best_ask(self) -> int:
+        """"""
+        return self.ask_prices[0]
+
+    @property
+    def spread(self) -> int:
+        """"""
+        return self.ask_prices[0] - self.bid_prices[0]
+
+
+def convert_tick_book(tick: TickData, scale: PriceScale) -> IntBook:
+    """
+    Order book of a tick in integer units. Volumes are rounded down to whole lots.
+    """
+    return IntBook(
+        tick.vt_symbol,
+        [scale.to_ticks(getattr(tick, f"bid_price_{i}")) for i in range(1, 6)],
+        [scale.to_lots(getattr(tick, f"bid_volume_{i}")) for i in range(1, 6)],
+        [scale.to_ticks(getattr(tick, f"ask_price_{i}")) for i in range(1, 6)],
+        [scale.to_lots(getattr(tick, f"ask_volume_{i}")) for i in range(1, 6)],
+    )
+
+
+def make_order_request(
+    scale: PriceScale,
+    direction: Direction,
+    ticks: int,
+    lots: int,
+    type: OrderType = OrderType.LIMIT,
+    offset: Offset = Offset.NONE,
+    reference: str = "",
+    time_in_force: TimeInForce = TimeInForce.GTC,
+    aux_ticks: Optional[int] = None,
+) -> OrderRequest:
+    """
+    Build an order request from integer price and lots.
+
+    The price is snapped to a valid price that never crosses the intended
+    limit: down for buys, up for sells.
+    """
+    from .futu_utility import extract_vt_symbol
+
+    symbol, exchange = extract_vt_symbol(scale.vt_symbol)
+    ticks = scale.floor(ticks) if direction == Direction.LONG else scale.ceil(ticks)
+
+    return OrderRequest(
+        symbol=symbol,
+        exchange=exchange,
+        direction=direction,
+        type=type,
+        volume=scale.to_volume(lots),
+        price=scale.to_price(ticks),
+        offset=offset,
+        reference=reference,
+        time_in_force=time_in_force,
+        aux_price=None if aux_ticks is None else scale.to_price(scale.nearest(aux_ticks)),
+    )
+
+
+def make_quote_request(
+    scale: PriceScale,
+    bid_ticks: int,
+    bid_lots: int,
+    ask_ticks: int,
+    ask_lots: int,
+    reference: str = "",
+) -> QuoteRequest:
+    """
+    Build a quote request from integer prices and lots, snapping the bid down and the ask up.
+    """
+    from .futu_utility import extract_vt_symbol
+
+    symbol, exchange = extract_vt_symbol(scale.vt_symbol)
+
+    return QuoteRequest(
+        symbol=symbol,
+        exchange=exchange,
+        bid_price=scale.to_price(scale.floor(bid_ticks)),
+        bid_volume=scale.to_volume(bid_lots),
+        ask_price=scale.to_price(scale.ceil(ask_ticks)),
+        ask_volume=scale.to_volume(ask_lots),
+        reference=reference,
+    )
@@ -0,0 +1,97 @@
+"""
+Token bucket rate limiter shared by order, history and download requests.
+"""
+
+import time
+from threading import Lock
+from typing import Callable
+
+
+class TokenBucket:
+    """
+    Thread-safe token bucket.
+
+    Holds at most capacity tokens and refills rate tokens per second.
+    """
+
+    def __init__(self, rate: float, capacity: float, clock: Callable[[], float] = time.monotonic) -> None:
+        """"""
+        self.rate: float = rate
+        self.capacity: float = capacity
+        self.clock: Callable[[], float] = clock
+
+        self.tokens: float = capacity
+        self.last_time: float = clock()
+        self.lock: Lock = Lock()
+
+    @classmethod
+    def for_window(
+        cls, limit: int, period: float, burst: int = None, clock: Callable[[], float] = time.monotonic
+    ) -> "TokenBucket":
+        """
+        Bucket that never exceeds limit requests in any window of period seconds.
+
+        A bucket allows at most capacity + rate * period requests per window,
+        so the refill rate is what is left of the limit after the burst.
+        """
+        if burst is None:
+            burst = max(1, limit // 3)
+        burst = min(burst, limit)
+
+        rate: float = (limit - burst) / period if limit > burst else limit / period
+        return cls(rate, burst, clock)
+
+    def _refill(self, now: float) -> None:
+        """"""
+        elapsed: float = now - self.last_time
+        if elapsed > 0:
+            self.tokens = min(self.capacity, self.tokens + elapsed * self.rate)
+            self.last_time = now
+
+    def try_acquire(self, n: float = 1, now: float = None) -> bool:
+        """
+        Take n tokens if available without blocking.
+        """
+        with self.lock:
+            self._refill(self.clock() if now is None else now)
+            if self.tokens >= n:
+                self.tokens -= n
+                return True
+            return False
+
+    def wait_time(self, n: float = 1, now: float = None) -> float:
+        """
+        Seconds until n tokens are available.
+        """
+        with self.lock:
+            self._refill(self.clock() if now is None else now)
+            if self.tokens >= n:
+                return 0
+            return (n - self.tokens) / self.rate
+
+    def acquire(self, n: float = 1, timeout: float = None) -> bool:
+        """
+        Block until n tokens are taken or timeout seconds have passed.
+        """
+        deadline: float = None if timeout is None else self.clock() + timeout
+
+        while True:
+            wait: float = self.wait_time(n)
+            if not wait and self.try_acquire(n):
+                return True
+
+            if deadline is not None:
+                remaining: float = deadline - self.clock()
+                if remaining <= 0:
+                    return False
+                wait = min(wait, remaining)
+
+            time.sleep(wait)
+
+    def drain(self) -> None:
+        """
+        Drop all tokens, e.g. after the server rejected a request for frequency.
+        """
+        with self.lock:
+            self._refill(self.clock())
+            self.tokens = 0
@@ -0,0 +1,157 @@
+"""
+Vectorized portfolio rebalancing from target weights to order requests.
+"""
+
+from dataclasses import dataclass
+from typing import List, Tuple
+
+import numpy as np
+
+from .futu_utility import extract_vt_symbol
+from .object import Direction, Exchange, OrderRequest, OrderType, PositionData
+from .order_normalizer import OrderNormalizer
+
+
+@dataclass
+class RebalancePlan:
+    """
+    Signed trade volumes and limit prices aligned with the normalizer symbols.
+    """
+
+    trades: np.ndarray
+    prices: np.ndarray
+    target: np.ndarray
+    cash: float
+    orders: List[OrderRequest]
+
+
+class RebalanceEngine:
+    """
+    Turns target weights into lot-rounded trades that fit the available cash.
+
+    All inputs are arrays aligned with normalizer.vt_symbols, every step is a
+    numpy operation over the whole universe and only the final OrderRequest
+    objects are built per traded symbol.
+    """
+
+    def __init__(
+        self,
+        normalizer: OrderNormalizer,
+        cash_buffer: float = 0.0,
+        commission_rate: float = 0.0,
+        slippage: float = 0.0,
+        min_trade_value: float = 0.0,
+        order_type: OrderType = OrderType.LIMIT,
+        reference: str = "rebalance",
+    ) -> None:
+        """
+        :param cash_buffer: fraction of equity kept as cash
+        :param slippage: fraction added to buy prices and taken from sell prices before tick rounding
+        :param min_trade_value: trades of a smaller value are skipped
+        """
+        self.normalizer: OrderNormalizer = normalizer
+        self.cash_buffer: float = cash_buffer
+        self.commission_rate: float = commission_rate
+        self.slippage: float = slippage
+        self.min_trade_value: float = min_trade_value
+        self.order_type: OrderType = order_type
+        self.reference: str = reference
+
+        self.symbols: List[Tuple[str, Exchange]] = [extract_vt_symbol(v) for v in normalizer.vt_symbols]
+
+    def get_position_array(self, positions: List[PositionData]) -> np.ndarray:
+        """
+        Net volume per symbol, short positions negative. Unknown symbols are ignored.
+        """
+        volumes: np.ndarray = np.zeros(len(self.symbols))
+        rows: dict = self.normalizer.rows
+
+        for position in positions:
+            row: int = rows.get(position.vt_symbol, -1)
+            if row < 0:
+                continue
+
+            if position.direction == Direction.SHORT:
+                volumes[row] -= position.volume
+            else:
+                volumes[row] += position.volume
+
+        return volumes
+
+    def compute(self, weights: np.ndarray, prices: np.ndarray, current: np.ndarray, cash: float) -> RebalancePlan:
+        """
+        Compute trades from target weights, reference prices and current net volumes.
+
+        Equity is cash plus the market value of current positions. Symbols with
+        a zero target are closed completely, odd lots included. If buys cost more
+        than cash plus sell proceeds, all buys are scaled down by the same
+        factor and rounded down to lots again.
+        """
+        normalizer: OrderNormalizer = self.normalizer
+        weights = np.asarray(weights, dtype=np.float64)
+        prices = np.asarray(prices, dtype=np.float64)
+        current = np.asarray(current, dtype=np.float64)
+
+        valid: np.ndarray = prices > 0
+        safe_prices: np.ndarray = np.where(valid, prices, 1.0)
+
+        equity: float = cash + float(np.dot(current, prices * valid))
+        target_value: np.ndarray = weights * equity * (1 - self.cash_buffer)
+        target: np.ndarray = np.where(valid, target_value / safe_prices, current)
+
+        trades: np.ndarray = normalizer.round_volumes(target - current)
+        trades = np.where((weights == 0) & valid, -current, trades)
+
+        if self.min_trade_value:
+            trades = np.where(np.abs(trades) * prices < self.min_trade_value, 0, trades)
+
+        limit_prices: np.ndarray = normalizer.round_prices(
+            safe_prices * (1 + np.sign(trades) * self.slippage), trades
+        )
+
+        sells: np.ndarray = trades < 0
+        proceeds: float = float(-np.dot(trades[sells], limit_prices[sells])) * (1 - self.commission_rate)
+        available: float = cash + proceeds - equity * self.cash_buffer
+
+        buys: np.ndarray = trades > 0
+        cost: float = float(np.dot(trades[buys], limit_prices[buys])) * (1 + self.commission_rate)
+        if cost > available:
+            factor: float = max(available, 0) / cost
+            trades = np.where(buys, normalizer.round_volumes(trades * factor), trades)
+            cost = float(np.dot(trades[buys], limit_prices[buys])) * (1 + self.commission_rate)
+
+        orders: List[OrderRequest] = self.create_orders(trades, limit_prices)
+        return RebalancePlan(trades, limit_prices, target, cash + proceeds - cost, orders)
+
+    def create_orders(self, trades: np.ndarray, prices: np.ndarray) -> List[OrderRequest]:
+        """
+        Order requests for non-zero trades, sells first, each side by descending value.
+        """
+        traded: np.ndarray = np.flatnonzero(trades)
+        values: np.ndarray = np.abs(trades[traded]) * prices[traded]
+        # lexsort sorts by the last key first: buys after sells, then larger values first
+        order: np.ndarray = traded[np.lexsort((-values, trades[traded] > 0))]
+
+        orders: List[OrderRequest] = []
+        for row, volume, price in zip(order.tolist(), trades[order].tolist(), prices[order].tolist()):
+            symbol, exchange = self.symbols[row]
+            orders.append(
+                OrderRequest(
+                    symbol=symbol,
+                    exchange=exchange,
+                    direction=Direction.LONG if volume > 0 else Direction.SHORT,
+                    type=self.order_type,
+                    volume=abs(volume),
+                    price=price,
+                    reference=self.reference,
+                )
+            )
+
+        return orders
+
+    def rebalance(
+        self, weights: np.ndarray, prices: np.ndarray, positions: List[PositionData], cash: float
+    ) -> List[OrderRequest]:
+        """"""
+        current: np.ndarray = self.get_position_array(positions)
+        return self.compute(weights, prices, current, cash).orders
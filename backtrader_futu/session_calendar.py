@@ -0,0 +1,304 @@
+"""
+Trading session calendar per market.
+
+Session open and close times of every trading day are precomputed into
+sorted arrays of epoch seconds, so session and bar boundary lookups are a
+bisect over those arrays instead of datetime arithmetic per tick.
+
+Holidays and early closes are read from market_calendar.json in the temp
+folder, e.g.
+
+    {
+        "HK": {"holidays": ["2024-12-25"], "early_closes": {"2024-12-24": "12:00"}},
+        "US": {"holidays": ["2024-12-25"], "early_closes": {"2024-11-29": "13:00"}}
+    }
+
+or passed in directly. Weekends are never trading days.
+
+Opening and closing auctions are sessions of their own kinds, as their
+matches print trades at the official open and close. Callers only
+interested in continuous trading pass auctions=False or check the kind.
+"""
+
+from bisect import bisect_right
+from datetime import date, datetime, time, timedelta
+from functools import lru_cache
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from .futu_utility import EXCHANGE_VT2FUTU, EMarket
+from .object import Exchange
+from .utility import CHINA_TZ, ZoneInfo, load_json
+
+
+CALENDAR_FILE: str = "market_calendar.json"
+
+SESSION_PRE: str = "pre"
+SESSION_REGULAR: str = "regular"
+SESSION_POST: str = "post"
+SESSION_OPEN_AUCTION: str = "open_auction"
+SESSION_CLOSE_AUCTION: str = "close_auction"
+
+AUCTION_KINDS: Tuple[str, ...] = (SESSION_OPEN_AUCTION, SESSION_CLOSE_AUCTION)
+EXTENDED_KINDS: Tuple[str, ...] = (SESSION_PRE, SESSION_POST)
+
+MARKET_TIMEZONES: Dict[EMarket, str] = {
+    EMarket.HK: "Asia/Hong_Kong",
+    EMarket.US: "America/New_York",
+    EMarket.SH: "Asia/Shanghai",
+    EMarket.SZ: "Asia/Shanghai",
+}
+
+# (open, close, kind) in market local time, in order
+MARKET_SESSIONS: Dict[EMarket, List[Tuple[time, time, str]]] = {
+    EMarket.HK: [
+        # pre-opening session, orders are matched at 9:20
+        (time(9, 0), time(9, 30), SESSION_OPEN_AUCTION),
+        (time(9, 30), time(12, 0), SESSION_REGULAR),
+        (time(13, 0), time(16, 0), SESSION_REGULAR),
+        # closing auction session, matched between 16:08 and 16:10
+        (time(16, 0), time(16, 10), SESSION_CLOSE_AUCTION),
+    ],
+    EMarket.US: [
+        (time(4, 0), time(9, 30), SESSION_PRE),
+        (time(9, 30), time(16, 0), SESSION_REGULAR),
+        (time(16, 0), time(20, 0), SESSION_POST),
+    ],
+    # the closing call auction of 14:57 to 15:00 lies inside the regular session
+    EMarket.SH: [
+        (time(9, 15), time(9, 25), SESSION_OPEN_AUCTION),
+        (time(9, 30), time(11, 30), SESSION_REGULAR),
+        (time(13, 0), time(15, 0), SESSION_REGULAR),
+    ],
+    EMarket.SZ: [
+        (time(9, 15), time(9, 25), SESSION_OPEN_AUCTION),
+        (time(9, 30), time(11, 30), SESSION_REGULAR),
+        (time(13, 0), time(15, 0), SESSION_REGULAR),
+    ],
+}
+
+# years before and after the current year covered when no range is given
+DEFAULT_YEARS: int = 1
+
+
+class SessionCalendar:
+    """
+    Sessions of one market as sorted arrays of [open, close) epoch seconds.
+
+    An early close cuts the regular session at the given time and drops the
+    sessions after it, except a closing auction, which follows the early close.
+    """
+
+    def __init__(
+        self,
+        market: EMarket,
+        holidays: Iterable[date] = (),
+        early_closes: Dict[date, time] = None,
+        extended: bool = False,
+        start: date = None,
+        end: date = None,
+        auctions: bool = True,
+    ) -> None:
+        """
+        :param extended: include the US pre and post market sessions
+        :param auctions: include the opening and closing auction sessions
+        """
+        self.market: EMarket = market
+        self.tz: ZoneInfo = ZoneInfo(MARKET_TIMEZONES[market])
+        self.holidays: set = set(holidays)
+        self.early_closes: Dict[date, time] = early_closes or {}
+        self.sessions: List[Tuple[time, time, str]] = [
+            session for session in MARKET_SESSIONS[market]
+            if session[2] == SESSION_REGULAR
+            or (extended and session[2] in EXTENDED_KINDS)
+            or (auctions and session[2] in AUCTION_KINDS)
+        ]
+
+        today: date = datetime.now(self.tz).date()
+        self.start: date = start or date(today.year - DEFAULT_YEARS, 1, 1)
+        self.end: date = end or date(today.year + DEFAULT_YEARS, 12, 31)
+
+        self.opens: List[float] = []
+        self.closes: List[float] = []
+        self.kinds: List[str] = []
+        self.build()
+
+    def build(self) -> None:
+        """
+        Precompute the sessions of every trading day in [start, end].
+        """
+        opens: List[float] = []
+        closes: List[float] = []
+        kinds: List[str] = []
+
+        day: date = self.start
+        while day <= self.end:
+            if self.is_trading_day(day):
+                early_close: Optional[time] = self.early_closes.get(day, None)
+
+                for open_time, close_time, kind in self.sessions:
+                    if early_close and kind == SESSION_CLOSE_AUCTION and open_time > early_close:
+                        duration: timedelta = datetime.combine(day, close_time) - datetime.combine(day, open_time)
+                        open_time = early_close
+                        close_time = (datetime.combine(day, early_close) + duration).time()
+                    elif early_close and open_time >= early_close:
+                        continue
+                    elif early_close and close_time > early_close:
+                        close_time = early_close
+
+                    opens.append(datetime.combine(day, open_time, self.tz).timestamp())
+                    closes.append(datetime.combine(day, close_time, self.tz).timestamp())
+                    kinds.append(kind)
+
+            day += timedelta(days=1)
+
+        self.opens, self.closes, self.kinds = opens, closes, kinds
+
+    def extend(self, ts: float) -> None:
+        """
+        Grow the precomputed range to cover a timestamp.
+        """
+        day: date = datetime.fromtimestamp(ts, self.tz).date()
+        if self.start <= day <= self.end:
+            return
+
+        self.start = min(self.start, date(day.year, 1, 1))
+        self.end = max(self.end, date(day.year, 12, 31))
+        self.build()
+
+    def is_trading_day(self, day: date) -> bool:
+        """"""
+        return day.weekday() < 5 and day not in self.holidays
+
+    def find_session(self, ts: float) -> int:
+        """
+        Index of the session containing ts, -1 outside sessions.
+        """
+        if not self.opens or ts < self.opens[0] or ts >= self.closes[-1]:
+            self.extend(ts)
+
+        i: int = bisect_right(self.opens, ts) - 1
+        if i >= 0 and ts < self.closes[i]:
+            return i
+        return -1
+
+    def is_in_session(self, ts: float) -> bool:
+        """"""
+        return self.find_session(ts) >= 0
+
+    def get_session_kind(self, ts: float) -> str:
+        """
+        pre, regular, post, open_auction or close_auction, empty outside sessions.
+        """
+        i: int = self.find_session(ts)
+        return self.kinds[i] if i >= 0 else ""
+
+    def get_bar_bucket(self, ts: float, seconds: int) -> Optional[Tuple[float, float]]:
+        """
+        [start, end) of the bar of the given length containing ts.
+
+        Bars are aligned to the session open and the last bar of a session
+        ends at the close, so no bar spans a break. None outside sessions.
+        """
+        i: int = self.find_session(ts)
+        if i < 0:
+            return None
+
+        session_open: float = self.opens[i]
+        bar_start: float = session_open + (ts - session_open) // seconds * seconds
+        return bar_start, min(bar_start + seconds, self.closes[i])
+
+    def get_day_bucket(self, ts: float) -> Optional[Tuple[float, float]]:
+        """
+        [first open, last close) of the trading day of the session containing ts, None outside sessions.
+        """
+        i: int = self.find_session(ts)
+        if i < 0:
+            return None
+
+        day: date = datetime.fromtimestamp(self.opens[i], self.tz).date()
+        first: int = i
+        while first > 0 and datetime.fromtimestamp(self.opens[first - 1], self.tz).date() == day:
+            first -= 1
+        last: int = i
+        while last + 1 < len(self.opens) and datetime.fromtimestamp(self.opens[last + 1], self.tz).date() == day:
+            last += 1
+
+        return self.opens[first], self.closes[last]
+
+    def get_next_open(self, ts: float) -> Optional[float]:
+        """
+        First session open after ts.
+        """
+        i: int = bisect_right(self.opens, ts)
+        if i >= len(self.opens):
+            self.extend(ts + 366 * 86400)
+            i = bisect_right(self.opens, ts)
+        return self.opens[i] if i < len(self.opens) else None
+
+    def get_next_boundary(self, ts: float, seconds: int = 0) -> Optional[float]:
+        """
+        Next bar close inside a session, or the next session open outside sessions.
+
+        With seconds 0 the next boundary is the session close.
+        """
+        i: int = self.find_session(ts)
+        if i < 0:
+            return self.get_next_open(ts)
+
+        if not seconds:
+            return self.closes[i]
+        return self.get_bar_bucket(ts, seconds)[1]
+
+    def get_sessions(self, day: date) -> List[Tuple[datetime, datetime, str]]:
+        """
+        Sessions of a day as market local datetimes.
+        """
+        start: float = datetime.combine(day, time(0), self.tz).timestamp()
+        end: float = start + 86400
+        self.extend(start)
+
+        i: int = bisect_right(self.opens, start - 1)
+
+        sessions: List[Tuple[datetime, datetime, str]] = []
+        while i < len(self.opens) and self.opens[i] < end:
+            sessions.append((
+                datetime.fromtimestamp(self.opens[i], self.tz),
+                datetime.fromtimestamp(self.closes[i], self.tz),
+                self.kinds[i],
+            ))
+            i += 1
+        return sessions
+
+
+def load_calendar_setting(market: EMarket) -> Tuple[List[date], Dict[date, time]]:
+    """
+    Holidays and early closes of a market from market_calendar.json.
+    """
+    setting: dict = load_json(CALENDAR_FILE).get(market.value, {})
+
+    holidays: List[date] = [date.fromisoformat(day) for day in setting.get("holidays", [])]
+    early_closes: Dict[date, time] = {
+        date.fromisoformat(day): time.fromisoformat(close_time)
+        for day, close_time in setting.get("early_closes", {}).items()
+    }
+    return holidays, early_closes
+
+
+@lru_cache(maxsize=None)
+def get_exchange_timezone(exchange: Exchange) -> ZoneInfo:
+    """
+    Local timezone of the market of an exchange, in which futu formats its times.
+    """
+    futu_exchange: Optional[str] = EXCHANGE_VT2FUTU.get(exchange, None)
+    if futu_exchange is None:
+        return CHINA_TZ
+    return ZoneInfo(MARKET_TIMEZONES[EMarket(futu_exchange)])
+
+
+@lru_cache(maxsize=None)
+def get_session_calendar(market: EMarket, extended: bool = False, auctions: bool = True) -> SessionCalendar:
+    """
+    Shared calendar of a market with holidays from market_calendar.json.
+    """
+    holidays, early_closes = load_calendar_setting(market)
+    return SessionCalendar(market, holidays, early_closes, extended, auctions=auctions)
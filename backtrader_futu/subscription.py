@@ -0,0 +1,216 @@
+"""
+Quota-aware subscription manager for OpenD quote subscriptions.
+"""
+
+import logging
+import time
+from collections import OrderedDict
+from threading import RLock
+from typing import Callable, Dict, FrozenSet, Iterable, List, Set, Tuple
+
+from .object import SubscribeRequest
+from .futu_utility import convert_symbol_vt2futu, extract_vt_symbol
+
+
+# (futu code, futu SubType), e.g. ("HK.00700", "TICKER")
+SubKey = Tuple[str, str]
+
+
+class SubscriptionManager:
+    """
+    Reference-counts subscriptions per (code, subtype) across feeds.
+
+    subscribe/unsubscribe only change reference counts; flush() sends the
+    resulting subscribe and unsubscribe calls in batches. A subscription whose
+    count drops to zero stays subscribed as idle, so resubscribing it costs no
+    round trip. When the quota runs out, idle subscriptions are unsubscribed
+    in least recently used order once they have been held for min_hold seconds,
+    which OpenD requires before an unsubscribe.
+    """
+
+    def __init__(
+        self,
+        quote_ctx,
+        quota: int = 100,
+        min_hold: float = 60.0,
+        batch_size: int = 200,
+        clock: Callable[[], float] = time.monotonic,
+        output: Callable = None,
+    ) -> None:
+        """"""
+        self.quote_ctx = quote_ctx
+        self.quota: int = quota
+        self.min_hold: float = min_hold
+        self.batch_size: int = batch_size
+        self.clock: Callable[[], float] = clock
+        self.output: Callable = output or print
+
+        self.refs: Dict[SubKey, int] = {}
+        self.active: Dict[SubKey, float] = {}
+        self.idle: "OrderedDict[SubKey, float]" = OrderedDict()
+        self.pending: Set[SubKey] = set()
+
+        self.lock: RLock = RLock()
+
+    def sync_quota(self) -> None:
+        """
+        Read the quota left for this connection from OpenD.
+        """
+        import futu as ft
+
+        ret, data = self.quote_ctx.query_subscription(is_all_conn=False)
+        if ret != ft.RET_OK:
+            self.output(f"query subscription failed: {data}", logging.WARNING)
+            return
+
+        with self.lock:
+            self.quota = data["own_used"] + data["remain"]
+
+    def subscribe(self, vt_symbols: Iterable[str], subtypes: Iterable[str]) -> None:
+        """
+        Add one reference for every (symbol, subtype).
+        """
+        with self.lock:
+            for vt_symbol in vt_symbols:
+                code: str = self._get_code(vt_symbol)
+                for subtype in subtypes:
+                    key: SubKey = (code, subtype)
+                    self.refs[key] = self.refs.get(key, 0) + 1
+
+                    if key in self.active:
+                        self.idle.pop(key, None)
+                    else:
+                        self.pending.add(key)
+
+    def subscribe_request(self, req: SubscribeRequest, subtypes: Iterable[str]) -> None:
+        """"""
+        self.subscribe([req.vt_symbol], subtypes)
+
+    def unsubscribe(self, vt_symbols: Iterable[str], subtypes: Iterable[str]) -> None:
+        """
+        Drop one reference for every (symbol, subtype).
+        """
+        with self.lock:
+            now: float = self.clock()
+
+            for vt_symbol in vt_symbols:
+                code: str = self._get_code(vt_symbol)
+                for subtype in subtypes:
+                    key: SubKey = (code, subtype)
+                    count: int = self.refs.get(key, 0) - 1
+                    if count > 0:
+                        self.refs[key] = count
+                        continue
+
+                    self.refs.pop(key, None)
+                    self.pending.discard(key)
+                    if key in self.active:
+                        self.idle[key] = now
+
+    def touch(self, vt_symbol: str, subtype: str) -> None:
+        """
+        Mark an idle subscription as recently used.
+        """
+        key: SubKey = (self._get_code(vt_symbol), subtype)
+        with self.lock:
+            if key in self.idle:
+                self.idle[key] = self.clock()
+                self.idle.move_to_end(key)
+
+    def used(self) -> int:
+        """"""
+        return len(self.active)
+
+    def flush(self) -> List[SubKey]:
+        """
+        Send batched subscribe/unsubscribe calls.
+
+        Returns the subscriptions still pending because the quota is used up.
+        """
+        with self.lock:
+            needed: List[SubKey] = sorted(self.pending)
+            shortage: int = len(self.active) + len(needed) - self.quota
+            if shortage > 0:
+                self._evict(shortage)
+
+            free: int = max(0, self.quota - len(self.active))
+            to_subscribe: List[SubKey] = needed[:free]
+            if to_subscribe:
+                self._send(to_subscribe, subscribe=True)
+
+            remaining: List[SubKey] = sorted(self.pending)
+            if remaining:
+                self.output(
+                    f"subscription quota {self.quota} used up, {len(remaining)} subscriptions pending",
+                    logging.WARNING,
+                )
+            return remaining
+
+    def release_idle(self) -> None:
+        """
+        Unsubscribe every idle subscription past its minimum hold time.
+        """
+        with self.lock:
+            self._evict(len(self.idle))
+
+    def _evict(self, count: int) -> None:
+        """
+        Unsubscribe up to count idle subscriptions, least recently used first.
+        """
+        now: float = self.clock()
+        evicted: List[SubKey] = []
+
+        for key in self.idle:
+            if len(evicted) >= count:
+                break
+            if now - self.active[key] >= self.min_hold:
+                evicted.append(key)
+
+        if evicted:
+            self._send(evicted, subscribe=False)
+
+    def _send(self, keys: List[SubKey], subscribe: bool) -> None:
+        """
+        Group keys by their subtype set so each call covers many codes.
+        """
+        code_subtypes: Dict[str, Set[str]] = {}
+        for code, subtype in keys:
+            code_subtypes.setdefault(code, set()).add(subtype)
+
+        groups: Dict[FrozenSet[str], List[str]] = {}
+        for code, subtypes in code_subtypes.items():
+            groups.setdefault(frozenset(subtypes), []).append(code)
+
+        import futu as ft
+
+        for subtypes, codes in groups.items():
+            subtype_list: List[str] = sorted(subtypes)
+
+            for i in range(0, len(codes), self.batch_size):
+                batch: List[str] = codes[i: i + self.batch_size]
+
+                if subscribe:
+                    ret, data = self.quote_ctx.subscribe(batch, subtype_list)
+                else:
+                    ret, data = self.quote_ctx.unsubscribe(batch, subtype_list)
+
+                action: str = "subscribe" if subscribe else "unsubscribe"
+                if ret != ft.RET_OK:
+                    self.output(f"{action} {len(batch)} codes {subtype_list} failed: {data}", logging.WARNING)
+                    continue
+
+                now: float = self.clock()
+                for code in batch:
+                    for subtype in subtype_list:
+                        key: SubKey = (code, subtype)
+                        if subscribe:
+                            self.pending.discard(key)
+                            self.active[key] = now
+                        else:
+                            self.active.pop(key, None)
+                            self.idle.pop(key, None)
+
+    def _get_code(self, vt_symbol: str) -> str:
+        """"""
+        symbol, exchange = extract_vt_symbol(vt_symbol)
+        return convert_symbol_vt2futu(symbol, exchange)
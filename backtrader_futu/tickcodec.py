@@ -0,0 +1,542 @@
+"""
+Compact binary storage of ticks.
+
+Ticks of one symbol are held column-wise in a TickBatch and written in
+blocks of up to block_size ticks. Inside a block
+
+* prices are stored as integer counts of the contract price tick
+* volumes are stored as integer counts of the lot size
+* datetime and localtime are stored as integer microseconds, a missing
+  localtime as NULL_US
+
+and every integer column keeps its first value as a base in the column
+header, while the deltas after it are zigzag mapped and packed into the
+narrowest of 1, 2, 4 or 8 byte unsigned integers. A column that does not
+survive the conversion exactly, e.g. a price off the tick grid, is stored as
+raw float64 instead, so decoding always gives back the original values.
+extra dicts, if any tick has one, are stored as a JSON list. The block body
+is optionally zlib compressed.
+
+Blocks are independently decodable. The file ends with an index of all
+blocks (symbol, offset, size, count, first and last time) so readers seek
+straight to the blocks of one symbol and time range.
+
+    file   := MAGIC block* index trailer
+    block  := BLOCK_HEADER symbol name body
+    body   := (COLUMN_HEADER data)*
+"""
+
+import struct
+import zlib
+from dataclasses import dataclass, field
+from datetime import datetime, timezone
+from decimal import Decimal
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+import numpy as np
+
+from .object import Exchange, TickData
+from .utility import CHINA_TZ
+
+
+MAGIC: bytes = b"BTFT"
+VERSION: int = 2
+
+# count, flags, price tick, lot size, symbol length, name length, exchange length
+BLOCK_HEADER: struct.Struct = struct.Struct("<IBddHHB")
+# encoding, width, scale, decimals, base, data length
+COLUMN_HEADER: struct.Struct = struct.Struct("<BBdbqI")
+# index offset, index length, magic
+TRAILER: struct.Struct = struct.Struct("<QI4s")
+
+FLAG_COMPRESSED: int = 1
+
+ENCODING_DELTA: int = 1
+ENCODING_FLOAT: int = 2
+ENCODING_JSON: int = 3
+
+DATETIME_FIELD: str = "datetime"
+LOCALTIME_FIELD: str = "localtime"
+EXTRA_FIELD: str = "extra"
+
+# localtime of ticks without one
+NULL_US: int = -2 ** 63
+
+PRICE_FIELDS: List[str] = [
+    "last_price",
+    "limit_up",
+    "limit_down",
+    "open_price",
+    "high_price",
+    "low_price",
+    "pre_close",
+] + [f"{side}_price_{i}" for side in ("bid", "ask") for i in range(1, 6)]
+
+VOLUME_FIELDS: List[str] = [
+    "volume",
+    "last_volume",
+    "open_interest",
+] + [f"{side}_volume_{i}" for side in ("bid", "ask") for i in range(1, 6)]
+
+FLOAT_FIELDS: List[str] = ["turnover"]
+
+TICK_FIELDS: List[str] = PRICE_FIELDS + VOLUME_FIELDS + FLOAT_FIELDS
+
+WIDTH_DTYPES: Dict[int, str] = {1: "<u1", 2: "<u2", 4: "<u4", 8: "<u8"}
+
+EPOCH: datetime = datetime(1970, 1, 1, tzinfo=timezone.utc)
+
+
+@dataclass
+class TickBatch:
+    """
+    Ticks of one symbol as numpy columns.
+
+    datetime and localtime hold int64 microseconds since the epoch, every
+    TICK_FIELDS column holds float64 values. extra, an object array of dicts
+    or None, is only present if a tick has one.
+    """
+
+    symbol: str
+    exchange: Exchange
+    name: str = ""
+    gateway_name: str = ""
+    columns: Dict[str, np.ndarray] = field(default_factory=dict)
+
+    def __post_init__(self) -> None:
+        """"""
+        self.vt_symbol: str = f"{self.symbol}.{self.exchange.value}"
+
+    def __len__(self) -> int:
+        """"""
+        times: Optional[np.ndarray] = self.columns.get(DATETIME_FIELD, None)
+        return 0 if times is None else len(times)
+
+    @classmethod
+    def from_ticks(cls, ticks: List[TickData]) -> "TickBatch":
+        """
+        Build a batch from ticks of one symbol. Naive datetimes are taken as China time.
+        """
+        first: TickData = ticks[0]
+        columns: Dict[str, np.ndarray] = {
+            DATETIME_FIELD: np.array([_to_us(tick.datetime) for tick in ticks], dtype=np.int64),
+            LOCALTIME_FIELD: np.array(
+                [_to_us(tick.localtime) if tick.localtime else NULL_US for tick in ticks], dtype=np.int64
+            ),
+        }
+        for name in TICK_FIELDS:
+            columns[name] = np.array([getattr(tick, name) for tick in ticks], dtype=np.float64)
+
+        if any(tick.extra is not None for tick in ticks):
+            columns[EXTRA_FIELD] = _to_objects([tick.extra for tick in ticks])
+
+        return cls(first.symbol, first.exchange, first.name, first.gateway_name, columns)
+
+    def to_ticks(self) -> List[TickData]:
+        """"""
+        times: List[datetime] = [_from_us(us) for us in self.columns[DATETIME_FIELD].tolist()]
+        localtimes: List[Optional[datetime]] = [
+            None if us == NULL_US else _from_us(us) for us in self.columns[LOCALTIME_FIELD].tolist()
+        ]
+        extras: Optional[np.ndarray] = self.columns.get(EXTRA_FIELD, None)
+        values: List[list] = [self.columns[name].tolist() for name in TICK_FIELDS]
+
+        ticks: List[TickData] = []
+        for i, dt in enumerate(times):
+            tick: TickData = TickData(
+                gateway_name=self.gateway_name,
+                symbol=self.symbol,
+                exchange=self.exchange,
+                datetime=dt,
+                name=self.name,
+                localtime=localtimes[i],
+            )
+            for name, column in zip(TICK_FIELDS, values):
+                setattr(tick, name, column[i])
+            if extras is not None:
+                tick.extra = extras[i]
+            ticks.append(tick)
+
+        return ticks
+
+    def slice(self, start: int, stop: int) -> "TickBatch":
+        """"""
+        columns: Dict[str, np.ndarray] = {name: column[start:stop] for name, column in self.columns.items()}
+        return TickBatch(self.symbol, self.exchange, self.name, self.gateway_name, columns)
+
+    @classmethod
+    def concat(cls, batches: List["TickBatch"]) -> "TickBatch":
+        """"""
+        first: TickBatch = batches[0]
+        columns: Dict[str, np.ndarray] = {
+            name: np.concatenate([batch.columns[name] for batch in batches])
+            for name in first.columns if name != EXTRA_FIELD
+        }
+
+        # batches without extras contribute Nones
+        if any(EXTRA_FIELD in batch.columns for batch in batches):
+            columns[EXTRA_FIELD] = np.concatenate([
+                batch.columns.get(EXTRA_FIELD, _to_objects([None] * len(batch))) for batch in batches
+            ])
+
+        return cls(first.symbol, first.exchange, first.name, first.gateway_name, columns)
+
+
+def _to_objects(values: list) -> np.ndarray:
+    """
+    1-d object array, also for values numpy would otherwise nest.
+    """
+    array: np.ndarray = np.empty(len(values), dtype=object)
+    array[:] = values
+    return array
+
+
+def _to_us(dt: datetime) -> int:
+    """"""
+    if dt.tzinfo is None:
+        dt = dt.replace(tzinfo=CHINA_TZ)
+    delta = dt - EPOCH
+    return (delta.days * 86400 + delta.seconds) * 1000000 + delta.microseconds
+
+
+def _from_us(us: int) -> datetime:
+    """"""
+    return datetime.fromtimestamp(us // 1000000, CHINA_TZ).replace(microsecond=us % 1000000)
+
+
+def _get_decimals(scale: float) -> int:
+    """
+    Decimal places of a price tick, e.g. 3 for 0.005.
+    """
+    return max(0, -Decimal(repr(scale)).normalize().as_tuple().exponent)
+
+
+def _pack_ints(values: np.ndarray) -> Tuple[int, int, bytes]:
+    """
+    Split int64 values into the first value as base and the zigzag mapped deltas
+    after it, packed into the narrowest unsigned width.
+
+    Deltas wrap around like int64 arithmetic, which the cumulative sum on decoding undoes.
+    """
+    if not len(values):
+        return 0, 1, b""
+
+    with np.errstate(over="ignore"):
+        deltas: np.ndarray = np.diff(values)
+    zigzag: np.ndarray = ((deltas << 1) ^ (deltas >> 63)).view(np.uint64)
+
+    top: int = int(zigzag.max()) if len(zigzag) else 0
+    for width, dtype in WIDTH_DTYPES.items():
+        if top < 1 << (8 * width):
+            return int(values[0]), width, zigzag.astype(dtype).tobytes()
+    raise ValueError("value out of range")
+
+
+def _unpack_ints(base: int, width: int, data: bytes, count: int) -> np.ndarray:
+    """"""
+    if not count:
+        return np.zeros(0, dtype=np.int64)
+
+    zigzag: np.ndarray = np.frombuffer(data, dtype=WIDTH_DTYPES[width]).astype(np.uint64)
+    deltas: np.ndarray = (zigzag >> np.uint64(1)).view(np.int64) ^ -(zigzag & np.uint64(1)).view(np.int64)
+
+    values: np.ndarray = np.empty(count, dtype=np.int64)
+    values[0] = base
+    with np.errstate(over="ignore"):
+        np.cumsum(deltas, dtype=np.int64, out=values[1:])
+        values[1:] += np.int64(base)
+    return values
+
+
+def _encode_ints(values: np.ndarray) -> bytes:
+    """"""
+    base, width, data = _pack_ints(values.astype(np.int64))
+    return COLUMN_HEADER.pack(ENCODING_DELTA, width, 0, -1, base, len(data)) + data
+
+
+def _encode_objects(values: Optional[np.ndarray]) -> bytes:
+    """
+    JSON list of the values, empty if there are none.
+    """
+    import orjson
+
+    data: bytes = orjson.dumps(values.tolist()) if values is not None else b""
+    return COLUMN_HEADER.pack(ENCODING_JSON, 0, 0, -1, 0, len(data)) + data
+
+
+def _encode_column(values: np.ndarray, scale: float, decimals: int) -> bytes:
+    """
+    Encode a float column as integer multiples of scale if that is lossless, else as raw float64.
+
+    decimals < 0 decodes as count * scale without rounding.
+    """
+    if scale > 0 and len(values) and np.isfinite(values).all():
+        counts: np.ndarray = np.rint(values / scale)
+        if np.abs(counts).max() < 2 ** 62:
+            counts = counts.astype(np.int64)
+            if np.array_equal(_scale_counts(counts, scale, decimals), values):
+                base, width, data = _pack_ints(counts)
+                return COLUMN_HEADER.pack(ENCODING_DELTA, width, scale, decimals, base, len(data)) + data
+
+    data = values.astype("<f8").tobytes()
+    return COLUMN_HEADER.pack(ENCODING_FLOAT, 8, 0, -1, 0, len(data)) + data
+
+
+def _scale_counts(counts: np.ndarray, scale: float, decimals: int) -> np.ndarray:
+    """"""
+    values: np.ndarray = counts * scale
+    if decimals >= 0:
+        values = np.round(values, decimals)
+    return values
+
+
+def _decode_column(buffer: memoryview, offset: int, count: int) -> Tuple[Optional[np.ndarray], int]:
+    """
+    Values of the column at offset and the offset after it, None for an empty JSON column.
+    """
+    import orjson
+
+    encoding, width, scale, decimals, base, length = COLUMN_HEADER.unpack_from(buffer, offset)
+    offset += COLUMN_HEADER.size
+    data: bytes = buffer[offset: offset + length]
+
+    if encoding == ENCODING_DELTA:
+        values: Optional[np.ndarray] = _unpack_ints(base, width, data, count)
+        if scale:
+            values = _scale_counts(values, scale, decimals)
+    elif encoding == ENCODING_JSON:
+        values = _to_objects(orjson.loads(bytes(data))) if length else None
+    else:
+        values = np.frombuffer(data, dtype="<f8").copy()
+
+    return values, offset + length
+
+
+def encode_block(batch: TickBatch, price_tick: float = 0, lot_size: float = 1, compress: bool = True) -> bytes:
+    """
+    Encode a whole batch as one independently decodable block.
+    """
+    price_decimals: int = _get_decimals(price_tick) if price_tick else -1
+    volume_decimals: int = _get_decimals(lot_size) if lot_size else -1
+
+    parts: List[bytes] = [
+        _encode_ints(batch.columns[DATETIME_FIELD]),
+        _encode_ints(batch.columns[LOCALTIME_FIELD]),
+    ]
+
+    for name in PRICE_FIELDS:
+        parts.append(_encode_column(batch.columns[name], price_tick, price_decimals))
+    for name in VOLUME_FIELDS:
+        parts.append(_encode_column(batch.columns[name], lot_size, volume_decimals))
+    for name in FLOAT_FIELDS:
+        parts.append(_encode_column(batch.columns[name], 0, -1))
+    parts.append(_encode_objects(batch.columns.get(EXTRA_FIELD, None)))
+
+    body: bytes = b"".join(parts)
+    flags: int = 0
+    if compress:
+        body = zlib.compress(body, 6)
+        flags |= FLAG_COMPRESSED
+
+    symbol: bytes = batch.symbol.encode("utf-8")
+    name: bytes = batch.name.encode("utf-8")
+    exchange: bytes = batch.exchange.value.encode("utf-8")
+    header: bytes = BLOCK_HEADER.pack(
+        len(batch), flags, price_tick, lot_size, len(symbol), len(name), len(exchange)
+    )
+    return header + symbol + name + exchange + body
+
+
+def decode_block(data: bytes, gateway_name: str = "") -> TickBatch:
+    """"""
+    count, flags, _, _, symbol_len, name_len, exchange_len = BLOCK_HEADER.unpack_from(data, 0)
+    offset: int = BLOCK_HEADER.size
+
+    symbol: str = data[offset: offset + symbol_len].decode("utf-8")
+    offset += symbol_len
+    name: str = data[offset: offset + name_len].decode("utf-8")
+    offset += name_len
+    exchange: Exchange = Exchange(data[offset: offset + exchange_len].decode("utf-8"))
+    offset += exchange_len
+
+    body: bytes = data[offset:]
+    if flags & FLAG_COMPRESSED:
+        body = zlib.decompress(body)
+    buffer: memoryview = memoryview(body)
+
+    columns: Dict[str, np.ndarray] = {}
+    offset = 0
+    for name_ in [DATETIME_FIELD, LOCALTIME_FIELD] + TICK_FIELDS + [EXTRA_FIELD]:
+        values, offset = _decode_column(buffer, offset, count)
+        if values is not None:
+            columns[name_] = values
+
+    batch: TickBatch = TickBatch(symbol, exchange, name, gateway_name, columns)
+    if len(batch) != count:
+        raise ValueError(f"corrupt block of {symbol}: {len(batch)} ticks, expected {count}")
+    return batch
+
+
+@dataclass
+class BlockIndex:
+    """
+    Location and time range of one block.
+    """
+
+    vt_symbol: str
+    offset: int
+    size: int
+    count: int
+    start_us: int
+    end_us: int
+
+
+class TickWriter:
+    """
+    Writes tick batches as blocks and the block index on close.
+    """
+
+    def __init__(self, path: str, block_size: int = 65536, compress: bool = True) -> None:
+        """"""
+        self.path: Path = Path(path)
+        self.block_size: int = block_size
+        self.compress: bool = compress
+
+        self.index: List[BlockIndex] = []
+        self.file = open(self.path, "wb")
+        self.file.write(MAGIC + bytes([VERSION]))
+
+    def write(self, batch: TickBatch, price_tick: float = 0, lot_size: float = 1) -> None:
+        """
+        Append ticks of one symbol, split into blocks of at most block_size ticks.
+
+        :param price_tick: e.g. ContractData.pricetick or get_stock_price_tick(vt_symbol)
+        :param lot_size: e.g. get_stock_lot_size(vt_symbol)
+        """
+        times: np.ndarray = batch.columns[DATETIME_FIELD]
+
+        for start in range(0, len(batch), self.block_size):
+            stop: int = min(start + self.block_size, len(batch))
+            data: bytes = encode_block(batch.slice(start, stop), price_tick, lot_size, self.compress)
+
+            offset: int = self.file.tell()
+            self.file.write(data)
+            self.index.append(
+                BlockIndex(batch.vt_symbol, offset, len(data), stop - start, int(times[start]), int(times[stop - 1]))
+            )
+
+    def write_ticks(self, ticks: List[TickData], price_tick: float = 0, lot_size: float = 1) -> None:
+        """"""
+        if ticks:
+            self.write(TickBatch.from_ticks(ticks), price_tick, lot_size)
+
+    def close(self) -> None:
+        """"""
+        import orjson
+
+        if self.file is None:
+            return
+
+        rows: list = [
+            [i.vt_symbol, i.offset, i.size, i.count, i.start_us, i.end_us] for i in self.index
+        ]
+        data: bytes = orjson.dumps(rows)
+
+        offset: int = self.file.tell()
+        self.file.write(data)
+        self.file.write(TRAILER.pack(offset, len(data), MAGIC))
+        self.file.close()
+        self.file = None
+
+    def __enter__(self) -> "TickWriter":
+        """"""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """"""
+        self.close()
+
+
+class TickReader:
+    """
+    Reads blocks of a tick file through its index.
+    """
+
+    def __init__(self, path: str, gateway_name: str = "") -> None:
+        """"""
+        import orjson
+
+        self.path: Path = Path(path)
+        self.gateway_name: str = gateway_name
+        self.file = open(self.path, "rb")
+
+        head: bytes = self.file.read(len(MAGIC) + 1)
+        if head[:len(MAGIC)] != MAGIC:
+            raise ValueError(f"{path} is not a tick file")
+        if head[len(MAGIC)] != VERSION:
+            raise ValueError(f"{path} has version {head[len(MAGIC)]}, expected {VERSION}")
+
+        self.file.seek(-TRAILER.size, 2)
+        offset, length, magic = TRAILER.unpack(self.file.read(TRAILER.size))
+        if magic != MAGIC:
+            raise ValueError(f"{path} has no index, it was not closed properly")
+
+        self.file.seek(offset)
+        self.index: List[BlockIndex] = [BlockIndex(*row) for row in orjson.loads(self.file.read(length))]
+
+    def close(self) -> None:
+        """"""
+        self.file.close()
+
+    def __enter__(self) -> "TickReader":
+        """"""
+        return self
+
+    def __exit__(self, *args) -> None:
+        """"""
+        self.close()
+
+    def get_symbols(self) -> List[str]:
+        """"""
+        return list(dict.fromkeys(i.vt_symbol for i in self.index))
+
+    def find_blocks(self, vt_symbol: str, start: datetime = None, end: datetime = None) -> List[BlockIndex]:
+        """
+        Blocks of a symbol overlapping [start, end].
+        """
+        start_us: int = _to_us(start) if start else -2 ** 63
+        end_us: int = _to_us(end) if end else 2 ** 63 - 1
+        return [
+            i for i in self.index
+            if i.vt_symbol == vt_symbol and i.end_us >= start_us and i.start_us <= end_us
+        ]
+
+    def read_block(self, block: BlockIndex) -> TickBatch:
+        """"""
+        self.file.seek(block.offset)
+        return decode_block(self.file.read(block.size), self.gateway_name)
+
+    def iter_batches(self, vt_symbol: str, start: datetime = None, end: datetime = None) -> Iterator[TickBatch]:
+        """
+        Yield the ticks of a symbol within [start, end] block by block.
+        """
+        start_us: int = _to_us(start) if start else -2 ** 63
+        end_us: int = _to_us(end) if end else 2 ** 63 - 1
+
+        for block in self.find_blocks(vt_symbol, start, end):
+            batch: TickBatch = self.read_block(block)
+            if block.start_us < start_us or block.end_us > end_us:
+                times: np.ndarray = batch.columns[DATETIME_FIELD]
+                batch = batch.slice(
+                    int(np.searchsorted(times, start_us, "left")), int(np.searchsorted(times, end_us, "right"))
+                )
+            if len(batch):
+                yield batch
+
+    def read(self, vt_symbol: str, start: datetime = None, end: datetime = None) -> Optional[TickBatch]:
+        """"""
+        batches: List[TickBatch] = list(self.iter_batches(vt_symbol, start, end))
+        if not batches:
+            return None
+        return TickBatch.concat(batches)
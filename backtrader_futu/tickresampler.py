@@ -1,7 +1,204 @@
+"""
+Tick to minute bar resampling.
+
+Bars are stamped with their end time, like futu K-lines and the bars of
+bar_series, e.g. the 10:00 to 10:05 bar carries 10:05.
+"""
+
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from .object import BarData, Interval, TickData
+from .pricetick import PriceScale
+from .utility import CHINA_TZ
+
+
+DAY_MINUTES: int = 1440
+
+WINDOW_INTERVALS: Dict[int, Interval] = {1: Interval.MINUTE, 60: Interval.HOUR, DAY_MINUTES: Interval.DAILY}
+
+
 class TickResampler:
-    def __init__(self):
-        pass
-        # d = cerebro.resampledata(data, **kwargs)
+    """
+    Builds bars of window minutes from the ticks of one symbol.
+
+    window must divide a day, bars are aligned to local midnight of the tick
+    times. interval is set for windows of a minute, an hour or a day and
+    left None otherwise.
+
+    A tick arriving after its bar was flushed, e.g. by on_bar_close, never
+    starts a second bar for the same window: its volume and turnover go to
+    the running or next bar, its price is dropped.
+
+    With int_prices the open, high, low and close of the running bar are
+    kept as int tick counts of scale and compared as integers, they are
+    converted to float only when the finished bar is emitted.
+    """
+
+    def __init__(
+        self,
+        on_bar: Callable[[BarData], None] = None,
+        window: int = 1,
+        int_prices: bool = False,
+        scale: PriceScale = None,
+    ) -> None:
+        """
+        :param scale: required with int_prices, see pricetick.get_price_scale
+        """
+        if int_prices and scale is None:
+            raise ValueError("int_prices requires a price scale")
+        if window <= 0 or DAY_MINUTES % window:
+            raise ValueError(f"window of {window} minutes does not divide a day")
+
+        self.on_bar: Optional[Callable[[BarData], None]] = on_bar
+        self.window: int = window
+        self.seconds: int = window * 60
+        self.interval: Optional[Interval] = WINDOW_INTERVALS.get(window, None)
+        self.int_prices: bool = int_prices
+        self.scale: Optional[PriceScale] = scale
+
+        self.bar: Optional[BarData] = None
+        self.bar_start: Optional[datetime] = None
+        self.last_tick: Optional[TickData] = None
+
+        # start of the last flushed bar, and late volume waiting for the next bar
+        self.flushed_start: Optional[datetime] = None
+        self.carry_volume: float = 0
+        self.carry_turnover: float = 0
+
+        # running prices, tick counts with int_prices
+        self.open = None
+        self.high = None
+        self.low = None
+        self.close = None
+
+    def get_bar_start(self, dt: datetime) -> datetime:
+        """
+        Start of the bar containing dt, in the timezone of dt.
+        """
+        # windows divide a day, so the offset into the bar follows from the wall clock
+        second: int = dt.hour * 3600 + dt.minute * 60 + dt.second
+        return dt.replace(microsecond=0) - timedelta(seconds=second % self.seconds)
+
+    def add_tick(self, tick: TickData) -> Optional[BarData]:
+        """
+        Update the running bar, return the previous bar if the tick started a new one.
+        """
+        if not tick.last_price:
+            return None
+
+        finished: Optional[BarData] = None
+        bar_start: datetime = self.get_bar_start(tick.datetime)
+        price = self.scale.to_ticks(tick.last_price) if self.int_prices else tick.last_price
+
+        volume: float = 0
+        turnover: float = 0
+        if self.last_tick and tick.volume >= self.last_tick.volume:
+            volume = tick.volume - self.last_tick.volume
+            turnover = tick.turnover - self.last_tick.turnover
+        self.last_tick = tick
+
+        if (
+            (self.flushed_start is not None and bar_start <= self.flushed_start)
+            or (self.bar is not None and bar_start < self.bar_start)
+        ):
+            self.carry_volume += volume
+            self.carry_turnover += turnover
+            if self.bar is not None:
+                self._take_carry()
+            return None
+
+        if self.bar is not None and bar_start != self.bar_start:
+            finished = self.flush()
+
+        if self.bar is None:
+            self.bar_start = bar_start
+            self.bar = BarData(
+                symbol=tick.symbol,
+                exchange=tick.exchange,
+                interval=self.interval,
+                datetime=bar_start + timedelta(seconds=self.seconds),
+                gateway_name=tick.gateway_name,
+            )
+            self.open = self.high = self.low = price
+            self._take_carry()
+        else:
+            if price > self.high:
+                self.high = price
+            if price < self.low:
+                self.low = price
+        self.close = price
+
+        self.bar.open_interest = tick.open_interest
+        self.bar.volume += volume
+        self.bar.turnover += turnover
+        return finished
+
+    def _take_carry(self) -> None:
+        """"""
+        self.bar.volume += self.carry_volume
+        self.bar.turnover += self.carry_turnover
+        self.carry_volume = 0
+        self.carry_turnover = 0
+
+    def get_state(self) -> dict:
+        """
+        Partial bar and the last tick, for FeedCheckpoint.
+        """
+        return {
+            "bar": self.bar,
+            "bar_start": self.bar_start,
+            "last_tick": self.last_tick,
+            "prices": [self.open, self.high, self.low, self.close],
+            "flushed_start": self.flushed_start,
+            "carry": [self.carry_volume, self.carry_turnover],
+        }
+
+    def set_state(self, state: dict) -> None:
+        """"""
+        self.bar = state["bar"]
+        self.bar_start = state["bar_start"]
+        self.last_tick = state["last_tick"]
+        self.open, self.high, self.low, self.close = state["prices"]
+        self.flushed_start = state.get("flushed_start", None)
+        self.carry_volume, self.carry_turnover = state.get("carry", (0, 0))
+
+    def on_bar_close(self, boundary: float) -> Optional[BarData]:
+        """
+        Flush the running bar if it ends by the boundary, for BarCloseScheduler.
+        """
+        if self.bar is None:
+            return None
+
+        # naive tick times are China time, as everywhere in the package
+        bar_start: datetime = self.bar_start
+        if bar_start.tzinfo is None:
+            bar_start = bar_start.replace(tzinfo=CHINA_TZ)
+        if bar_start.timestamp() + self.seconds > boundary:
+            return None
+        return self.flush()
+
+    def flush(self) -> Optional[BarData]:
+        """
+        Finish the running bar and pass it to on_bar.
+        """
+        bar: Optional[BarData] = self.bar
+        if bar is None:
+            return None
+
+        if self.int_prices:
+            bar.open_price = self.scale.to_price(self.open)
+            bar.high_price = self.scale.to_price(self.high)
+            bar.low_price = self.scale.to_price(self.low)
+            bar.close_price = self.scale.to_price(self.close)
+        else:
+            bar.open_price = self.open
+            bar.high_price = self.high
+            bar.low_price = self.low
+            bar.close_price = self.close
 
-    def add_tick(self, tick_data, kwargs):
-        pass
+        self.bar = None
+        self.flushed_start = self.bar_start
+        if self.on_bar:
+            self.on_bar(bar)
+        return bar
@@ -0,0 +1,204 @@
+"""
+Hierarchical timer wheel driven by a monotonic clock.
+
+Time is counted in ticks of resolution seconds. Level 0 has one slot per
+tick, every higher level has slots spanning a whole turn of the level
+below. A timer is appended to the slot of its expiry on the lowest level
+that reaches it, and timers of a higher level slot are moved down a level
+when the wheel below completes a turn. Scheduling and cancelling are O(1),
+advancing steps tick by tick only while the lowest level holds timers and
+otherwise jumps straight to the next turn of the lowest non-empty level.
+"""
+
+import logging
+import time
+from threading import Event, Lock, Thread
+from typing import Callable, List, Optional, Tuple
+
+
+# slot bits of each level, from fine to coarse
+LEVEL_BITS: Tuple[int, ...] = (8, 6, 6, 6)
+
+
+class Timer:
+    """
+    Handle of a scheduled callback.
+    """
+
+    __slots__ = ("expires", "callback", "args", "cancelled")
+
+    def __init__(self, expires: int, callback: Callable, args: tuple) -> None:
+        """"""
+        self.expires: int = expires
+        self.callback: Callable = callback
+        self.args: tuple = args
+        self.cancelled: bool = False
+
+    def cancel(self) -> None:
+        """"""
+        self.cancelled = True
+
+
+class TimerWheel:
+    """
+    Fires callbacks at monotonic deadlines with resolution second granularity.
+    """
+
+    def __init__(
+        self,
+        resolution: float = 0.05,
+        clock: Callable[[], float] = time.monotonic,
+        output: Callable = None,
+    ) -> None:
+        """"""
+        self.resolution: float = resolution
+        self.clock: Callable[[], float] = clock
+        self.output: Callable = output or print
+
+        self.origin: float = clock()
+        self.current: int = 0
+        self.pending: int = 0
+
+        self.shifts: List[int] = []
+        self.masks: List[int] = []
+        shift: int = 0
+        for bits in LEVEL_BITS:
+            self.shifts.append(shift)
+            self.masks.append((1 << bits) - 1)
+            shift += bits
+
+        self.levels: List[List[List[Timer]]] = [[[] for _ in range(1 << bits)] for bits in LEVEL_BITS]
+        self.counts: List[int] = [0] * len(LEVEL_BITS)
+        self.lock: Lock = Lock()
+
+        self.stop_event: Event = Event()
+        self.thread: Optional[Thread] = None
+
+    def to_tick(self, deadline: float) -> int:
+        """
+        First tick at or after deadline.
+        """
+        return int((deadline - self.origin) / self.resolution + 0.999999)
+
+    def schedule_at(self, deadline: float, callback: Callable, *args) -> Timer:
+        """
+        Run callback(*args) once the clock reaches deadline.
+        """
+        with self.lock:
+            timer: Timer = Timer(max(self.to_tick(deadline), self.current + 1), callback, args)
+            self._insert(timer)
+            self.pending += 1
+            return timer
+
+    def schedule(self, delay: float, callback: Callable, *args) -> Timer:
+        """"""
+        return self.schedule_at(self.clock() + delay, callback, *args)
+
+    def _insert(self, timer: Timer) -> None:
+        """"""
+        delta: int = timer.expires - self.current
+
+        for level, shift in enumerate(self.shifts):
+            if delta < (self.masks[level] + 1) << shift:
+                slot: int = (timer.expires >> shift) & self.masks[level]
+                self.levels[level][slot].append(timer)
+                self.counts[level] += 1
+                return
+
+        # beyond the top level: park in the last slot of the top level, it is re-inserted on cascade
+        level = len(self.shifts) - 1
+        slot = ((self.current >> self.shifts[level]) - 1) & self.masks[level]
+        self.levels[level][slot].append(timer)
+        self.counts[level] += 1
+
+    def _cascade(self) -> None:
+        """
+        Move timers of higher levels down once the levels below complete a turn.
+        """
+        for level in range(1, len(self.shifts)):
+            if self.current & ((1 << self.shifts[level]) - 1):
+                return
+
+            slot: int = (self.current >> self.shifts[level]) & self.masks[level]
+            timers: List[Timer] = self.levels[level][slot]
+            self.levels[level][slot] = []
+            self.counts[level] -= len(timers)
+            for timer in timers:
+                self._insert(timer)
+
+    def _skip_empty(self, target: int) -> None:
+        """
+        Jump to the tick before the next cascade of the lowest non-empty level.
+        """
+        for level, count in enumerate(self.counts):
+            if count:
+                break
+        else:
+            self.current = target - 1
+            return
+
+        if level:
+            turn: int = (1 << self.shifts[level]) - 1
+            self.current = min(target - 1, self.current | turn)
+
+    def advance(self, now: float = None) -> int:
+        """
+        Fire every timer due by now and return how many fired.
+        """
+        # whole ticks elapsed, a timer never fires before its deadline
+        target: int = int(((self.clock() if now is None else now) - self.origin) / self.resolution)
+        fired: List[Timer] = []
+
+        with self.lock:
+            if not self.pending:
+                self.current = max(self.current, target)
+                return 0
+
+            while self.current < target:
+                self._skip_empty(target)
+                self.current += 1
+                self._cascade()
+
+                slot: int = self.current & self.masks[0]
+                timers: List[Timer] = self.levels[0][slot]
+                if timers:
+                    self.levels[0][slot] = []
+                    self.counts[0] -= len(timers)
+                    self.pending -= len(timers)
+                    fired.extend(timers)
+
+        count: int = 0
+        for timer in fired:
+            if timer.cancelled:
+                continue
+
+            count += 1
+            try:
+                timer.callback(*timer.args)
+            except Exception as e:
+                self.output(f"timer callback {timer.callback} failed: {e}", logging.WARNING)
+
+        return count
+
+    def start(self) -> None:
+        """
+        Advance the wheel every resolution seconds on a background thread.
+        """
+        if self.thread:
+            return
+
+        self.stop_event.clear()
+        self.thread = Thread(target=self.run, name="TimerWheel", daemon=True)
+        self.thread.start()
+
+    def run(self) -> None:
+        """"""
+        while not self.stop_event.wait(self.resolution):
+            self.advance()
+
+    def stop(self) -> None:
+        """"""
+        if self.thread:
+            self.stop_event.set()
+            self.thread.join()
+            self.thread = None
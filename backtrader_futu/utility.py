@@ -1,15 +1,18 @@
+from __future__ import annotations
+
 from functools import lru_cache
+import os
 import pickle
 import sys
-import commentjson
-import orjson
-import pandas as pd
 from pathlib import Path
 import datetime as dt
-from typing import Callable, List, Dict, Optional, Type, Tuple
+from typing import TYPE_CHECKING, Callable, List, Dict, Optional, Type, Tuple
 from datetime import datetime
 from .object import ContractData
 
+if TYPE_CHECKING:
+    import pandas as pd
+
 if sys.version_info >= (3, 9):
     from zoneinfo import ZoneInfo, available_timezones  # noqa
 else:
@@ -41,22 +44,75 @@ def _get_trader_dir(temp_name: str) -> Tuple[Path, Path]:
     return home_path, temp_path
 
 
-TRADER_DIR, TEMP_DIR = _get_trader_dir(".trader")
-sys.path.append(str(TRADER_DIR))
+# environment variable pointing at the temp folder, e.g. a shared tmpfs cache
+TEMP_DIR_ENV: str = "BACKTRADER_FUTU_TEMP_DIR"
+
+_trader_dirs: Optional[Tuple[Path, Path]] = None
+
+
+def _make_trader_dir(temp_path: str) -> Tuple[Path, Path]:
+    """"""
+    path: Path = Path(temp_path).expanduser().resolve()
+    # another process may create it between the check and mkdir
+    path.mkdir(parents=True, exist_ok=True)
+
+    return path.parent, path
+
+
+def set_trader_dir(temp_path: str) -> None:
+    """
+    Use temp_path as temp folder instead of looking up the .trader folder.
+    """
+    global _trader_dirs
+
+    _trader_dirs = _make_trader_dir(temp_path)
+
+
+def get_trader_dir() -> Tuple[Path, Path]:
+    """
+    Get (trader path, temp path), resolved on first use and cached.
+    """
+    global _trader_dirs
+
+    if _trader_dirs is None:
+        env_path: str = os.environ.get(TEMP_DIR_ENV, "")
+        if env_path:
+            _trader_dirs = _make_trader_dir(env_path)
+        else:
+            _trader_dirs = _get_trader_dir(".trader")
+
+    return _trader_dirs
+
+
+def get_temp_dir() -> Path:
+    """
+    Get temp path where json and cache files are stored.
+    """
+    return get_trader_dir()[1]
+
+
+def __getattr__(name: str):
+    # TRADER_DIR and TEMP_DIR used to be resolved on import
+    if name == "TRADER_DIR":
+        return get_trader_dir()[0]
+    elif name == "TEMP_DIR":
+        return get_trader_dir()[1]
+
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
 
 def get_file_path(filename: str) -> Path:
     """
     Get path for temp file with filename.
     """
-    return TEMP_DIR.joinpath(filename)
+    return get_temp_dir().joinpath(filename)
 
 
 def get_folder_path(folder_name: str) -> Path:
     """
     Get path for temp folder with folder name.
     """
-    folder_path: Path = TEMP_DIR.joinpath(folder_name)
+    folder_path: Path = get_temp_dir().joinpath(folder_name)
     if not folder_path.exists():
         folder_path.mkdir()
     return folder_path
@@ -80,8 +136,12 @@ def load_json(filename: str, use_comments=False) -> dict:
     if filepath.exists():
         with open(filepath, mode="r", encoding="UTF-8") as f:
             if use_comments:
+                import commentjson
+
                 data: dict = commentjson.load(f)
             else:
+                import orjson
+
                 c = f.read()
                 if len(c) > 0:
                     data: dict = orjson.loads(c)
@@ -97,6 +157,8 @@ def save_json(filename: str, data: dict) -> None:
     """
     Save data into json file in temp path.
     """
+    import orjson
+
     filepath: Path = get_file_path(filename)
     with open(filepath, mode="wb") as f:
         s = orjson.dumps(
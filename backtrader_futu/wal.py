@@ -0,0 +1,558 @@
+"""
+Write-ahead log of order requests, acks, order updates and fills.
+
+Every record is framed as
+
+    <payload length: uint32> <crc32: uint32> <kind: uint8> <payload>
+
+where the payload is the orjson encoded list of dataclass field values.
+Appends are buffered and a writer thread commits them in groups with a
+single fsync, so append() costs microseconds and callers that need
+durability wait on the returned sequence number.
+
+Sequence numbers count the records of the file from 1 and continue across
+reopens, so the number returned for an OrderRequest identifies it for good
+and its WalAck refers to it by that number.
+
+Once every request in the log is acknowledged, the log can be compacted:
+it is replaced by a WalCheckpoint followed by a snapshot of the state it
+describes, i.e. the active orders, the positions, the net cash of the
+fills replaced and the cancels and modifies still in flight. Snapshot records are not numbered, the
+checkpoint carries the sequence number of the last record it replaces so
+numbering continues after it.
+"""
+
+import logging
+import os
+import struct
+import zlib
+from dataclasses import dataclass, fields
+from datetime import datetime
+from enum import Enum
+from pathlib import Path
+from threading import Condition, Thread
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple, Type
+
+from .object import (
+    CancelRequest,
+    ModifyRequest,
+    OrderData,
+    OrderRequest,
+    PositionData,
+    TradeData,
+)
+from .order_store import OrderStore
+from .pnl_engine import PnlEngine
+from .utility import get_folder_path
+
+
+HEADER: struct.Struct = struct.Struct("<IIB")
+
+KIND_REQUEST: int = 1
+KIND_ACK: int = 2
+KIND_ORDER: int = 3
+KIND_TRADE: int = 4
+KIND_CANCEL: int = 5
+KIND_MODIFY: int = 6
+KIND_CHECKPOINT: int = 7
+KIND_POSITION: int = 8
+
+KIND_CLASSES: Dict[int, Type] = {
+    KIND_REQUEST: OrderRequest,
+    KIND_ORDER: OrderData,
+    KIND_TRADE: TradeData,
+    KIND_CANCEL: CancelRequest,
+    KIND_MODIFY: ModifyRequest,
+    KIND_POSITION: PositionData,
+}
+CLASS_KINDS: Dict[Type, int] = {v: k for k, v in KIND_CLASSES.items()}
+
+
+@dataclass
+class WalAck:
+    """
+    Links the sequence number of a sent OrderRequest to the vt_orderid returned by the gateway.
+    """
+
+    request_seq: int
+    vt_orderid: str
+
+
+@dataclass
+class WalCheckpoint:
+    """
+    First record of a compacted log: seq is the sequence number of the last
+    record replaced, count the number of snapshot records following and
+    cash the cash paid and received by the fills replaced.
+    """
+
+    seq: int
+    count: int
+    cash: float = 0
+
+
+class WalError(Exception):
+    """
+    Raised to waiters when their records could not be committed, and on appends to a closed log.
+    """
+
+
+def _encode_value(value: Any) -> Any:
+    """"""
+    if isinstance(value, Enum):
+        return value.name
+    elif isinstance(value, datetime):
+        return value.isoformat()
+    return value
+
+
+def _decode_value(tp: Any, value: Any) -> Any:
+    """"""
+    if value is None:
+        return None
+    elif isinstance(tp, type) and issubclass(tp, Enum):
+        return tp[value]
+    elif tp is datetime:
+        return datetime.fromisoformat(value)
+    return value
+
+
+def encode_record(obj: Any) -> Tuple[int, bytes]:
+    """
+    Encode a request/data object into (kind, payload).
+    """
+    import orjson
+
+    if isinstance(obj, WalAck):
+        return KIND_ACK, orjson.dumps([obj.request_seq, obj.vt_orderid])
+    if isinstance(obj, WalCheckpoint):
+        return KIND_CHECKPOINT, orjson.dumps([obj.seq, obj.count, obj.cash])
+
+    kind: int = CLASS_KINDS[type(obj)]
+    values: list = [_encode_value(getattr(obj, f.name)) for f in fields(obj) if f.init]
+    return kind, orjson.dumps(values)
+
+
+def decode_record(kind: int, payload: bytes) -> Any:
+    """"""
+    import orjson
+
+    values: list = orjson.loads(payload)
+    if kind == KIND_ACK:
+        return WalAck(*values)
+    if kind == KIND_CHECKPOINT:
+        return WalCheckpoint(*values)
+
+    cls: Type = KIND_CLASSES[kind]
+    kwargs: Dict[str, Any] = {}
+    for f, v in zip([f for f in fields(cls) if f.init], values):
+        # "datetime: datetime = None" shadows the class before the annotation is evaluated
+        tp: Any = datetime if f.name == "datetime" else f.type
+        kwargs[f.name] = _decode_value(tp, v)
+    return cls(**kwargs)
+
+
+def encode_frame(obj: Any) -> bytes:
+    """"""
+    kind, payload = encode_record(obj)
+    return HEADER.pack(len(payload), zlib.crc32(payload, kind), kind) + payload
+
+
+def number_records(frames: List[Tuple[int, bytes]]) -> Iterator[Tuple[Optional[int], Any]]:
+    """
+    Decode frames into (sequence number, record), None for a checkpoint and its snapshot records.
+    """
+    seq: int = 0
+    unnumbered: int = 0
+
+    for kind, payload in frames:
+        record: Any = decode_record(kind, payload)
+        if isinstance(record, WalCheckpoint):
+            seq = record.seq
+            unnumbered = record.count
+            yield None, record
+        elif unnumbered:
+            unnumbered -= 1
+            yield None, record
+        else:
+            seq += 1
+            yield seq, record
+
+
+def get_last_seq(frames: List[Tuple[int, bytes]]) -> int:
+    """"""
+    if frames and frames[0][0] == KIND_CHECKPOINT:
+        checkpoint: WalCheckpoint = decode_record(*frames[0])
+        return checkpoint.seq + len(frames) - 1 - checkpoint.count
+    return len(frames)
+
+
+def read_frames(path: Path) -> Tuple[List[Tuple[int, bytes]], int]:
+    """
+    Read all intact frames of a log file.
+
+    Returns the frames and the offset of the end of the last intact frame,
+    a torn or corrupt tail left by a crash is ignored.
+    """
+    frames: List[Tuple[int, bytes]] = []
+    if not path.exists():
+        return frames, 0
+
+    data: bytes = path.read_bytes()
+    offset: int = 0
+    size: int = len(data)
+
+    while offset + HEADER.size <= size:
+        length, crc, kind = HEADER.unpack_from(data, offset)
+        start: int = offset + HEADER.size
+        end: int = start + length
+        if end > size:
+            break
+
+        payload: bytes = data[start:end]
+        if zlib.crc32(payload, kind) != crc:
+            break
+
+        frames.append((kind, payload))
+        offset = end
+
+    return frames, offset
+
+
+class OrderWal:
+    """
+    Group-commit write-ahead log for order state.
+    """
+
+    def __init__(
+        self,
+        path: str = None,
+        commit_delay: float = 0,
+        retry_interval: float = 1.0,
+        compact_bytes: int = 0,
+        output: Callable = None,
+    ) -> None:
+        """
+        :param path: log file, defaults to wal/orders.wal in the temp folder
+        :param commit_delay: seconds to wait for more records before each fsync
+        :param retry_interval: seconds between attempts after a failed commit
+        :param compact_bytes: compact after a commit once the log grew by this size, 0 to compact only on request
+        """
+        self.path: Path = Path(path) if path else get_folder_path("wal").joinpath("orders.wal")
+        self.commit_delay: float = commit_delay
+        self.retry_interval: float = retry_interval
+        self.compact_bytes: int = compact_bytes
+        self.output: Callable = output or print
+
+        self.pending: List[bytes] = []
+        self.appended_seq: int = 0
+        self.synced_seq: int = 0
+        self.offset: int = 0
+        # failure of the last commit, cleared by the next successful one
+        self.error: Optional[OSError] = None
+        self.condition: Condition = Condition()
+
+        # compactions run on the writer thread, which alone touches the file
+        self.compact_offset: int = 0
+        self.compact_requested: bool = False
+        self.compact_count: int = 0
+        self.compact_result: bool = False
+
+        self.file = None
+        self.active: bool = False
+        self.thread: Optional[Thread] = None
+
+    def open(self) -> None:
+        """
+        Open the log for appending, cutting off any torn tail, and start the writer.
+        """
+        if self.active:
+            return
+
+        frames, offset = read_frames(self.path)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+
+        self.file = open(self.path, "ab")
+        self.file.truncate(offset)
+
+        self.offset = offset
+        self.compact_offset = offset
+        self.appended_seq = self.synced_seq = get_last_seq(frames)
+        self.error = None
+
+        self.active = True
+        self.thread = Thread(target=self.run, name="OrderWal", daemon=True)
+        self.thread.start()
+
+    def close(self) -> None:
+        """
+        Commit everything appended so far and close the log.
+        """
+        if not self.active:
+            return
+
+        with self.condition:
+            self.active = False
+            self.condition.notify_all()
+        self.thread.join()
+        self.thread = None
+
+        self.file.close()
+        self.file = None
+
+    def append(self, obj: Any) -> int:
+        """
+        Queue a record and return its sequence number.
+        """
+        frame: bytes = encode_frame(obj)
+
+        with self.condition:
+            if not self.active:
+                raise WalError(f"order wal {self.path} is not open")
+
+            self.pending.append(frame)
+            self.appended_seq += 1
+            seq: int = self.appended_seq
+            self.condition.notify_all()
+        return seq
+
+    def append_ack(self, request_seq: int, vt_orderid: str) -> int:
+        """
+        Record the vt_orderid of the OrderRequest appended as request_seq.
+        """
+        return self.append(WalAck(request_seq, vt_orderid))
+
+    def wait(self, seq: int, timeout: float = None) -> bool:
+        """
+        Block until the record with sequence number seq is on disk.
+
+        Raises WalError while the last commit attempt has failed, the writer
+        keeps retrying every retry_interval seconds.
+        """
+        with self.condition:
+            self.condition.wait_for(
+                lambda: self.synced_seq >= seq or self.error is not None or not self.active, timeout
+            )
+            if self.synced_seq >= seq:
+                return True
+            if self.error is not None:
+                raise WalError(f"order wal {self.path} commit failed: {self.error}")
+            return False
+
+    def compact(self, timeout: float = None) -> bool:
+        """
+        Replace the committed records by a checkpoint and a snapshot of their state.
+
+        Returns False if a committed request is not acknowledged yet, the
+        compaction failed or did not finish within timeout.
+        """
+        with self.condition:
+            if not self.active:
+                raise WalError(f"order wal {self.path} is not open")
+
+            count: int = self.compact_count
+            self.compact_requested = True
+            self.condition.notify_all()
+
+            self.condition.wait_for(lambda: self.compact_count > count or not self.active, timeout)
+            return self.compact_count > count and self.compact_result
+
+    def run(self) -> None:
+        """"""
+        while True:
+            with self.condition:
+                self.condition.wait_for(lambda: self.pending or self.compact_requested or not self.active)
+                compact: bool = self.compact_requested
+                self.compact_requested = False
+
+                if not self.pending and not compact:
+                    return
+
+                if self.commit_delay and self.active and not compact:
+                    # appends notify too, only close ends the delay early
+                    self.condition.wait_for(lambda: not self.active, self.commit_delay)
+
+                frames: List[bytes] = self.pending
+                self.pending = []
+                seq: int = self.appended_seq
+
+            error: Optional[OSError] = self._commit(frames, seq) if frames else None
+            if error is not None:
+                if compact:
+                    # compact after the group is committed
+                    with self.condition:
+                        self.compact_requested = True
+                if not self._rollback(frames, error):
+                    return
+                continue
+
+            if compact:
+                result: bool = self._compact()
+                with self.condition:
+                    self.compact_result = result
+                    self.compact_count += 1
+                    self.condition.notify_all()
+            elif self.compact_bytes and self.offset - self.compact_offset >= self.compact_bytes:
+                self._compact()
+
+    def _commit(self, frames: List[bytes], seq: int) -> Optional[OSError]:
+        """
+        Write and fsync a group, returning the error of a failed commit.
+        """
+        data: bytes = b"".join(frames)
+        try:
+            self.file.write(data)
+            self.file.flush()
+            os.fsync(self.file.fileno())
+        except OSError as e:
+            self.output(f"failed to commit order wal {self.path}: {e}", logging.ERROR)
+            return e
+
+        with self.condition:
+            self.offset += len(data)
+            self.synced_seq = seq
+            self.error = None
+            self.condition.notify_all()
+        return None
+
+    def _rollback(self, frames: List[bytes], error: OSError) -> bool:
+        """
+        Cut off a partly written group and queue it again, False once closed.
+        """
+        try:
+            self.file.truncate(self.offset)
+        except OSError:
+            pass
+
+        with self.condition:
+            self.pending = frames + self.pending
+            self.error = error
+            self.condition.notify_all()
+
+            if not self.active:
+                return False
+            self.condition.wait_for(lambda: not self.active, self.retry_interval)
+
+        return True
+
+    def _compact(self) -> bool:
+        """
+        Rewrite the committed log as a checkpoint and snapshot, on the writer thread.
+
+        Records appended meanwhile are still pending and go to the new file.
+        """
+        # the next automatic attempt waits for another compact_bytes, also after a failed one
+        self.compact_offset = self.offset
+
+        tmp_path: Path = self.path.with_suffix(".tmp")
+        try:
+            frames, _ = read_frames(self.path)
+            state: WalRecovery = replay(number_records(frames))
+            if state.unacked_requests:
+                return False
+
+            records: list = state.orders.get_active_orders()
+            records.extend(position for position in state.pnl.get_all_positions() if position.volume)
+            records.extend(state.pending_cancels)
+            records.extend(state.pending_modifies)
+
+            data: bytes = encode_frame(WalCheckpoint(self.synced_seq, len(records), float(state.pnl.cash)))
+            data += b"".join(encode_frame(record) for record in records)
+
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+            file = open(self.path, "ab")
+        except Exception as e:
+            # a failed compaction never stops the writer, appends go on to the current file
+            self.output(f"failed to compact order wal {self.path}: {e}", logging.WARNING)
+            return False
+
+        self.file.close()
+        self.file = file
+        self.offset = self.compact_offset = len(data)
+
+        self.output(f"compacted order wal {self.path} to {len(records)} records")
+        return True
+
+    def __iter__(self) -> Iterator[Any]:
+        """
+        Iterate the committed records.
+        """
+        for _, record in self.records():
+            yield record
+
+    def records(self) -> Iterator[Tuple[Optional[int], Any]]:
+        """
+        Iterate the committed records with their sequence numbers, see number_records.
+        """
+        frames, _ = read_frames(self.path)
+        return number_records(frames)
+
+
+@dataclass
+class WalRecovery:
+    """
+    In-memory state rebuilt from the order WAL.
+    """
+
+    orders: OrderStore
+    pnl: PnlEngine
+    # by the sequence number of the request record
+    unacked_requests: Dict[int, OrderRequest]
+    pending_cancels: List[CancelRequest]
+    # the last modify of every active order not showing its price and volume yet
+    pending_modifies: List[ModifyRequest]
+
+
+def replay(records: Iterator[Tuple[Optional[int], Any]], cash: float = 0, gateway_name: str = "FUTU") -> WalRecovery:
+    """
+    Apply numbered records in order, see OrderWal.records.
+    """
+    orders: OrderStore = OrderStore()
+    pnl: PnlEngine = PnlEngine(gateway_name=gateway_name, cash=cash)
+    unacked_requests: Dict[int, OrderRequest] = {}
+    cancels: List[CancelRequest] = []
+    modifies: Dict[str, ModifyRequest] = {}
+
+    for seq, record in records:
+        if isinstance(record, OrderRequest):
+            unacked_requests[seq] = record
+        elif isinstance(record, WalAck):
+            unacked_requests.pop(record.request_seq, None)
+        elif isinstance(record, OrderData):
+            orders.update_order(record)
+        elif isinstance(record, TradeData):
+            pnl.update_trade(record)
+        elif isinstance(record, CancelRequest):
+            cancels.append(record)
+        elif isinstance(record, ModifyRequest):
+            modifies[record.orderid] = record
+        elif isinstance(record, PositionData):
+            pnl.update_position(record)
+        elif isinstance(record, WalCheckpoint):
+            pnl.cash += record.cash
+
+    # cancels and modifies still in flight for orders that are not finished yet
+    active_orders: Dict[str, OrderData] = {order.orderid: order for order in orders.get_active_orders()}
+    cancels = [req for req in cancels if req.orderid in active_orders]
+    pending_modifies: List[ModifyRequest] = [
+        req
+        for orderid, req in modifies.items()
+        if orderid in active_orders
+        and (active_orders[orderid].price, active_orders[orderid].volume) != (req.price, req.volume)
+    ]
+
+    return WalRecovery(orders, pnl, unacked_requests, cancels, pending_modifies)
+
+
+def recover(path: str = None, cash: float = 0, gateway_name: str = "FUTU") -> WalRecovery:
+    """
+    Rebuild order and position state from the log.
+
+    Requests without an ack were possibly sent but never confirmed and need
+    to be reconciled against the broker.
+    """
+    return replay(OrderWal(path).records(), cash, gateway_name)
@@ -0,0 +1,36 @@
+import pytest
+
+from backtrader_futu.object import OrderRequest
+
+
+class RecordingEndpoint:
+    """
+    Order endpoint keeping every request sent to it.
+    """
+
+    def __init__(self) -> None:
+        """"""
+        self.orders = []
+
+    def send_order(self, req: OrderRequest) -> str:
+        """"""
+        self.orders.append(req)
+        return str(len(self.orders))
+
+
+@pytest.fixture
+def endpoint() -> RecordingEndpoint:
+    return RecordingEndpoint()
+
+
+@pytest.fixture
+def opend():
+    """
+    OpenD simulator on a free local port.
+    """
+    from backtrader_futu.opend_simulator import OpenDSimulator, SimulatorSetting
+
+    simulator = OpenDSimulator(SimulatorSetting(port=0, tick_rate=1, seed=1), output=lambda *args: None)
+    simulator.start()
+    yield simulator
+    simulator.stop()
@@ -0,0 +1,54 @@
+from backtrader_futu.bar_scheduler import BarCloseScheduler
+from backtrader_futu.timer_wheel import TimerWheel
+
+
+class Clock:
+    """"""
+
+    def __init__(self, now: float) -> None:
+        """"""
+        self.now = now
+
+    def __call__(self) -> float:
+        """"""
+        return self.now
+
+
+def test_subscribers_of_a_bar_length_share_one_timer():
+    start = 1_700_000_010.0
+    clock = Clock(start)
+    wheel = TimerWheel(resolution=0.05, clock=lambda: clock.now - start)
+    scheduler = BarCloseScheduler(wheel, grace=0.2, wall_clock=clock, output=lambda *args: None)
+
+    closes = []
+    scheduler.subscribe(lambda boundary: closes.append(("a", boundary)), 60)
+    scheduler.subscribe(lambda boundary: closes.append(("b", boundary)), 60)
+    assert wheel.pending == 1
+
+    boundary = (start // 60 + 1) * 60
+    clock.now = boundary + 0.1
+    wheel.advance()
+    assert closes == []
+
+    clock.now = boundary + 0.2
+    wheel.advance()
+    assert sorted(closes) == [("a", boundary), ("b", boundary)]
+
+    clock.now = boundary + 60.2
+    wheel.advance()
+    assert len(closes) == 4 and closes[-1][1] == boundary + 60
+
+
+def test_last_unsubscribe_cancels_the_timer():
+    clock = Clock(1_700_000_010.0)
+    wheel = TimerWheel(resolution=0.05, clock=lambda: clock.now)
+    scheduler = BarCloseScheduler(wheel, wall_clock=clock, output=lambda *args: None)
+    closes = []
+
+    scheduler.subscribe(closes.append, 60)
+    scheduler.unsubscribe(closes.append, 60)
+    clock.now += 120
+    wheel.advance()
+
+    assert closes == []
+    assert scheduler.groups == {}
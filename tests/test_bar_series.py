@@ -0,0 +1,86 @@
+from datetime import date, datetime, time
+
+from backtrader_futu.bar_series import DAY_SECONDS, SharedTickIntake
+from backtrader_futu.futu_utility import EMarket
+from backtrader_futu.object import Exchange, TickData
+from backtrader_futu.session_calendar import SessionCalendar
+from backtrader_futu.utility import ZoneInfo
+
+
+HK_TZ = ZoneInfo("Asia/Hong_Kong")
+DAY = date(2024, 3, 4)
+
+
+def make_tick(hour: int, minute: int, second: int, price: float, volume: float) -> TickData:
+    """"""
+    return TickData(
+        gateway_name="FUTU",
+        symbol="00700",
+        exchange=Exchange.SEHK,
+        datetime=datetime.combine(DAY, time(hour, minute, second), HK_TZ),
+        last_price=price,
+        volume=volume,
+        turnover=volume * price,
+    )
+
+
+def ts(hour: int, minute: int) -> float:
+    """"""
+    return datetime.combine(DAY, time(hour, minute), HK_TZ).timestamp()
+
+
+def test_derived_bars_are_built_from_base_bars():
+    intake = SharedTickIntake(60)
+    frame = intake.add_frame(300)
+
+    volume = 0
+    for minute in range(10):
+        volume += 100
+        intake.on_tick(make_tick(10, minute, 0, 300 + minute, volume))
+    intake.close_bar(ts(10, 10))
+
+    assert len(intake.index) == 10
+    assert len(frame.series) == 2
+    start, end, values = frame.get_bar(0)
+    assert (start, end) == (ts(10, 0), ts(10, 5))
+    assert values[:4] == [300, 304, 300, 304]
+    # the first tick only sets the volume reference
+    assert values[4] == 400
+    assert frame.get_bar(2) is None
+
+
+def test_late_tick_after_timer_close_does_not_reopen_the_bucket():
+    intake = SharedTickIntake(60)
+    intake.on_tick(make_tick(10, 0, 0, 300, 1000))
+    intake.on_tick(make_tick(10, 0, 30, 301, 1100))
+    intake.close_bar(ts(10, 1))
+
+    intake.on_tick(make_tick(10, 0, 59, 299, 1150))
+    intake.on_tick(make_tick(10, 1, 5, 302, 1200))
+    intake.close_bar(ts(10, 2))
+
+    starts = intake.index.get_column("time").tolist()
+    assert starts == [ts(10, 0), ts(10, 1)]
+    _, _, values = intake.base.get_bar(1)
+    # the late price is dropped, its volume lands in the next bar
+    assert values[:4] == [302, 302, 302, 302]
+    assert values[4] == 100
+
+
+def test_day_frame_holds_one_bar_per_trading_day():
+    calendar = SessionCalendar(EMarket.HK, start=date(2024, 1, 1), end=date(2024, 12, 31))
+    intake = SharedTickIntake(60, calendar)
+    day_frame = intake.add_frame(DAY_SECONDS)
+    hour_frame = intake.add_frame(3600)
+
+    volume = 0
+    for hour, minute in [(9, 35), (11, 59), (13, 0), (15, 59), (16, 5)]:
+        volume += 100
+        intake.on_tick(make_tick(hour, minute, 0, 300, volume))
+    intake.close_bar(ts(16, 10))
+
+    assert len(day_frame.series) == 1
+    start, end, _ = day_frame.get_bar(0)
+    assert (start, end) == (ts(9, 0), ts(16, 10))
+    # intraday frames still close at every session close
+    assert hour_frame.series.get_column("end").tolist() == [ts(10, 30), ts(12, 0), ts(14, 0), ts(16, 0), ts(16, 10)]
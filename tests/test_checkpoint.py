@@ -0,0 +1,132 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from backtrader_futu.checkpoint import FeedCheckpoint
+from backtrader_futu.object import BarData, Exchange, Interval, TickData
+from backtrader_futu.tickresampler import TickResampler
+from backtrader_futu.utility import CHINA_TZ
+
+
+class StateFeed:
+    """
+    Stands in for FutuTickData, keeping the state it is given.
+    """
+
+    def __init__(self, state: dict = None) -> None:
+        """"""
+        self.state = state
+        self.last_tick = state["last_tick"] if state else None
+        self.bars = []
+
+    def get_state(self, depth: int) -> dict:
+        """"""
+        return self.state
+
+    def set_state(self, state: dict) -> None:
+        """"""
+        self.state = state
+        self.last_tick = state["last_tick"]
+
+    def add_bars(self, bars) -> None:
+        """"""
+        self.bars.extend(bars)
+
+
+class GapFetcher:
+    """"""
+
+    def __init__(self, bars) -> None:
+        """"""
+        self.bars = bars
+        self.requests = []
+
+    def query_history(self, req):
+        """"""
+        self.requests.append(req)
+        return self.bars
+
+
+def at(hour: int, minute: int, second: int = 0) -> datetime:
+    """"""
+    return datetime(2024, 3, 4, hour, minute, second, tzinfo=CHINA_TZ)
+
+
+def make_tick(dt: datetime, price: float, volume: float) -> TickData:
+    """"""
+    return TickData(
+        gateway_name="FUTU", symbol="00700", exchange=Exchange.SEHK, datetime=dt, last_price=price, volume=volume
+    )
+
+
+def make_bar(dt: datetime) -> BarData:
+    """"""
+    return BarData(
+        gateway_name="FUTU", symbol="00700", exchange=Exchange.SEHK, datetime=dt, interval=Interval.MINUTE, volume=10
+    )
+
+
+def make_state() -> dict:
+    """"""
+    last_tick = make_tick(at(10, 0, 30), 300.2, 1200)
+    return {
+        "rows": {"close": np.array([299.8, 300.0]), "volume": np.array([100.0, 200.0])},
+        "last_volume": 1000,
+        "last_tick": last_tick,
+        "intake": None,
+        # queued but not loaded when the snapshot was taken
+        "pending": [(make_tick(at(10, 0, 20), 300.1, 1100), True), (last_tick, True)],
+    }
+
+
+def test_feed_state_round_trips_with_its_pending_ticks(tmp_path):
+    state = make_state()
+    checkpoint = FeedCheckpoint(str(tmp_path / "checkpoint.npz"), output=lambda *args: None)
+    checkpoint.add_feed("00700.SEHK", StateFeed(state))
+    checkpoint.save()
+
+    feed = StateFeed()
+    restored = FeedCheckpoint(str(tmp_path / "checkpoint.npz"), output=lambda *args: None)
+    restored.add_feed("00700.SEHK", feed)
+    assert restored.restore()
+
+    np.testing.assert_array_equal(feed.state["rows"]["close"], state["rows"]["close"])
+    assert feed.state["last_volume"] == 1000
+    assert feed.last_tick == state["last_tick"]
+    assert [tuple(item) for item in feed.state["pending"]] == state["pending"]
+
+
+def test_restore_queues_only_the_gap_after_the_last_tick(tmp_path):
+    checkpoint = FeedCheckpoint(str(tmp_path / "checkpoint.npz"), output=lambda *args: None)
+    checkpoint.add_feed("00700.SEHK", StateFeed(make_state()))
+    checkpoint.save()
+
+    # the 10:01 bar holds the last tick, the 10:06 bar ends after the restore
+    fetcher = GapFetcher([make_bar(at(10, minute)) for minute in range(1, 7)])
+    feed = StateFeed()
+    restored = FeedCheckpoint(str(tmp_path / "checkpoint.npz"), output=lambda *args: None)
+    restored.add_feed("00700.SEHK", feed)
+    restored.restore(fetcher, end=at(10, 5, 30))
+
+    assert fetcher.requests[0].start == at(10, 0, 30)
+    assert [bar.datetime for bar in feed.bars] == [at(10, minute) for minute in range(2, 6)]
+
+
+def test_resampler_partial_bar_survives_a_restore(tmp_path):
+    resampler = TickResampler(window=5)
+    resampler.add_tick(make_tick(at(10, 0, 10), 300.0, 1000))
+    resampler.add_tick(make_tick(at(10, 1, 10), 301.0, 1300))
+
+    checkpoint = FeedCheckpoint(str(tmp_path / "checkpoint.npz"), output=lambda *args: None)
+    checkpoint.add_resampler("00700.SEHK", resampler)
+    checkpoint.save()
+
+    bars = []
+    restored_resampler = TickResampler(bars.append, window=5)
+    restored = FeedCheckpoint(str(tmp_path / "checkpoint.npz"), output=lambda *args: None)
+    restored.add_resampler("00700.SEHK", restored_resampler)
+    restored.restore()
+    restored_resampler.add_tick(make_tick(at(10, 5, 1), 302.0, 1400))
+
+    assert bars[0].datetime == at(10, 5)
+    assert (bars[0].open_price, bars[0].high_price, bars[0].close_price, bars[0].volume) == (300.0, 301.0, 301.0, 300)
@@ -0,0 +1,107 @@
+import time
+from threading import Event, Thread
+
+import pytest
+
+from backtrader_futu.connection_pool import ContextPool, UnlockError
+
+
+class FakeContext:
+    """"""
+
+    def __init__(self, setting: dict) -> None:
+        """"""
+        self.setting = setting
+        self.closed = False
+
+    def close(self) -> None:
+        """"""
+        self.closed = True
+
+
+def make_setting(opend, **kwargs) -> dict:
+    """"""
+    host, port = opend.address
+    return {"host": host, "port": port, **kwargs}
+
+
+def test_quote_context_is_shared_and_closed_after_last_release(opend):
+    pool = ContextPool(output=lambda *args: None)
+    setting = make_setting(opend)
+
+    first = pool.acquire_quote(setting)
+    second = pool.acquire_quote(setting)
+    try:
+        assert first.context is second.context
+        ret, _ = first.get_global_state()
+        assert ret == 0
+    finally:
+        first.release()
+        assert pool.entries
+        second.release()
+
+    assert not pool.entries
+
+
+def test_failed_unlock_raises_and_leaves_no_context(opend):
+    pool = ContextPool(output=lambda *args: None)
+    setting = make_setting(opend, market="HK", trd_env="REAL", password="123456")
+
+    # the simulator only lists simulate accounts, so unlocking fails
+    with pytest.raises(UnlockError):
+        pool.acquire_trade(setting)
+
+    assert not pool.entries
+
+
+def test_trade_contexts_are_keyed_by_trd_env_not_password():
+    pool = ContextPool(trade_factory=FakeContext, output=lambda *args: None)
+    setting = {"host": "127.0.0.1", "port": 11111, "market": "US"}
+
+    simulate = pool.acquire_trade({**setting, "trd_env": "SIMULATE"})
+    real = pool.acquire_trade({**setting, "trd_env": "REAL", "password": "123456"})
+
+    assert simulate.context is not real.context
+    for key in pool.entries:
+        assert "123456" not in str(key)
+    assert real.context.setting["password"] == "123456"
+
+
+def test_slow_connect_does_not_block_other_contexts():
+    started = Event()
+    proceed = Event()
+
+    def factory(setting: dict) -> FakeContext:
+        if setting["port"] == 1:
+            started.set()
+            proceed.wait(5)
+        return FakeContext(setting)
+
+    pool = ContextPool(quote_factory=factory, output=lambda *args: None)
+    slow = Thread(target=pool.acquire_quote, args=({"host": "127.0.0.1", "port": 1},))
+    slow.start()
+    assert started.wait(5)
+
+    t = time.monotonic()
+    handle = pool.acquire_quote({"host": "127.0.0.1", "port": 2})
+    assert time.monotonic() - t < 1
+    assert handle.context.setting["port"] == 2
+
+    proceed.set()
+    slow.join()
+
+
+def test_failed_health_check_reconnects_and_notifies():
+    pool = ContextPool(quote_factory=FakeContext, health_check=lambda ctx: not ctx.closed, output=lambda *args: None)
+    keys = []
+    pool.add_reconnect_listener(keys.append)
+
+    handle = pool.acquire_quote({"host": "127.0.0.1", "port": 1})
+    old = handle.context
+    pool.check_health()
+    assert handle.context is old
+
+    old.closed = True
+    pool.check_health()
+    assert handle.context is not old
+    assert keys == list(pool.entries)
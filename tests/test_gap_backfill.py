@@ -0,0 +1,111 @@
+from datetime import datetime
+from threading import Event
+
+from backtrader_futu.connection_pool import QUOTE_CONTEXT, TRADE_CONTEXT
+from backtrader_futu.gap_backfill import GapBackfill
+from backtrader_futu.object import BarData, Exchange, Interval, TickData
+from backtrader_futu.utility import CHINA_TZ
+
+
+class HoldingFeed:
+    """
+    Stands in for FutuTickData: hold, resume and the bars queued in between.
+    """
+
+    def __init__(self, symbol: str, last_tick: TickData = None, held_start: datetime = None) -> None:
+        """"""
+        self.symbol = symbol
+        self.last_tick = last_tick
+        self.held_start = held_start
+        self.holding = False
+        self.bars = []
+
+    def hold(self) -> None:
+        """"""
+        self.holding = True
+
+    def resume(self) -> None:
+        """"""
+        self.holding = False
+
+    def get_held_start(self):
+        """"""
+        return self.held_start
+
+    def add_bars(self, bars) -> None:
+        """"""
+        assert self.holding
+        self.bars.extend(bars)
+
+
+class MinuteFetcher:
+    """
+    Minute bars 10:01 to 10:10 of every requested symbol, failing for symbols in fail.
+    """
+
+    def __init__(self, fail=(), gate: Event = None) -> None:
+        """"""
+        self.fail = set(fail)
+        self.gate = gate
+        self.requests = []
+
+    def query_history(self, req):
+        """"""
+        if self.gate:
+            self.gate.wait(5)
+        self.requests.append(req)
+        if req.symbol in self.fail:
+            raise RuntimeError("request failed")
+        return [
+            BarData(
+                gateway_name="FUTU", symbol=req.symbol, exchange=req.exchange, datetime=at(10, minute),
+                interval=Interval.MINUTE,
+            )
+            for minute in range(1, 11)
+        ]
+
+
+def at(hour: int, minute: int, second: int = 0) -> datetime:
+    """"""
+    return datetime(2024, 3, 4, hour, minute, second, tzinfo=CHINA_TZ)
+
+
+def make_tick(symbol: str, dt: datetime) -> TickData:
+    """"""
+    return TickData(gateway_name="FUTU", symbol=symbol, exchange=Exchange.SEHK, datetime=dt, last_price=10)
+
+
+def test_backfill_queues_the_gap_of_every_feed():
+    backfill = GapBackfill(MinuteFetcher(fail={"09988"}), output=lambda *args: None)
+    tencent = HoldingFeed("00700", make_tick("00700", at(10, 2, 30)), held_start=at(10, 7, 5))
+    alibaba = HoldingFeed("09988", make_tick("09988", at(10, 2, 30)))
+    idle = HoldingFeed("03690")
+    for feed in (tencent, alibaba, idle):
+        backfill.add_feed(feed.symbol, feed)
+
+    results = backfill.backfill(end=at(10, 9))
+    backfill.close()
+
+    # 10:03 holds the last tick, 10:08 overlaps the first live tick
+    assert [bar.datetime for bar in tencent.bars] == [at(10, minute) for minute in range(4, 8)]
+    assert list(results) == ["00700"]
+    assert alibaba.bars == [] and idle.bars == []
+    assert not any(feed.holding for feed in (tencent, alibaba, idle))
+    assert sorted(req.symbol for req in backfill.fetcher.requests) == ["00700", "09988"]
+
+
+def test_reconnect_returns_before_the_backfill_is_done():
+    gate = Event()
+    backfill = GapBackfill(MinuteFetcher(gate=gate), output=lambda *args: None)
+    feed = HoldingFeed("00700", make_tick("00700", at(10, 2, 30)), held_start=at(10, 7, 5))
+    backfill.add_feed("00700", feed)
+
+    assert backfill.on_reconnect((TRADE_CONTEXT, "127.0.0.1", 11111, "HK", "", "REAL")) is None
+    future = backfill.on_reconnect((QUOTE_CONTEXT, "127.0.0.1", 11111, "", "", ""))
+    assert not future.done()
+
+    gate.set()
+    future.result(5)
+    backfill.close()
+    assert len(feed.bars) == 4
+    assert not feed.holding
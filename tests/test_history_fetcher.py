@@ -0,0 +1,54 @@
+from datetime import datetime
+
+import futu as ft
+import pytest
+
+from backtrader_futu.futu_utility import convert_symbol_vt2futu
+from backtrader_futu.history_fetcher import HistoryFetcher
+from backtrader_futu.object import Exchange, HistoryRequest, Interval
+from backtrader_futu.ratelimit import TokenBucket
+from backtrader_futu.utility import ZoneInfo
+
+
+@pytest.fixture
+def fetcher(opend):
+    host, port = opend.address
+    quote_ctx = ft.OpenQuoteContext(host=host, port=port)
+    fetcher = HistoryFetcher(quote_ctx, limiter=TokenBucket.for_window(1000, 1.0), output=lambda *args: None)
+    yield fetcher
+    fetcher.close()
+    quote_ctx.close()
+
+
+@pytest.mark.parametrize("symbol, exchange, tz", [
+    ("AAPL", Exchange.SMART, "America/New_York"),
+    ("00700", Exchange.SEHK, "Asia/Hong_Kong"),
+])
+def test_bars_are_localized_in_market_time(fetcher, symbol, exchange, tz):
+    tz = ZoneInfo(tz)
+    start = datetime(2024, 3, 4, 10, 0, tzinfo=tz)
+    end = datetime(2024, 3, 4, 11, 0, tzinfo=tz)
+
+    req = HistoryRequest(symbol=symbol, exchange=exchange, start=start, end=end, interval=Interval.MINUTE)
+    bars = fetcher.query_history(req)
+
+    assert len(bars) == 61
+    assert bars[0].datetime == start
+    assert bars[-1].datetime == end
+
+    # futu time_key is market local time, the bar at start carries the row of that local time
+    ret, df, _ = fetcher.quote_ctx.request_history_kline(
+        convert_symbol_vt2futu(symbol, exchange),
+        start="2024-03-04",
+        end="2024-03-04",
+        ktype="K_1M",
+        max_count=1000,
+    )
+    assert ret == ft.RET_OK
+    row = df[df["time_key"] == "2024-03-04 10:00:00"].iloc[0]
+    assert bars[0].open_price == row["open"]
+    assert bars[0].close_price == row["close"]
+    # the same window given in another timezone selects the same bars
+    req.start = start.astimezone(ZoneInfo("UTC"))
+    req.end = end.astimezone(ZoneInfo("UTC"))
+    assert [bar.datetime for bar in fetcher.query_history(req)] == [bar.datetime for bar in bars]
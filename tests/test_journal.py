@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import orjson
+
+from backtrader_futu.journal import QUARANTINE_FOLDER, TRADE_KIND, TradeJournal, read_journal
+from backtrader_futu.object import Direction, Exchange, TradeData
+from backtrader_futu.utility import CHINA_TZ
+
+
+DAY = datetime(2024, 3, 4, 10, 0, tzinfo=CHINA_TZ)
+
+
+def make_trade(tradeid: str, price=300.0, strategy: str = "MyStrat") -> TradeData:
+    """"""
+    trade = TradeData(
+        gateway_name="FUTU",
+        symbol="00700",
+        exchange=Exchange.SEHK,
+        orderid="1",
+        tradeid=tradeid,
+        direction=Direction.LONG,
+        price=price,
+        volume=100,
+        datetime=DAY,
+    )
+    trade.strategy_class_name = strategy
+    return trade
+
+
+def make_journal(root, **kwargs) -> TradeJournal:
+    """"""
+    messages = []
+    journal = TradeJournal(str(root), flush_interval=60, output=lambda msg, *args: messages.append(msg), **kwargs)
+    journal.messages = messages
+    return journal
+
+
+def read_quarantine(root) -> list:
+    """"""
+    return [
+        orjson.loads(line)
+        for path in sorted(root.joinpath(QUARANTINE_FOLDER).glob("*.jsonl"))
+        for line in path.read_bytes().splitlines()
+    ]
+
+
+def test_records_are_written_by_partition(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.start()
+    journal.add_trade(make_trade("1"))
+    journal.add_trade(make_trade("2", strategy="Other"))
+    journal.stop()
+
+    assert read_journal(TRADE_KIND, DAY.date(), "MyStrat", str(tmp_path)).column("tradeid").to_pylist() == ["1"]
+    assert read_journal(TRADE_KIND, DAY.date(), root=str(tmp_path)).num_rows == 2
+    assert not journal.quarantined
+
+
+def test_bad_record_is_quarantined_without_blocking_its_partition(tmp_path):
+    journal = make_journal(tmp_path)
+    journal.start()
+    journal.add_trade(make_trade("1"))
+    journal.add_trade(make_trade("2", price="not a price"))
+    journal.add_trade(make_trade("3"))
+    journal.stop()
+
+    table = read_journal(TRADE_KIND, DAY.date(), "MyStrat", str(tmp_path))
+    assert table.column("tradeid").to_pylist() == ["1", "3"]
+
+    records = read_quarantine(tmp_path)
+    assert [record["tradeid"] for record in records] == ["2"]
+    assert records[0]["reason"].startswith("conversion failed")
+    assert journal.quarantined == 1
+    assert not journal.buffers
+
+
+def test_failing_write_is_retried_then_quarantined(tmp_path):
+    journal = make_journal(tmp_path, max_retries=2)
+
+    # a file where the partition folder should be makes every write fail
+    tmp_path.joinpath(TRADE_KIND).write_text("")
+
+    journal._buffer(TRADE_KIND, journal.getters[TRADE_KIND](make_trade("1")), 0)
+    journal.flush()
+    assert journal.pending == 1
+    assert journal.failures
+
+    journal.flush()
+    assert journal.pending == 0
+    assert not journal.buffers
+    assert [record["tradeid"] for record in read_quarantine(tmp_path)] == ["1"]
+    assert journal.quarantined == 1
@@ -0,0 +1,36 @@
+import numpy as np
+
+from backtrader_futu.object import Direction
+from backtrader_futu.order_normalizer import OrderNormalizer
+from backtrader_futu.pricetick import PriceScale, make_hk_scale
+
+
+def test_off_grid_prices_never_cross_their_limit():
+    normalizer = OrderNormalizer(["AAPL.US", "00700.SEHK"], [1, 100], [0.01, 0.01])
+    rows = np.array([0, 0, 1, 1, 0])
+    prices = np.array([10.006, 10.004, 10.0196, 10.011, 10.0051])
+    directions = np.array([1, -1, 1, -1, 0])
+
+    result = normalizer.round_prices(prices, directions, rows)
+
+    np.testing.assert_allclose(result, [10.0, 10.01, 10.0, 10.02, 10.01])
+
+
+def test_on_grid_prices_are_kept_despite_float_error():
+    normalizer = OrderNormalizer(["AAPL.US", "00700.SEHK"], [1, 100], [0.01, 0.01])
+    prices = np.array([10.01, 0.29 * 3])
+
+    np.testing.assert_allclose(normalizer.round_prices(prices, np.array([1, -1])), [10.01, 0.87])
+    np.testing.assert_allclose(normalizer.round_prices(prices, np.array([-1, 1])), [10.01, 0.87])
+
+
+def test_price_scale_rounds_off_grid_prices_by_direction():
+    scale = PriceScale("AAPL.US", 0.01)
+    hk_scale = make_hk_scale("00700.SEHK", 100)
+
+    assert scale.round_price(10.006, Direction.LONG) == 10.0
+    assert scale.round_price(10.004, Direction.SHORT) == 10.01
+    assert scale.round_price(10.006) == 10.01
+    assert scale.round_price(10.01, Direction.LONG) == 10.01
+    assert hk_scale.round_price(10.0196, Direction.LONG) == 10.0
+    assert hk_scale.round_price(10.0196, Direction.SHORT) == 10.02
@@ -0,0 +1,38 @@
+from backtrader_futu.object import Direction, Exchange, OrderRequest, OrderType
+from backtrader_futu.order_scheduler import OrderScheduler
+
+
+def make_order(volume: float, reference: str = "MyStrat") -> OrderRequest:
+    """"""
+    return OrderRequest(
+        symbol="00700",
+        exchange=Exchange.SEHK,
+        direction=Direction.LONG,
+        type=OrderType.LIMIT,
+        volume=volume,
+        price=300,
+        reference=reference,
+    )
+
+
+def test_orders_with_same_reference_are_all_sent(endpoint):
+    scheduler = OrderScheduler(endpoint, clock=lambda: 0.0)
+
+    handles = [scheduler.submit_order(make_order(volume)) for volume in (100, 200, 300)]
+
+    assert len(set(handles)) == 3
+    assert scheduler.pending() == 3
+    assert scheduler.dispatch() == 3
+    assert [req.volume for req in endpoint.orders] == [100, 200, 300]
+
+
+def test_withdraw_order_drops_only_its_order(endpoint):
+    scheduler = OrderScheduler(endpoint, clock=lambda: 0.0)
+
+    first = scheduler.submit_order(make_order(100))
+    scheduler.submit_order(make_order(200))
+
+    assert scheduler.withdraw_order(first)
+    assert not scheduler.withdraw_order(first)
+    assert scheduler.dispatch() == 1
+    assert [req.volume for req in endpoint.orders] == [200]
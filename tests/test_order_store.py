@@ -0,0 +1,49 @@
+from backtrader_futu.object import Exchange, OrderData, Status
+from backtrader_futu.order_store import OrderStore
+
+
+def make_order(orderid: str, status: Status, symbol: str = "00700") -> OrderData:
+    """"""
+    return OrderData(
+        gateway_name="FUTU", symbol=symbol, exchange=Exchange.SEHK, orderid=orderid, status=status, reference="grid"
+    )
+
+
+def test_status_changes_move_orders_between_indexes():
+    store = OrderStore()
+    store.update_order(make_order("1", Status.NOTTRADED))
+    store.update_order(make_order("2", Status.NOTTRADED, "09988"))
+
+    assert [order.orderid for order in store.get_active_orders("00700.SEHK")] == ["1"]
+    assert len(store.get_orders_by_reference("grid")) == 2
+
+    store.update_order(make_order("1", Status.ALLTRADED))
+
+    assert not store.has_active_orders("00700.SEHK")
+    assert [order.orderid for order in store.get_orders_by_reference("grid")] == ["2"]
+    assert store.get_order("FUTU.1").status == Status.ALLTRADED
+    assert [order.orderid for order in store.get_orders_by_status(Status.ALLTRADED)] == ["1"]
+
+
+def test_late_active_update_never_revives_a_finished_order():
+    store = OrderStore(max_archived=2)
+    for orderid in "123":
+        store.update_order(make_order(orderid, Status.NOTTRADED))
+        store.update_order(make_order(orderid, Status.CANCELLED))
+
+    # 1 was evicted from the archive, 3 is still archived
+    assert "FUTU.1" not in store
+    store.update_order(make_order("1", Status.PARTTRADED))
+    store.update_order(make_order("3", Status.NOTTRADED))
+
+    assert store.get_active_orders() == []
+    assert "FUTU.1" not in store
+    assert store.get_order("FUTU.3").status == Status.CANCELLED
+
+
+def test_evicted_ids_are_bounded():
+    store = OrderStore(max_archived=1, max_evicted=2)
+    for orderid in "1234":
+        store.update_order(make_order(orderid, Status.REJECTED))
+
+    assert list(store.evicted_ids) == ["FUTU.2", "FUTU.3"]
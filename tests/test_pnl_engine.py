@@ -0,0 +1,53 @@
+import logging
+
+import pytest
+
+from backtrader_futu.object import Direction, Exchange, TradeData
+from backtrader_futu.pnl_engine import PnlEngine
+
+
+def make_trade(tradeid: str, direction: Direction, price: float, volume: float) -> TradeData:
+    """"""
+    return TradeData(
+        gateway_name="FUTU", symbol="00700", exchange=Exchange.SEHK, orderid="1", tradeid=tradeid,
+        direction=direction, price=price, volume=volume,
+    )
+
+
+def test_fills_update_position_pnl_and_cash():
+    engine = PnlEngine(cash=100000)
+    engine.update_trade(make_trade("1", Direction.LONG, 300, 200))
+    engine.update_trade(make_trade("2", Direction.LONG, 310, 200))
+    engine.update_trade(make_trade("3", Direction.SHORT, 320, 100))
+    engine.update_price("00700.SEHK", 330)
+
+    position = engine.get_position("00700.SEHK")
+    assert position.volume == 300
+    assert position.price == pytest.approx(305)
+    assert engine.realized == pytest.approx(1500)
+    assert engine.unrealized == pytest.approx(7500)
+    assert engine.cash == pytest.approx(100000 - 60000 - 62000 + 32000)
+    assert engine.balance == pytest.approx(engine.cash + 300 * 330)
+
+
+def test_duplicate_fills_are_applied_once_and_the_dedupe_set_is_bounded():
+    engine = PnlEngine(max_tradeids=2)
+    assert engine.update_trade(make_trade("1", Direction.LONG, 300, 100))
+    assert not engine.update_trade(make_trade("1", Direction.LONG, 300, 100))
+    engine.update_trade(make_trade("2", Direction.LONG, 300, 100))
+    engine.update_trade(make_trade("3", Direction.LONG, 300, 100))
+
+    assert engine.get_position("00700.SEHK").volume == 300
+    assert list(engine.tradeids) == ["FUTU.2", "FUTU.3"]
+
+
+def test_fill_without_direction_is_skipped_with_a_warning():
+    messages = []
+    engine = PnlEngine(cash=1000, output=lambda msg, level=logging.INFO: messages.append((msg, level)))
+
+    assert not engine.update_trade(make_trade("1", None, 300, 100))
+    assert engine.get_position("00700.SEHK") is None
+    assert engine.cash == 1000
+    assert messages[0][1] == logging.WARNING
+    # a corrected push of the same fill is still applied
+    assert engine.update_trade(make_trade("1", Direction.LONG, 300, 100))
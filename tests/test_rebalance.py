@@ -0,0 +1,26 @@
+import numpy as np
+
+from backtrader_futu.order_normalizer import OrderNormalizer
+from backtrader_futu.order_scheduler import OrderScheduler
+from backtrader_futu.rebalance import RebalanceEngine
+
+
+def test_rebalance_orders_all_pass_the_scheduler(endpoint):
+    vt_symbols = ["00700.SEHK", "09988.SEHK", "AAPL.US"]
+    normalizer = OrderNormalizer(vt_symbols, [100, 100, 1], [0.01, 0.01, 0.01])
+    engine = RebalanceEngine(normalizer)
+
+    plan = engine.compute(
+        weights=np.array([0.2, 0.3, 0.4]),
+        prices=np.array([300.0, 80.0, 180.0]),
+        current=np.array([1000.0, 0.0, 0.0]),
+        cash=1_000_000,
+    )
+    assert len(plan.orders) == 3
+
+    scheduler = OrderScheduler(endpoint, clock=lambda: 0.0)
+    for req in plan.orders:
+        scheduler.submit_order(req)
+
+    assert scheduler.dispatch() == 3
+    assert endpoint.orders == plan.orders
@@ -0,0 +1,76 @@
+from backtrader_futu.subscription import SubscriptionManager
+
+
+class QuoteContext:
+    """
+    Records subscribe and unsubscribe calls, answering RET_OK.
+    """
+
+    def __init__(self) -> None:
+        """"""
+        self.calls = []
+
+    def subscribe(self, codes, subtypes):
+        """"""
+        self.calls.append(("subscribe", list(codes), list(subtypes)))
+        return 0, None
+
+    def unsubscribe(self, codes, subtypes):
+        """"""
+        self.calls.append(("unsubscribe", list(codes), list(subtypes)))
+        return 0, None
+
+
+class Clock:
+    """"""
+
+    def __init__(self) -> None:
+        """"""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """"""
+        return self.now
+
+
+def test_shared_subscriptions_are_sent_once_in_batches():
+    ctx = QuoteContext()
+    manager = SubscriptionManager(ctx, batch_size=2, output=lambda *args: None)
+    manager.subscribe(["00700.SEHK", "09988.SEHK", "AAPL.US"], ["TICKER", "QUOTE"])
+    manager.subscribe(["00700.SEHK"], ["TICKER"])
+
+    assert manager.flush() == []
+    assert ctx.calls == [
+        ("subscribe", ["HK.00700", "HK.09988"], ["QUOTE", "TICKER"]),
+        ("subscribe", ["US.AAPL"], ["QUOTE", "TICKER"]),
+    ]
+    assert manager.used() == 6
+
+    # one feed left, the other still holds the ticker of 00700
+    manager.unsubscribe(["00700.SEHK"], ["TICKER"])
+    manager.subscribe(["00700.SEHK"], ["TICKER"])
+    manager.flush()
+    assert len(ctx.calls) == 2
+
+
+def test_idle_subscriptions_are_evicted_for_quota_after_their_hold():
+    ctx = QuoteContext()
+    clock = Clock()
+    manager = SubscriptionManager(ctx, quota=2, min_hold=60, clock=clock, output=lambda *args: None)
+    manager.subscribe(["00700.SEHK", "09988.SEHK"], ["TICKER"])
+    manager.flush()
+
+    manager.unsubscribe(["00700.SEHK", "09988.SEHK"], ["TICKER"])
+    manager.touch("00700.SEHK", "TICKER")
+    manager.subscribe(["AAPL.US"], ["TICKER"])
+
+    # held for less than min_hold, nothing can go yet
+    assert manager.flush() == [("US.AAPL", "TICKER")]
+
+    clock.now = 60
+    assert manager.flush() == []
+    assert ctx.calls[1:] == [
+        ("unsubscribe", ["HK.09988"], ["TICKER"]),
+        ("subscribe", ["US.AAPL"], ["TICKER"]),
+    ]
+    assert sorted(manager.active) == [("HK.00700", "TICKER"), ("US.AAPL", "TICKER")]
@@ -0,0 +1,89 @@
+from datetime import datetime, timedelta
+
+import numpy as np
+
+from backtrader_futu.object import Exchange, TickData
+from backtrader_futu.tickcodec import (
+    BLOCK_HEADER,
+    COLUMN_HEADER,
+    DATETIME_FIELD,
+    TickBatch,
+    TickReader,
+    TickWriter,
+    decode_block,
+    encode_block,
+)
+from backtrader_futu.utility import CHINA_TZ
+
+
+FIELDS = ["last_price", "volume", "turnover", "bid_price_1", "ask_volume_1"]
+
+
+def make_ticks(count: int, localtime: bool = True) -> list:
+    """"""
+    start = datetime(2024, 3, 4, 9, 30, tzinfo=CHINA_TZ)
+    ticks = []
+    for i in range(count):
+        dt = start + timedelta(milliseconds=250 * i)
+        tick = TickData(
+            gateway_name="FUTU",
+            symbol="00700",
+            exchange=Exchange.SEHK,
+            datetime=dt,
+            name="TENCENT",
+            last_price=300 + 0.2 * (i % 7),
+            volume=1000 * i,
+            turnover=300.1 * i,
+            bid_price_1=299.8,
+            ask_volume_1=100 * (i % 3),
+            localtime=dt + timedelta(microseconds=1500) if localtime and i % 5 else None,
+        )
+        if i % 4 == 0:
+            tick.extra = {"seq": i}
+        ticks.append(tick)
+    return ticks
+
+
+def assert_same_ticks(decoded: list, ticks: list) -> None:
+    """"""
+    assert len(decoded) == len(ticks)
+    for a, b in zip(decoded, ticks):
+        assert a.datetime == b.datetime
+        assert a.localtime == b.localtime
+        assert a.extra == b.extra
+        for name in FIELDS:
+            assert getattr(a, name) == getattr(b, name)
+
+
+def test_block_round_trip_keeps_localtime_and_extra():
+    ticks = make_ticks(100)
+    data = encode_block(TickBatch.from_ticks(ticks), price_tick=0.2, lot_size=100)
+    assert_same_ticks(decode_block(data, "FUTU").to_ticks(), ticks)
+
+
+def test_timestamps_pack_deltas_not_absolute_values():
+    batch = TickBatch.from_ticks(make_ticks(1000, localtime=False))
+    data = encode_block(batch, price_tick=0.2, lot_size=100, compress=False)
+
+    # datetime is the first column after symbol, name and exchange: 250ms deltas fit in 4 bytes
+    offset = BLOCK_HEADER.size + len("00700") + len("TENCENT") + len("SEHK")
+    _, width, _, _, base, length = COLUMN_HEADER.unpack_from(data, offset)
+    assert base == int(batch.columns[DATETIME_FIELD][0])
+    assert width == 4
+    assert length == 4 * 999
+
+
+def test_file_round_trip_by_symbol_and_time(tmp_path):
+    ticks = make_ticks(250)
+    path = tmp_path / "ticks.bin"
+    with TickWriter(path, block_size=64) as writer:
+        writer.write_ticks(ticks, price_tick=0.2, lot_size=100)
+
+    with TickReader(path, "FUTU") as reader:
+        assert reader.get_symbols() == ["00700.SEHK"]
+        assert_same_ticks(reader.read("00700.SEHK").to_ticks(), ticks)
+
+        start, end = ticks[50].datetime, ticks[180].datetime
+        batch = reader.read("00700.SEHK", start, end)
+        assert_same_ticks(batch.to_ticks(), ticks[50:181])
+        assert np.all(np.diff(batch.columns[DATETIME_FIELD]) > 0)
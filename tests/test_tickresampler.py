@@ -0,0 +1,76 @@
+from datetime import datetime, time
+
+import pytest
+
+from backtrader_futu.object import Exchange, Interval, TickData
+from backtrader_futu.tickresampler import TickResampler
+from backtrader_futu.utility import CHINA_TZ
+
+
+def make_tick(hour: int, minute: int, second: int, price: float, volume: float) -> TickData:
+    """"""
+    return TickData(
+        gateway_name="FUTU",
+        symbol="00700",
+        exchange=Exchange.SEHK,
+        datetime=datetime(2024, 3, 4, hour, minute, second, tzinfo=CHINA_TZ),
+        last_price=price,
+        volume=volume,
+        turnover=volume * price,
+    )
+
+
+def at(hour: int, minute: int) -> datetime:
+    """"""
+    return datetime(2024, 3, 4, hour, minute, tzinfo=CHINA_TZ)
+
+
+@pytest.mark.parametrize("window, ticks, ends, interval", [
+    (1, [(10, 0, 5), (10, 0, 50), (10, 1, 0)], [at(10, 1)], Interval.MINUTE),
+    (5, [(10, 3, 0), (10, 4, 59), (10, 5, 0)], [at(10, 5)], None),
+    (60, [(10, 0, 0), (10, 59, 0), (11, 0, 0)], [at(11, 0)], Interval.HOUR),
+    (120, [(10, 0, 0), (11, 59, 0), (12, 0, 0)], [at(12, 0)], None),
+])
+def test_bars_are_bucketed_by_window_and_stamped_at_their_end(window, ticks, ends, interval):
+    bars = []
+    resampler = TickResampler(bars.append, window=window)
+    for i, (hour, minute, second) in enumerate(ticks):
+        resampler.add_tick(make_tick(hour, minute, second, 300 + i, 100 * i))
+
+    assert [bar.datetime for bar in bars] == ends
+    assert bars[0].interval == interval
+    assert bars[0].open_price == 300
+    assert bars[0].close_price == 300 + len(ticks) - 2
+
+
+@pytest.mark.parametrize("window", [0, 7, 25])
+def test_windows_not_dividing_a_day_are_rejected(window):
+    with pytest.raises(ValueError):
+        TickResampler(window=window)
+
+
+def test_timer_close_waits_for_the_end_of_the_window():
+    bars = []
+    resampler = TickResampler(bars.append, window=5)
+    resampler.add_tick(make_tick(10, 0, 10, 300, 0))
+
+    assert resampler.on_bar_close(at(10, 1).timestamp()) is None
+    assert resampler.on_bar_close(at(10, 5).timestamp()) is bars[0]
+    assert bars[0].datetime == at(10, 5)
+
+
+def test_late_tick_after_timer_close_is_not_emitted_again():
+    bars = []
+    resampler = TickResampler(bars.append, window=1)
+    resampler.add_tick(make_tick(10, 0, 10, 300, 1000))
+    resampler.add_tick(make_tick(10, 0, 40, 301, 1100))
+    resampler.on_bar_close(at(10, 1).timestamp())
+
+    assert resampler.add_tick(make_tick(10, 0, 59, 299, 1150)) is None
+    resampler.add_tick(make_tick(10, 1, 5, 302, 1200))
+    resampler.add_tick(make_tick(10, 2, 0, 303, 1200))
+
+    assert [bar.datetime for bar in bars] == [at(10, 1), at(10, 2)]
+    # the late tick's price is dropped, its volume lands in the next bar
+    assert (bars[1].open_price, bars[1].low_price, bars[1].close_price) == (302, 302, 302)
+    assert bars[1].volume == 100
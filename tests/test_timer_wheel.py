@@ -0,0 +1,40 @@
+from backtrader_futu.timer_wheel import TimerWheel
+
+
+class Clock:
+    """"""
+
+    def __init__(self) -> None:
+        """"""
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        """"""
+        return self.now
+
+
+def test_timers_fire_at_their_deadline_on_every_level():
+    clock = Clock()
+    wheel = TimerWheel(resolution=0.1, clock=clock)
+    fired = []
+    # 0.5s on level 0, 60s past the 256 ticks of level 0, 3000s past level 1
+    for delay in (3000, 0.5, 60):
+        wheel.schedule(delay, fired.append, delay)
+
+    for now in (0.4, 0.5, 59.9, 60, 2999.9, 3000):
+        assert wheel.advance(now) == (1 if now in (0.5, 60, 3000) else 0)
+
+    assert fired == [0.5, 60, 3000]
+    assert wheel.pending == 0
+
+
+def test_cancelled_timer_never_fires():
+    clock = Clock()
+    wheel = TimerWheel(resolution=0.1, clock=clock)
+    fired = []
+    timer = wheel.schedule(1, fired.append, "cancelled")
+    wheel.schedule(1, fired.append, "kept")
+    timer.cancel()
+
+    assert wheel.advance(1) == 1
+    assert fired == ["kept"]
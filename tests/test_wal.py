@@ -0,0 +1,136 @@
+import pytest
+
+from backtrader_futu.object import (
+    CancelRequest,
+    Direction,
+    Exchange,
+    ModifyRequest,
+    OrderData,
+    OrderRequest,
+    OrderType,
+    Status,
+    TradeData,
+)
+from backtrader_futu.wal import OrderWal, WalCheckpoint, WalError, recover
+
+
+def make_request(price: float = 300) -> OrderRequest:
+    """"""
+    return OrderRequest(
+        symbol="00700", exchange=Exchange.SEHK, direction=Direction.LONG, type=OrderType.LIMIT, volume=200,
+        price=price,
+    )
+
+
+def make_order(orderid: str, status: Status, price: float = 300, traded: float = 0) -> OrderData:
+    """"""
+    return OrderData(
+        gateway_name="FUTU", symbol="00700", exchange=Exchange.SEHK, orderid=orderid, direction=Direction.LONG,
+        price=price, volume=200, traded=traded, status=status,
+    )
+
+
+def make_trade(tradeid: str, orderid: str) -> TradeData:
+    """"""
+    return TradeData(
+        gateway_name="FUTU", symbol="00700", exchange=Exchange.SEHK, orderid=orderid, tradeid=tradeid,
+        direction=Direction.LONG, price=300, volume=100,
+    )
+
+
+def write_session(wal: OrderWal) -> int:
+    """
+    Two acknowledged orders, one partly filled and amended, one filled, and a cancel in flight.
+    """
+    first: int = wal.append(make_request())
+    wal.append_ack(first, "FUTU.1")
+    wal.append(make_order("1", Status.NOTTRADED))
+    second: int = wal.append(make_request())
+    wal.append_ack(second, "FUTU.2")
+    wal.append(make_order("2", Status.NOTTRADED))
+
+    wal.append(make_trade("t1", "1"))
+    wal.append(make_order("1", Status.PARTTRADED, traded=100))
+    wal.append(ModifyRequest("1", "00700", Exchange.SEHK, 301, 200))
+    wal.append(make_trade("t2", "2"))
+    wal.append(make_trade("t3", "2"))
+    wal.append(make_order("2", Status.ALLTRADED, traded=200))
+    seq: int = wal.append(CancelRequest("1", "00700", Exchange.SEHK))
+    return seq
+
+
+def check_session(recovery, cash: float) -> None:
+    """"""
+    assert [order.orderid for order in recovery.orders.get_active_orders()] == ["1"]
+    assert recovery.pnl.get_position("00700.SEHK").volume == 300
+    assert recovery.pnl.cash == pytest.approx(cash - 300 * 300)
+    assert [req.orderid for req in recovery.pending_cancels] == ["1"]
+    assert [(req.orderid, req.price) for req in recovery.pending_modifies] == [("1", 301)]
+
+
+def test_recover_applies_fills_cancels_and_modifies(tmp_path):
+    path = str(tmp_path / "orders.wal")
+    wal = OrderWal(path, output=lambda *args: None)
+    wal.open()
+    seq = write_session(wal)
+    unacked = wal.append(make_request(299))
+    assert wal.wait(unacked, 5)
+    wal.close()
+
+    recovery = recover(path, cash=100000)
+    check_session(recovery, 100000)
+    assert list(recovery.unacked_requests) == [seq + 1]
+
+
+def test_append_to_a_closed_log_raises(tmp_path):
+    wal = OrderWal(str(tmp_path / "orders.wal"), output=lambda *args: None)
+    with pytest.raises(WalError):
+        wal.append(make_request())
+
+    wal.open()
+    wal.append(make_request())
+    wal.close()
+    with pytest.raises(WalError):
+        wal.append(make_request())
+
+
+def test_compaction_waits_for_acks_and_keeps_the_state(tmp_path):
+    path = str(tmp_path / "orders.wal")
+    wal = OrderWal(path, output=lambda *args: None)
+    wal.open()
+    seq = write_session(wal)
+    unacked = wal.append(make_request(299))
+
+    assert not wal.compact(5)
+
+    wal.append_ack(unacked, "FUTU.3")
+    size = (tmp_path / "orders.wal").stat().st_size
+    assert wal.compact(5)
+    assert (tmp_path / "orders.wal").stat().st_size < size
+    assert isinstance(next(iter(wal)), WalCheckpoint)
+
+    # numbering goes on after the checkpoint, also across reopens
+    assert wal.append(make_request(298)) == seq + 3
+    wal.close()
+    wal.open()
+    assert wal.append(make_request(297)) == seq + 4
+    wal.close()
+
+    recovery = recover(path, cash=100000)
+    check_session(recovery, 100000)
+    assert sorted(recovery.unacked_requests) == [seq + 3, seq + 4]
+
+
+def test_log_is_compacted_as_it_grows(tmp_path):
+    path = tmp_path / "orders.wal"
+    wal = OrderWal(str(path), compact_bytes=2000, output=lambda *args: None)
+    wal.open()
+    for i in range(100):
+        seq = wal.append(make_request())
+        wal.append_ack(seq, f"FUTU.{i}")
+        wal.wait(wal.append(make_order(str(i), Status.CANCELLED)), 5)
+    wal.close()
+
+    assert path.stat().st_size < 3000
+    assert isinstance(next(iter(OrderWal(str(path)))), WalCheckpoint)
+    assert recover(str(path)).orders.get_active_orders() == []